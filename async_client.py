@@ -0,0 +1,149 @@
+from __future__ import annotations
+from typing import Protocol, Dict, Any, Optional
+import asyncio
+import aiohttp
+
+from client import AlphaVantageClient
+from rate_limiter import RateLimiter, jittered_backoff
+from response_cache import ResponseCache
+
+class AsyncMarketDataClient(Protocol):
+    async def fetch_series(self, function: str, **extra_params: Any) -> Dict[str, Any]: ...
+    async def fetch_time_series_daily(self, symbol: str, outputsize: str = "full") -> Dict[str, Any]: ...
+    async def fetch_time_series_intraday(self, symbol: str, interval: str = "5min",
+                                         outputsize: str = "full", month: Optional[str] = None) -> Dict[str, Any]: ...
+
+
+class AsyncAlphaVantageClient(AsyncMarketDataClient):
+    """
+    asyncio counterpart of AlphaVantageClient. One pooled keep-alive session is shared by
+    every coroutine using the client; create it inside a running loop (`async with`).
+    """
+
+    VALID_INTRADAY_INTERVALS = AlphaVantageClient.VALID_INTRADAY_INTERVALS
+
+    def __init__(self, base_url: str, api_key: str, max_retries: int = 6, backoff_sec: float = 2,
+                 max_backoff_sec: float = 60, limiter: Optional[RateLimiter] = None,
+                 cache: Optional[ResponseCache] = None,
+                 pool_size: int = 20, keepalive_sec: float = 30,
+                 session: Optional[aiohttp.ClientSession] = None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.backoff_sec = backoff_sec
+        self.max_backoff_sec = max_backoff_sec
+        self.limiter = limiter
+        self.cache = cache
+        self.pool_size = pool_size
+        self.keepalive_sec = keepalive_sec
+        self._owns_session = session is None
+        self._session: Optional[aiohttp.ClientSession] = session
+
+    async def __aenter__(self) -> "AsyncAlphaVantageClient":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    async def fetch_time_series_daily(self, symbol: str, outputsize: str = "full") -> Dict[str, Any]:
+        return await self.fetch_series(
+            function = "TIME_SERIES_DAILY",
+            symbol = symbol,
+            outputsize = outputsize,
+            datatype = "json",
+        )
+
+    async def fetch_time_series_intraday(
+        self,
+        symbol: str,
+        interval: str = "5min",
+        outputsize: str = "full",
+        month: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        if interval not in self.VALID_INTRADAY_INTERVALS:
+            raise ValueError(f"interval must be one of {sorted(self.VALID_INTRADAY_INTERVALS)}")
+
+        params: Dict[str, Any] = {
+            "function": "TIME_SERIES_INTRADAY",
+            "symbol": symbol,
+            "interval": interval,
+            "outputsize": outputsize,
+            "datatype": "json",
+        }
+        if month:
+            params["month"] = month
+
+        return await self.fetch_series(**params)
+
+    async def fetch_series(self, function: str, **extra_params: Any) -> Dict[str, Any]:
+        params = {
+            "function": function,
+            "apikey": self.api_key,
+            **extra_params,
+        }
+        # The cache does blocking gzip file I/O: keep it off the event loop.
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get, params)
+            if cached is not None:
+                return cached
+        data = await self._get_json_with_retries(params)
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.put, params, data)
+        return data
+
+    # -------------------------- Internal helpers -----------------------------
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._owns_session = True
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.keepalive_sec)
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=30)
+            )
+        return self._session
+
+    async def _get_json_with_retries(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        session = self._get_session()
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.limiter is not None:
+                await self.limiter.acquire_async()
+            # Read the whole body inside the block so the connection is back in the pool
+            # before any backoff sleep below.
+            async with session.get(self.base_url, params=params) as resp:
+                status = resp.status
+                if status != 200:
+                    body = await resp.text()
+                else:
+                    # AV sometimes labels JSON as text/plain
+                    data = await resp.json(content_type=None)
+
+            if status != 200:
+                if attempt >= self.max_retries:
+                    snippet = body[:200].replace("\n", " ")
+                    raise RuntimeError(f"HTTP {status}: {snippet}")
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            note = AlphaVantageClient._throttle_note(data)
+            if note:
+                if attempt >= self.max_retries:
+                    raise RuntimeError(f"Rate limit hit repeatedly: {note}")
+                delay = self._backoff(attempt)
+                if self.limiter is not None:
+                    self.limiter.penalize(delay)
+                await asyncio.sleep(delay)
+                continue
+
+            return data
+
+    def _backoff(self, attempt: int) -> float:
+        return jittered_backoff(attempt, self.backoff_sec, self.max_backoff_sec)
+
+    async def close(self) -> None:
+        if not self._owns_session:
+            return
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Compare CSV ingest readers on the DATA/ files or a synthetic candle CSV.
+
+    python benchmarks/bench_csv.py [--rows 1000000] [--workers 4] [--repeat 3] [paths ...]
+"""
+from __future__ import annotations
+import argparse
+import csv
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from csv_to_mongo_helper import columns_from_csv, docs_from_csv, series_batches_from_csv
+
+
+def legacy_docs_from_csv(csv_path: str, default_symbol: str) -> Iterator[Dict[str, Any]]:
+    # The previous DictReader-based reader, kept here as the baseline.
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for raw in csv.DictReader(f):
+            row = {(k or "").strip().lower(): (v.strip() if isinstance(v, str) else v) for k, v in raw.items()}
+            ts_str = row["timestamp"]
+            try:
+                ts = datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
+            except Exception:
+                ts = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+            try:
+                volume = int(row["volume"])
+            except ValueError:
+                volume = int(float(row["volume"]))
+            yield {"symbol": (row.get("symbol") or default_symbol).strip(), "ts": ts,
+                   "open": float(row["open"]), "high": float(row["high"]), "low": float(row["low"]),
+                   "close": float(row["close"]), "volume": volume}
+
+
+def synthetic_csv(path: Path, rows: int) -> None:
+    t = datetime(2024, 1, 2, 9, 30)
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["symbol", "timestamp", "open", "high", "low", "close", "volume"])
+        for i in range(rows):
+            px = 100 + (i % 500) * 0.01
+            w.writerow(["BENCH", (t + timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                        round(px, 4), round(px + 0.05, 4), round(px - 0.05, 4), round(px + 0.01, 4), 1000 + i % 977])
+
+
+def bench(name: str, fn, paths: List[str], repeat: int, rows: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for p in paths:
+            fn(p)
+        best = min(best, time.perf_counter() - started)
+    print(f"{name:<36} {best * 1000:9.1f} ms  {rows / best:12,.0f} rows/s")
+    return best
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("paths", nargs="*", help="CSV files (default: DATA/**/*.csv)")
+    p.add_argument("--rows", type=int, default=0, help="Benchmark a synthetic file of this many rows instead")
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--repeat", type=int, default=3)
+    args = p.parse_args()
+
+    tmp = None
+    paths = args.paths or [str(x) for x in sorted(Path("DATA").rglob("*.csv"))]
+    if args.rows:
+        tmp = tempfile.TemporaryDirectory()
+        synthetic = Path(tmp.name) / "BENCH_m1.csv"
+        synthetic_csv(synthetic, args.rows)
+        paths = [str(synthetic)]
+    if not paths:
+        raise SystemExit("No CSV files found; pass paths or --rows")
+
+    rows = sum(1 for p in paths for _ in legacy_docs_from_csv(p, "X"))
+    print(f"{len(paths)} file(s), {rows} rows, best of {args.repeat}")
+
+    base = bench("legacy DictReader docs", lambda p: sum(1 for _ in legacy_docs_from_csv(p, "X")),
+                 paths, args.repeat, rows)
+    docs = bench("docs_from_csv", lambda p: sum(1 for _ in docs_from_csv(p, "X")), paths, args.repeat, rows)
+    cols = bench("columns_from_csv", lambda p: sum(len(c["ts"]) for c in columns_from_csv(p, "X")),
+                 paths, args.repeat, rows)
+    series = bench("series_batches_from_csv (ingest)",
+                   lambda p: sum(len(s) for s in series_batches_from_csv(p, "X")), paths, args.repeat, rows)
+    # The row dicts upsert_many still builds from each CandleSeries batch for pymongo.
+    rowed = bench("  + to_docs per batch", lambda p: sum(len(s.to_docs()) for s in series_batches_from_csv(p, "X")),
+                  paths, args.repeat, rows)
+    par = bench(f"columns_from_csv workers={args.workers}",
+                lambda p: sum(len(c["ts"]) for c in columns_from_csv(p, "X", workers=args.workers)),
+                paths, args.repeat, rows)
+    print(f"speedup vs legacy: docs {base / docs:.1f}x, columns {base / cols:.1f}x, "
+          f"ingest series {base / series:.1f}x (with row dicts {base / rowed:.1f}x), "
+          f"columns x{args.workers} {base / par:.1f}x")
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
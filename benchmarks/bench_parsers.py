@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Compare the intraday payload parsers on a synthetic full-month 1-minute payload.
+
+    python benchmarks/bench_parsers.py [--days 22] [--repeat 5]
+"""
+from __future__ import annotations
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from parsers import IntradayParser
+
+
+def synthetic_payload(days: int) -> dict:
+    # Extended-hours session 04:00-20:00 local, 960 bars per weekday.
+    block = {}
+    day = datetime(2025, 3, 3)
+    added = 0
+    while added < days:
+        if day.weekday() < 5:
+            t = day.replace(hour=4)
+            for i in range(960):
+                px = 100 + (i % 50) * 0.01
+                block[(t + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S")] = {
+                    "1. open": f"{px:.4f}", "2. high": f"{px + 0.05:.4f}",
+                    "3. low": f"{px - 0.05:.4f}", "4. close": f"{px + 0.01:.4f}",
+                    "5. volume": str(1000 + i),
+                }
+            added += 1
+        day += timedelta(days=1)
+    return {"Meta Data": {}, "Time Series (1min)": block}
+
+
+def bench(name: str, fn, repeat: int, bars: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    print(f"{name:<40} {best * 1000:9.1f} ms  {bars / best:12,.0f} bars/s")
+    return best
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--days", type=int, default=22)
+    p.add_argument("--repeat", type=int, default=5)
+    args = p.parse_args()
+
+    payload = synthetic_payload(args.days)
+    bars = len(payload["Time Series (1min)"])
+    print(f"{bars} bars, best of {args.repeat}")
+
+    base = bench("IntradayParser.parse_intraday_timeseries",
+                 lambda: IntradayParser.parse_intraday_timeseries(payload, "BENCH"), args.repeat, bars)
+    fast = bench("IntradayParser.parse_intraday_columns",
+                 lambda: IntradayParser.parse_intraday_columns(payload), args.repeat, bars)
+    bench("IntradayParser.parse_intraday_series",
+          lambda: IntradayParser.parse_intraday_series(payload, "BENCH"), args.repeat, bars)
+    print(f"columnar speedup vs dataclass parser: {base / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+import threading
+import time
+
+from models.candle_series import CandleSeries, TimeLike, to_epoch
+
+_OLDEST = -(2 ** 62)  # window lower bound when it holds every stored bar of the symbol
+
+
+class _Window:
+    __slots__ = ("series", "lo", "hi", "open", "synced_at")
+
+    def __init__(self, series: CandleSeries, lo: int, hi: int, open: bool, synced_at: float):
+        self.series = series
+        self.lo = lo
+        self.hi = hi
+        self.open = open
+        self.synced_at = synced_at
+
+
+class CandleCache:
+    """
+    In-process read-through cache of per-symbol candle windows in front of the Mongo repo.
+
+    Each symbol keeps one sorted window holding every stored bar with lo <= ts <= hi. Range
+    reads that overlap the window only load the missing edges and widen it. A window that was
+    loaded up to the present is "open" for `open_ttl_sec`: reads up to now are served from it
+    and the repo's own writes are merged in. After that the newest bars are re-read as an
+    edge, which picks up what other processes wrote. Windows are evicted least recently used
+    once the cache holds more than `max_bars` bars.
+    """
+
+    def __init__(self, max_bars: int = 1_000_000, open_ttl_sec: float = 60):
+        self.max_bars = max_bars
+        self.open_ttl_sec = open_ttl_sec
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bars = 0
+        self._windows: "OrderedDict[str, _Window]" = OrderedDict()
+        self._gens: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.partial_hits + self.misses
+        return {"hits": self.hits, "partial_hits": self.partial_hits, "misses": self.misses,
+                "evictions": self.evictions, "symbols": len(self._windows), "bars": self._bars,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0}
+
+    def range(self, symbol: str, start: TimeLike, end: TimeLike,
+              load: Callable[[int, int], CandleSeries]) -> CandleSeries:
+        """Bars with start <= ts <= end; `load(lo, hi)` reads an epoch-second range from Mongo."""
+        lo, hi = to_epoch(start), to_epoch(end)
+        now = time.time()
+        with self._lock:
+            w, gen = self._touch(symbol)
+            if w is not None:
+                series, w_lo, w_hi = w.series, w.lo, self._covered_to(w, now)
+
+        if w is None or hi < w_lo - 1 or lo > w_hi + 1:
+            fetched = load(lo, hi)
+            self._count("misses")
+            if w is None:
+                self._store(symbol, gen, fetched, lo, min(hi, int(now)), hi >= now, now)
+            return fetched
+
+        parts: List[CandleSeries] = []
+        if lo < w_lo:
+            parts.append(load(lo, w_lo - 1))
+        parts.append(series)
+        if hi > w_hi:
+            parts.append(load(w_hi + 1, hi))
+        if len(parts) == 1:
+            self._count("hits")
+            return series.between(lo, hi)
+
+        self._count("partial_hits")
+        merged = CandleSeries.merge(parts) if any(len(p) for p in parts) else series
+        if hi > w_hi:
+            self._store(symbol, gen, merged, min(lo, w_lo), min(hi, int(now)), hi >= now, now)
+        else:
+            self._store(symbol, gen, merged, lo, w.hi, w.open, w.synced_at)
+        return merged.between(lo, hi)
+
+    def latest(self, symbol: str, n: int, load: Callable[[int], CandleSeries]) -> CandleSeries:
+        """The newest `n` bars; `load(n)` reads them from Mongo on a miss."""
+        now = time.time()
+        with self._lock:
+            w, gen = self._touch(symbol)
+            if (w is not None and self._covered_to(w, now) >= int(now)
+                    and (len(w.series) >= n or w.lo == _OLDEST)):
+                self.hits += 1
+                return w.series[max(0, len(w.series) - n):]
+
+        fetched = load(n)
+        self._count("misses")
+        lo = int(fetched.ts[0]) if len(fetched) >= n and len(fetched) else _OLDEST
+        if w is not None and w.hi >= lo - 1:
+            lo = min(lo, w.lo)
+            fetched = CandleSeries.merge([w.series, fetched]) if len(fetched) else w.series
+        self._store(symbol, gen, fetched, lo, int(now), True, now)
+        return fetched[max(0, len(fetched) - n):]
+
+    def apply(self, rows: Iterable[Mapping[str, Any]]) -> None:
+        """Fold bars just written by the repo into any cached window covering them."""
+        by_symbol: Dict[str, List[Mapping[str, Any]]] = {}
+        for r in rows:
+            by_symbol.setdefault(r["symbol"], []).append(r)
+        now = time.time()
+        for symbol, group in by_symbol.items():
+            try:
+                written = CandleSeries.from_records(group, symbol=symbol)
+            except (KeyError, TypeError, ValueError):
+                self.invalidate(symbol)
+                continue
+            with self._lock:
+                self._gens[symbol] = self._gens.get(symbol, 0) + 1
+                w = self._windows.get(symbol)
+                if w is None:
+                    continue
+                part = written.between(w.lo, self._covered_to(w, now))
+                if len(part):
+                    merged = CandleSeries.merge([w.series, part])
+                    self._bars += len(merged) - len(w.series)
+                    w.series = merged
+
+    def invalidate(self, symbol: Optional[str] = None) -> None:
+        with self._lock:
+            symbols = [symbol] if symbol is not None else list(self._windows)
+            for s in symbols:
+                self._gens[s] = self._gens.get(s, 0) + 1
+                w = self._windows.pop(s, None)
+                if w is not None:
+                    self._bars -= len(w.series)
+
+    # -------------------------- Internal helpers -----------------------------
+
+    def _touch(self, symbol: str) -> Tuple[Optional[_Window], int]:
+        # Caller holds the lock.
+        w = self._windows.get(symbol)
+        if w is not None:
+            self._windows.move_to_end(symbol)
+        return w, self._gens.get(symbol, 0)
+
+    def _covered_to(self, w: _Window, now: float) -> int:
+        if w.open and now - w.synced_at <= self.open_ttl_sec:
+            return int(now)
+        return w.hi
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _store(self, symbol: str, gen: int, series: CandleSeries, lo: int, hi: int,
+               open: bool, synced_at: float) -> None:
+        with self._lock:
+            # A write landed while we were reading Mongo; the loaded bars may predate it.
+            if self._gens.get(symbol, 0) != gen or len(series) > self.max_bars:
+                return
+            old = self._windows.pop(symbol, None)
+            if old is not None:
+                self._bars -= len(old.series)
+            self._windows[symbol] = _Window(series, lo, hi, open, synced_at)
+            self._bars += len(series)
+            while self._bars > self.max_bars and len(self._windows) > 1:
+                _, evicted = self._windows.popitem(last=False)
+                self._bars -= len(evicted.series)
+                self.evictions += 1
@@ -3,6 +3,9 @@ from typing import Protocol, Dict, Any, Optional
 import time
 import requests
 
+from rate_limiter import RateLimiter, jittered_backoff
+from response_cache import ResponseCache
+
 class MarketDataClient(Protocol):
     def fetch_series(self, function: str, **extra_params: Any) -> Dict[str, Any]: ...
     def fetch_time_series_daily(self, symbol: str, outputsize: str = "full") -> Dict[str, Any]: ...
@@ -14,12 +17,19 @@ class AlphaVantageClient(MarketDataClient):
 
     VALID_INTRADAY_INTERVALS = {"1min", "5min", "15min", "30min", "60min"}
 
-    def __init__(self, base_url: str, api_key: str, max_retries: int = 6, backoff_sec: int = 15):
+    def __init__(self, base_url: str, api_key: str, max_retries: int = 6, backoff_sec: float = 2,
+                 max_backoff_sec: float = 60, limiter: Optional[RateLimiter] = None,
+                 cache: Optional[ResponseCache] = None, session: Optional[requests.Session] = None):
         self.base_url = base_url
         self.api_key = api_key
         self.max_retries = max_retries
         self.backoff_sec = backoff_sec
-        self.session = requests.Session()
+        self.max_backoff_sec = max_backoff_sec
+        self.limiter = limiter
+        self.cache = cache
+        # A passed-in session is shared (see resources.http_session) and is not closed here.
+        self._owns_session = session is None
+        self.session = session or requests.Session()
 
     def fetch_time_series_daily(self, symbol: str, outputsize: str = "full") -> Dict[str, Any]:
         return self.fetch_series(
@@ -57,7 +67,14 @@ class AlphaVantageClient(MarketDataClient):
             "apikey": self.api_key,
             **extra_params,
         }
-        return self._get_json_with_retries(params)
+        if self.cache is not None:
+            cached = self.cache.get(params)
+            if cached is not None:
+                return cached
+        data = self._get_json_with_retries(params)
+        if self.cache is not None:
+            self.cache.put(params, data)
+        return data
 
     # -------------------------- Internal helpers -----------------------------
 
@@ -65,37 +82,53 @@ class AlphaVantageClient(MarketDataClient):
         attempt = 0
         while True:
             attempt += 1
+            if self.limiter is not None:
+                self.limiter.acquire()
             resp = self.session.get(self.base_url, params=params, timeout=30)
             if resp.status_code != 200:
                 if attempt >= self.max_retries:
                     snippet = resp.text[:200].replace("\n", " ")
                     raise RuntimeError(f"HTTP {resp.status_code}: {snippet}")
-                time.sleep(self.backoff_sec)
+                time.sleep(self._backoff(attempt))
                 continue
 
             data = resp.json()
 
-            if "Error Message" in data:
-                raise ValueError(f"Alpha Vantage error: {data['Error Message']}")
-
-            info = data.get("Information")
-            if info and "premium" in info.lower():
-                raise RuntimeError(
-                    "Alpha Vantage says this is a premium endpoint. "
-                    "Use a non-premium function or upgrade your plan."
-                )
-
-            # Rate limit / throttle message comes in 'Note'
-            note = data.get("Note")
+            note = self._throttle_note(data)
             if note:
                 if attempt >= self.max_retries:
                     raise RuntimeError(f"Rate limit hit repeatedly: {note}")
-                time.sleep(self.backoff_sec)
+                delay = self._backoff(attempt)
+                if self.limiter is not None:
+                    # Throttling is global to the API key, so hold back every worker.
+                    self.limiter.penalize(delay)
+                time.sleep(delay)
                 continue
 
             return data
 
+    @staticmethod
+    def _throttle_note(data: Dict[str, Any]) -> Optional[str]:
+        """Raise on hard API errors; return the throttle message if the call should be retried."""
+        if "Error Message" in data:
+            raise ValueError(f"Alpha Vantage error: {data['Error Message']}")
+
+        info = data.get("Information")
+        if info and "premium" in info.lower():
+            raise RuntimeError(
+                "Alpha Vantage says this is a premium endpoint. "
+                "Use a non-premium function or upgrade your plan."
+            )
+
+        # Rate limit / throttle message comes in 'Note' (newer responses use 'Information')
+        return data.get("Note") or (info if info and "rate limit" in info.lower() else None)
+
+    def _backoff(self, attempt: int) -> float:
+        return jittered_backoff(attempt, self.backoff_sec, self.max_backoff_sec)
+
     def close(self) -> None:
+        if not self._owns_session:
+            return
         try:
             self.session.close()
         except Exception:
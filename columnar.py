@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# columnar.py
+"""
+Binary columnar storage for fetched candles, next to the CSV output.
+
+Two layouts:
+  * ``npy``: a ``<name>.cols`` symlink to a hidden versioned directory (``.<name>.cols.<id>/``)
+    with one ``.npy`` file per column plus ``meta.json``. Uncompressed, so reads are
+    memory-mapped and need no parsing at all.
+  * ``npz``: a single zlib-compressed ``<name>.npz``. About 3-4x smaller, but it is
+    decompressed into memory on read.
+
+Convert an existing CSV tree with:
+    python columnar.py DATA --format npy
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, List, Optional
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from models.candle_series import CandleSeries
+
+FORMATS = ("csv", "npy", "npz")
+SUFFIXES = {"csv": ".csv", "npy": ".cols", "npz": ".npz"}
+FORMAT_VERSION = 1
+
+
+def format_of(path: str) -> str:
+    suffix = Path(path).suffix
+    for fmt, s in SUFFIXES.items():
+        if suffix == s:
+            return fmt
+    raise ValueError(f"Unknown candle file format: {path}")
+
+
+def with_format(path: str, fmt: str) -> str:
+    if fmt not in SUFFIXES:
+        raise ValueError(f"format must be one of {FORMATS}")
+    return str(Path(path).with_suffix(SUFFIXES[fmt]))
+
+
+class ColumnarStore:
+    @staticmethod
+    def write(path: str, series: CandleSeries, append: bool = False) -> int:
+        """
+        Write `series` to `path` (`.cols` or `.npz`) atomically and return the rows written:
+        `.npz` by renaming a temp file over it, `.cols` by swapping its version symlink.
+        With `append=True` the stored bars are merged with the new ones (new bars win).
+        """
+        fmt = format_of(path)
+        written = len(series)
+        if append and os.path.exists(path):
+            existing = ColumnarStore.read(path, mmap=False)
+            written = len(series.newer_than(existing.end())) if len(existing) else written
+            series = CandleSeries.merge([existing, series]) if len(series) else existing
+
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if fmt == "npz":
+            fd, tmp = tempfile.mkstemp(prefix=".tmp-", suffix=".npz", dir=target.parent)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.savez_compressed(f, symbol=np.array(series.symbol), **series.columns())
+                os.chmod(tmp, 0o644)
+                os.replace(tmp, target)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+                raise
+            return written
+
+        # Each write fills a new versioned directory and swaps the symlink with one rename, so
+        # readers see the old or the new version, never none. The replaced version is kept until
+        # the next write, so a reader that resolved the link just before the swap can finish.
+        current = Path(os.path.realpath(target)) if target.is_symlink() else None
+        version = Path(tempfile.mkdtemp(prefix=f".{target.name}.", dir=target.parent))
+        link = target.with_name(f".tmp-link{version.name}")
+        stale: Optional[Path] = None
+        try:
+            for name, col in series.columns().items():
+                np.save(version / f"{name}.npy", np.ascontiguousarray(col))
+            (version / "meta.json").write_text(json.dumps(
+                {"symbol": series.symbol, "rows": len(series), "version": FORMAT_VERSION,
+                 "previous": current.name if current is not None else None}
+            ))
+            os.chmod(version, 0o755)
+            os.symlink(version.name, link)
+            if current is not None:
+                stale = ColumnarStore._previous_version(current)
+            elif target.exists():
+                # A plain directory from before versioned writes can't be swapped in one rename;
+                # this one-time conversion leaves a short window without `target`.
+                stale = target.with_name(f".old-{target.name}")
+                shutil.rmtree(stale, ignore_errors=True)
+                os.replace(target, stale)
+            os.replace(link, target)
+        except BaseException:
+            if os.path.lexists(link):
+                os.unlink(link)
+            shutil.rmtree(version, ignore_errors=True)
+            raise
+        if stale is not None:
+            shutil.rmtree(stale, ignore_errors=True)
+        return written
+
+    @staticmethod
+    def _previous_version(version: Path) -> Optional[Path]:
+        try:
+            previous = json.loads((version / "meta.json").read_text()).get("previous")
+        except (OSError, ValueError):
+            return None
+        return version.with_name(previous) if previous else None
+
+    @staticmethod
+    def read(path: str, mmap: bool = True) -> CandleSeries:
+        """Load a `.cols` (memory-mapped unless `mmap=False`) or `.npz` file."""
+        fmt = format_of(path)
+        if fmt == "npz":
+            with np.load(path) as z:
+                return CandleSeries.from_columns(str(z["symbol"]), {c: z[c] for c in CandleSeries.COLUMNS})
+
+        mode = "r" if mmap else None
+        for attempt in range(3):
+            # Resolve the symlink once so every column comes from the same version; a writer
+            # may remove that version before we open it, in which case the link is read again.
+            root = Path(path).resolve()
+            try:
+                meta = json.loads((root / "meta.json").read_text())
+                cols = {c: np.load(root / f"{c}.npy", mmap_mode=mode) for c in CandleSeries.COLUMNS}
+                return CandleSeries(meta["symbol"], **cols)
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+
+
+def convert_tree(root: str = "DATA", fmt: str = "npy", overwrite: bool = False) -> List[str]:
+    """Write a `fmt` copy next to every CSV under `root`; returns the paths written."""
+    from csv_to_mongo_helper import series_from_csv
+
+    written: List[str] = []
+    for csv_path in sorted(Path(root).rglob("*.csv")):
+        out = with_format(str(csv_path), fmt)
+        if os.path.exists(out) and not overwrite:
+            continue
+        default_symbol = csv_path.name.split("_", 1)[0]
+        series = series_from_csv(str(csv_path), default_symbol)
+        ColumnarStore.write(out, series)
+        print(f"{csv_path} -> {out} ({len(series)} rows)")
+        written.append(out)
+    return written
+
+
+def main(argv: Optional[List[Any]] = None) -> None:
+    p = argparse.ArgumentParser(description="Convert a DATA/ CSV tree to a columnar binary format.")
+    p.add_argument("root", nargs="?", default="DATA", help="Root directory to scan for CSV files")
+    p.add_argument("--format", choices=FORMATS[1:], default="npy", help="Target format (default: npy)")
+    p.add_argument("--overwrite", action="store_true", help="Rewrite existing converted files")
+    args = p.parse_args(argv)
+    out = convert_tree(args.root, args.format, args.overwrite)
+    print(f"Converted {len(out)} file(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ from __future__ import annotations
 import configparser, os
 import sys
 from pathlib import Path
-from models import AppConfig, MongoSettings
+from models import AppConfig, CacheSettings, CoverageSettings, IndicatorSettings, IngestSettings, MongoSettings, ResampleSettings, SchedulerSettings
 from kv import KeyVaultClient
 
 class ConfigLoader:
@@ -21,6 +21,10 @@ class ConfigLoader:
             symbol = (sec.get("symbol"))
             days = int(sec.get("days"))
             intraday_minutes = int(sec.get("intradayMinutes"))
+            calls_per_minute = int(sec.get("callsPerMinute", 5))
+            calls_per_day = int(sec.get("callsPerDay", 0)) or None
+            output_format = sec.get("outputFormat", "csv")
+            http_pool_size = int(sec.get("httpPoolSize", 10))
 
             try:
                 kv_client = KeyVaultClient()
@@ -35,6 +39,75 @@ class ConfigLoader:
                 candles_collection = (m.get("canldes_collection")),
                 ctx_collection = (m.get("ctx_collection")),
                 tasks_collection = (m.get("tasks_collection")),
+                timeseries = str(m.get("timeseries", "false")).lower() == "true",
+                granularity = m.get("granularity") or None,
+                read_cache_bars = int(m.get("read_cache_bars", 1_000_000)),
+                read_cache_ttl_sec = int(m.get("read_cache_ttl_sec", 60)),
+                max_pool_size = int(m.get("max_pool_size", 100)),
+                min_pool_size = int(m.get("min_pool_size", 0)),
+            )
+
+            s = cfg["scheduler"] if "scheduler" in cfg else {}
+            scheduler = SchedulerSettings(
+                max_in_flight = int(s.get("max_in_flight", 1)),
+                daemon = str(s.get("daemon", "false")).lower() == "true",
+                refresh_sec = int(s.get("refresh_sec", 60)),
+                late_policy = s.get("late_policy", "coalesce"),
+                late_grace_sec = int(s.get("late_grace_sec", 60)),
+                lease_sec = int(s.get("lease_sec", 300)),
+                node_id = s.get("node_id") or None,
+                ctx_discovery = s.get("ctx_discovery", "full"),
+                resync_sec = int(s.get("resync_sec", 600)),
+            )
+
+            c = cfg["cache"] if "cache" in cfg else {}
+            cache = CacheSettings(
+                enabled = str(c.get("enabled", "true")).lower() == "true",
+                dir = c.get("dir", ".cache/alpha_vantage"),
+                max_mb = int(c.get("max_mb", 512)),
+                recent_ttl_sec = int(c.get("recent_ttl_sec", 300)),
+            )
+
+            i = cfg["ingest"] if "ingest" in cfg else {}
+            ingest = IngestSettings(
+                batch_size = int(i.get("batch_size", 1000)),
+                workers = int(i.get("workers", 1)),
+                max_in_flight = int(i.get("max_in_flight", 4)),
+                max_retries = int(i.get("max_retries", 3)),
+                parse_workers = int(i.get("parse_workers", 1)),
+            )
+
+            u = cfg["universes"] if "universes" in cfg else {}
+            universes = {
+                name: tuple(sym.strip().upper() for sym in value.split(",") if sym.strip())
+                for name, value in u.items()
+            }
+
+            r = cfg["resample"] if "resample" in cfg else {}
+            resample = ResampleSettings(
+                intervals = tuple(x.strip() for x in r.get("intervals", "5min,15min,30min,60min,1d").split(",")
+                                  if x.strip()),
+                session = r.get("session", "extended"),
+                daily_session = r.get("daily_session", "regular"),
+                tz = r.get("tz", "America/New_York"),
+                chunk_days = int(r.get("chunk_days", 30)),
+            )
+
+            n = cfg["indicators"] if "indicators" in cfg else {}
+            indicators = IndicatorSettings(
+                specs = tuple(x.strip() for x in n.get("specs", "sma20,ema20,ema50,rsi14,atr14,bb20,vwap").split(",")
+                              if x.strip()),
+                intervals = tuple(x.strip() for x in n.get("intervals", "base").split(",") if x.strip()),
+                collection = n.get("collection", "indicators"),
+                chunk_days = int(n.get("chunk_days", 30)),
+            )
+
+            v = cfg["coverage"] if "coverage" in cfg else {}
+            coverage = CoverageSettings(
+                enabled = str(v.get("enabled", "true")).lower() == "true",
+                collection = v.get("collection", "coverage"),
+                session = v.get("session", "regular"),
+                min_fill = float(v.get("min_fill", 0.99)),
             )
         else:
             sys.exit("Config file not found")
@@ -50,4 +123,15 @@ class ConfigLoader:
             days = days,
             intraday_minutes = intraday_minutes,
             mongo=mongo,
+            calls_per_minute = calls_per_minute,
+            calls_per_day = calls_per_day,
+            output_format = output_format,
+            http_pool_size = http_pool_size,
+            scheduler = scheduler,
+            cache = cache,
+            ingest = ingest,
+            universes = universes,
+            resample = resample,
+            indicators = indicators,
+            coverage = coverage,
         )
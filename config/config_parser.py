@@ -8,4 +8,8 @@ def parse_args():
     p.add_argument("--days", type=int, help="Override days (default from config)")
     p.add_argument("--function", help="Override AV function (unused for intraday)")
     p.add_argument("--outfile", default="out.csv", help="Output CSV path (default: out.csv)")
+    p.add_argument("--format", choices=["csv", "npy", "npz"],
+                   help="Fetch output format: csv, npy (memory-mapped columns) or npz (compressed)")
+    p.add_argument("--daemon", action="store_true",
+                   help="Keep running and schedule jobs by task_interval/next_run instead of one pass")
     return p.parse_args()
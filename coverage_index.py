@@ -0,0 +1,315 @@
+from __future__ import annotations
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple, Union
+from zoneinfo import ZoneInfo
+import numpy as np
+from bson.int64 import Int64
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+
+from db.mongo import get_repo
+from models.candle_series import CandleSeries, to_epoch
+from resample import SESSIONS, utc_offsets
+
+# Bitmaps cover the extended session; every query session lies inside it.
+_DAY_OPEN, _DAY_CLOSE = SESSIONS["extended"]
+_EARLY_CLOSE = {"regular": 13 * 60, "extended": 17 * 60}  # 13:00 close, after-hours until 17:00
+
+Bars = Union[CandleSeries, Iterable[Mapping[str, Any]]]
+
+
+# -------------------------- Exchange calendar ------------------------------
+
+def _easter(year: int) -> date:
+    # Anonymous Gregorian algorithm.
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th `weekday` (Mon=0) of the month; n=-1 is the last one."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(d: date) -> date:
+    # Saturday holidays close the Friday before, Sunday ones the Monday after.
+    if d.weekday() == 5:
+        return d - timedelta(days=1)
+    return d + timedelta(days=1) if d.weekday() == 6 else d
+
+
+@lru_cache(maxsize=64)
+def market_holidays(year: int) -> Set[date]:
+    """NYSE full-day holidays by the standard rules (one-off closures are not included)."""
+    days = {
+        _nth_weekday(year, 1, 0, 3),   # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),   # Washington's Birthday
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),  # Memorial Day
+        _observed(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),   # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed(date(year, 12, 25)),
+    }
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:  # no Friday closure for a Saturday New Year's Day
+        days.add(_observed(new_year))
+    if year >= 2022:
+        days.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return days
+
+
+@lru_cache(maxsize=64)
+def early_closes(year: int) -> Set[date]:
+    """Days the regular session ends at 13:00: July 3, the day after Thanksgiving, Christmas Eve."""
+    days = {_nth_weekday(year, 11, 3, 4) + timedelta(days=1)}
+    for d in (date(year, 7, 3), date(year, 12, 24)):
+        if d.weekday() <= 3:  # on a Friday the holiday itself is observed that day
+            days.add(d)
+    return days
+
+
+def is_trading_day(d: date) -> bool:
+    return d.weekday() < 5 and d not in market_holidays(d.year)
+
+
+def session_slots(d: date, interval: int, session: str = "regular") -> np.ndarray:
+    """Bitmap slot indexes of `interval` bars that overlap the `session` on local day `d`."""
+    open_min, close_min = SESSIONS[session]
+    if session in _EARLY_CLOSE and d in early_closes(d.year):
+        close_min = _EARLY_CLOSE[session]
+    starts = _DAY_OPEN + np.arange(_slot_count(interval)) * interval
+    return np.flatnonzero((starts < close_min) & (starts + interval > open_min))
+
+
+# -------------------------- Bitmaps ----------------------------------------
+
+def _slot_count(interval: int) -> int:
+    return -(-(_DAY_CLOSE - _DAY_OPEN) // interval)
+
+
+def _word_count(interval: int) -> int:
+    return -(-_slot_count(interval) // 64)
+
+
+def _pack(slots: np.ndarray, interval: int) -> np.ndarray:
+    bits = np.zeros(_word_count(interval) * 64, dtype=bool)
+    bits[slots] = True
+    return np.packbits(bits, bitorder="little").view("<u8").view(np.int64)
+
+
+def _unpack(doc: Mapping[str, Any], interval: int) -> np.ndarray:
+    words = np.array([doc.get(f"w{i}", 0) for i in range(_word_count(interval))], dtype=np.int64)
+    bits = np.unpackbits(words.astype("<i8").view(np.uint8), bitorder="little")
+    return bits[:_slot_count(interval)].astype(bool)
+
+
+def _doc_id(symbol: str, interval: int, day: str) -> str:
+    return f"{symbol}|{interval}|{day}"
+
+
+def _day_bitmaps(ts: np.ndarray, interval: int, tz: str) -> Iterable[Tuple[str, np.ndarray]]:
+    """(local day, packed slot words) for every local day with a bar in `ts` (epoch seconds)."""
+    if not len(ts):
+        return
+    day, second = np.divmod(ts + utc_offsets(ts, tz), 86400)
+    slot = (second // 60 - _DAY_OPEN) // interval
+    ok = (slot >= 0) & (slot < _slot_count(interval))
+    day, slot = day[ok], slot[ok]
+    for d in np.unique(day).tolist():
+        yield (date(1970, 1, 1) + timedelta(days=d)).isoformat(), _pack(slot[day == d], interval)
+
+
+def _local_day(t: datetime, tz: str) -> date:
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=timezone.utc)
+    return t.astimezone(ZoneInfo(tz)).date()
+
+
+def _scan_days(docs: Mapping[str, Mapping[str, Any]], first: date, last: date, interval: int,
+               session: str) -> Iterable[Tuple[date, np.ndarray, np.ndarray]]:
+    """(day, stored slots, expected session slots) per trading day in [first, last]."""
+    empty = np.zeros(_slot_count(interval), dtype=bool)
+    d = first
+    while d <= last:
+        if is_trading_day(d):
+            doc = docs.get(d.isoformat())
+            present = _unpack(doc, interval) if doc is not None else empty
+            yield d, present, session_slots(d, interval, session)
+        d += timedelta(days=1)
+
+
+def _complete(scan: Iterable[Tuple[date, np.ndarray, np.ndarray]], min_fill: float) -> Set[str]:
+    seen: Set[str] = set()
+    holes: Set[str] = set()
+    for d, present, expected in scan:
+        month = d.strftime("%Y-%m")
+        seen.add(month)
+        if present[expected].sum() < min_fill * len(expected):
+            holes.add(month)
+    return seen - holes
+
+
+def complete_months_of(ts: np.ndarray, interval: int, start: datetime, end: datetime,
+                       tz: str = "America/New_York", session: str = "regular",
+                       min_fill: float = 1.0) -> Set[str]:
+    """
+    CoverageIndex.complete_months judged from the stored bars' timestamps (epoch seconds, e.g.
+    fetch_range_columns(...)["ts"]) instead of bitmaps, for symbols without an index.
+    """
+    docs = {day: {f"w{i}": w for i, w in enumerate(words)}
+            for day, words in _day_bitmaps(np.asarray(ts, dtype=np.int64), interval, tz)}
+    return _complete(_scan_days(docs, _local_day(start, tz), _local_day(end, tz), interval, session),
+                     min_fill)
+
+
+class CoverageIndex:
+    """
+    Which bars are stored, per symbol, bar interval (minutes) and exchange-local trading day.
+    Each day is one small document holding a bitmap of the day's `interval` slots from 04:00
+    to 20:00 (`tz`) in 64-bit words `w0`, `w1`, ... Writers OR their bits in with `$bit`
+    upserts, so concurrent ingest workers never lose each other's updates. Reads are one
+    range scan on `_id` ("SYMBOL|interval|YYYY-MM-DD") per query, decoded with numpy.
+    Days are judged against the NYSE calendar (holidays and 13:00 early closes).
+
+    The index only grows: bars deleted from the candles collection stay marked until
+    `rebuild()` is run over that range.
+    """
+
+    def __init__(self, coll: Collection, tz: str = "America/New_York"):
+        self._coll = coll
+        self.tz = tz
+
+    # -------------------------- Writes ---------------------------------------
+
+    def record(self, bars: Bars, interval: int) -> int:
+        """Mark stored bars; returns the number of day documents touched."""
+        ops = [UpdateOne({"_id": _doc_id(symbol, interval, day)},
+                         {"$bit": {f"w{i}": {"or": Int64(int(w))} for i, w in enumerate(words) if w},
+                          "$setOnInsert": {"symbol": symbol, "interval": interval, "day": day},
+                          "$currentDate": {"updated_at": True}},
+                         upsert=True)
+               for symbol, day, words in self._day_words(bars, interval) if words.any()]
+        if ops:
+            self._coll.bulk_write(ops, ordered=False)
+        return len(ops)
+
+    def rebuild(self, repo: Any, symbol: str, interval: int, start: datetime, end: datetime) -> int:
+        """Replace the bitmaps of [start, end] (whole local days) with what `repo` stores now."""
+        first, last = self._local_day(start), self._local_day(end)
+        lo, hi = self._day_bounds(first, last)
+        ts = repo.fetch_range_columns(symbol, lo, hi, fields=("ts",))["ts"]
+        found = {day: words for _, day, words in self._day_words({symbol: ts}, interval)}
+        ops = []
+        d = first
+        while d <= last:
+            day = d.isoformat()
+            words = found.get(day, np.zeros(_word_count(interval), dtype=np.int64))
+            ops.append(UpdateOne({"_id": _doc_id(symbol, interval, day)},
+                                 {"$set": {"symbol": symbol, "interval": interval, "day": day,
+                                           **{f"w{i}": Int64(int(w)) for i, w in enumerate(words)}},
+                                  "$currentDate": {"updated_at": True}},
+                                 upsert=True))
+            d += timedelta(days=1)
+        if ops:
+            self._coll.bulk_write(ops, ordered=False)
+        return int(len(ts))
+
+    # -------------------------- Queries --------------------------------------
+
+    def tracked(self, symbol: str, interval: int) -> bool:
+        """Whether any day of `symbol` at `interval` has been recorded (or rebuilt)."""
+        prefix = _doc_id(symbol, interval, "")
+        return self._coll.find_one({"_id": {"$gte": prefix, "$lt": prefix + "~"}},
+                                   projection={"_id": 1}) is not None
+
+    def day_fill(self, symbol: str, interval: int, start: datetime, end: datetime,
+                 session: str = "regular") -> Dict[str, Tuple[int, int]]:
+        """{local day: (stored slots, expected slots)} for each trading day in [start, end]."""
+        out: Dict[str, Tuple[int, int]] = {}
+        for d, present, expected in self._scan(symbol, interval, start, end, session):
+            out[d.isoformat()] = (int(present[expected].sum()), len(expected))
+        return out
+
+    def missing(self, symbol: str, interval: int, start: datetime, end: datetime,
+                session: str = "regular") -> np.ndarray:
+        """UTC epoch seconds of the session bars in [start, end] that are not stored, ascending."""
+        lo, hi = to_epoch(start), to_epoch(end)
+        parts: List[np.ndarray] = []
+        for d, present, expected in self._scan(symbol, interval, start, end, session):
+            slots = expected[~present[expected]]
+            ts = self._midnight(d) + (_DAY_OPEN + slots * interval) * 60
+            parts.append(ts[(ts >= lo) & (ts <= hi)])
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def months_with_holes(self, symbol: str, interval: int, start: datetime, end: datetime,
+                          session: str = "regular", min_fill: float = 1.0) -> Set[str]:
+        """`YYYY-MM` months with a trading day in [start, end] below `min_fill` of its session."""
+        return {d.strftime("%Y-%m")
+                for d, present, expected in self._scan(symbol, interval, start, end, session)
+                if present[expected].sum() < min_fill * len(expected)}
+
+    def complete_months(self, symbol: str, interval: int, start: datetime, end: datetime,
+                        session: str = "regular", min_fill: float = 1.0) -> Set[str]:
+        """Months with trading days in [start, end], all of them at least `min_fill` stored."""
+        return _complete(self._scan(symbol, interval, start, end, session), min_fill)
+
+    # -------------------------- Internal helpers -----------------------------
+
+    def _scan(self, symbol: str, interval: int, start: datetime, end: datetime,
+              session: str) -> Iterable[Tuple[date, np.ndarray, np.ndarray]]:
+        first, last = self._local_day(start), self._local_day(end)
+        cur = self._coll.find({"_id": {"$gte": _doc_id(symbol, interval, first.isoformat()),
+                                       "$lte": _doc_id(symbol, interval, last.isoformat())}})
+        return _scan_days({doc["day"]: doc for doc in cur}, first, last, interval, session)
+
+    def _day_words(self, bars: Union[Bars, Mapping[str, np.ndarray]],
+                   interval: int) -> Iterable[Tuple[str, str, np.ndarray]]:
+        for symbol, ts in self._ts_by_symbol(bars).items():
+            for day, words in _day_bitmaps(ts, interval, self.tz):
+                yield symbol, day, words
+
+    @staticmethod
+    def _ts_by_symbol(bars: Any) -> Dict[str, np.ndarray]:
+        if isinstance(bars, CandleSeries):
+            return {bars.symbol: bars.ts}
+        if isinstance(bars, Mapping):
+            return {s: np.asarray(ts, dtype=np.int64) for s, ts in bars.items()}
+        grouped: Dict[str, List[int]] = {}
+        for d in bars:
+            grouped.setdefault(d["symbol"], []).append(to_epoch(d["ts"]))
+        return {s: np.array(ts, dtype=np.int64) for s, ts in grouped.items()}
+
+    def _local_day(self, t: datetime) -> date:
+        return _local_day(t, self.tz)
+
+    def _midnight(self, d: date) -> int:
+        """UTC epoch of local 00:00 on `d`, using the offset at noon (DST switches at 02:00)."""
+        noon = datetime.combine(d, dtime(12), ZoneInfo(self.tz))
+        return int(datetime.combine(d, dtime(0), timezone.utc).timestamp()
+                   - noon.utcoffset().total_seconds())
+
+    def _day_bounds(self, first: date, last: date) -> Tuple[datetime, datetime]:
+        lo = datetime.fromtimestamp(self._midnight(first), timezone.utc)
+        hi = datetime.fromtimestamp(self._midnight(last + timedelta(days=1)) - 1, timezone.utc)
+        return lo, hi
+
+
+def get_coverage(cfg: Any) -> Optional[CoverageIndex]:
+    """The [coverage] index of the candles collection, or None when it is disabled."""
+    if not cfg.coverage.enabled:
+        return None
+    coll = get_repo(uri=cfg.mongo.uri, db=cfg.mongo.db, collection=cfg.coverage.collection).col
+    return CoverageIndex(coll, cfg.resample.tz)
@@ -1,62 +1,250 @@
 from __future__ import annotations
-from typing import Iterable, Dict, Any, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Tuple
 from pathlib import Path
 import csv
-from datetime import datetime, date, timezone
+import itertools
+import warnings
+from datetime import datetime, timezone
+import numpy as np
 
-def docs_from_csv(csv_path: str, default_symbol: str) -> Iterator[Dict[str, Any]]:
+from models.candle_series import CandleSeries
+
+CHUNK_ROWS = 50_000
+RANGE_BYTES = 8 * 1024 * 1024  # byte-range size handed to each worker task
+_OHLCV = ("open", "high", "low", "close", "volume")
+
+
+@dataclass(frozen=True)
+class _Layout:
+    """Column positions and timestamp format, resolved once from the header and first row."""
+    symbol: Optional[int]
+    time: int
+    daily: bool
+    suffix: Optional[str]  # UTC suffix stripped before vectorized parsing; None = parse row by row
+    open: int
+    high: int
+    low: int
+    close: int
+    volume: int
+
+
+def _resolve_layout(fieldnames: Sequence[str], first: Optional[Sequence[str]]) -> _Layout:
+    headers = [h.strip().lower() for h in fieldnames]
+    pos = {h: i for i, h in enumerate(headers)}
+    has_date = "date" in pos
+    has_ts = "timestamp" in pos
+    if not set(_OHLCV).issubset(pos) or not (has_date or has_ts):
+        raise SystemExit(
+            "CSV must include open,high,low,close,volume and either 'date' (daily) or 'timestamp' (intraday)."
+        )
+
+    time_col = pos["timestamp"] if has_ts else pos["date"]
+    suffix: Optional[str] = ""
+    if has_ts and first is not None and len(first) > time_col:
+        sample = first[time_col].strip()
+        if sample.endswith("Z"):
+            suffix = "Z"
+        elif sample.endswith("+00:00"):
+            suffix = "+00:00"
+        elif len(sample) > 19 and sample[-6] in "+-":
+            suffix = None  # non-UTC offsets: convert row by row
+    return _Layout(symbol=pos.get("symbol"), time=time_col, daily=not has_ts, suffix=suffix,
+                   **{c: pos[c] for c in _OHLCV})
+
+
+def _epoch_slow(ts_str: str) -> int:
+    ts_str = ts_str.strip()
+    try:
+        ts = datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
+    except ValueError:
+        ts = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return int(ts.timestamp())
+
+
+def _block_dtype(layout: _Layout) -> Tuple[List[int], np.dtype]:
+    """usecols and the structured dtype np.loadtxt parses them into (ts kept as bytes)."""
+    fields = [("ts", layout.time, "S40"), ("open", layout.open, "f8"), ("high", layout.high, "f8"),
+              ("low", layout.low, "f8"), ("close", layout.close, "f8"),
+              # Read as float so "1.5e3"-style volumes parse too; exact below 2**53.
+              ("volume", layout.volume, "f8")]
+    if layout.symbol is not None:
+        fields.append(("symbol", layout.symbol, "S32"))  # bytes parse faster; decoded once below
+    return [col for _, col, _ in fields], np.dtype([(name, fmt) for name, _, fmt in fields])
+
+
+def _parse_times(col: np.ndarray, layout: _Layout) -> np.ndarray:
+    if layout.daily:
+        return np.char.strip(col).astype("datetime64[D]").astype("datetime64[s]").astype(np.int64)
+    # Same-length values carrying the file's UTC suffix convert in one numpy cast once the
+    # suffix is cut off; anything else (mixed formats, other offsets) goes row by row.
+    if layout.suffix is not None and len(col):
+        lengths = np.char.str_len(col)
+        width = int(lengths[0]) - len(layout.suffix)
+        if (lengths == lengths[0]).all() and width > 0:
+            try:
+                return col.astype(f"S{width}").astype("datetime64[s]").astype(np.int64)
+            except ValueError:
+                pass
+    return np.array([_epoch_slow(v.decode("utf-8")) for v in col.tolist()], dtype=np.int64)
+
+
+def _parse_block(lines: Sequence[str], layout: _Layout, default_symbol: str) -> Dict[str, np.ndarray]:
+    """Parse data rows (a list of lines) with np.loadtxt."""
+    usecols, dtype = _block_dtype(layout)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # "input contained no data"
+        block = np.loadtxt(lines, delimiter=",", quotechar='"', usecols=usecols, dtype=dtype, ndmin=1)
+    n = len(block)
+    if layout.symbol is None or not n:
+        symbol = np.full(n, default_symbol)
+    else:
+        symbol = np.char.strip(block["symbol"])
+        if (symbol == symbol[0]).all():
+            symbol = np.full(n, symbol[0].decode("utf-8") or default_symbol)
+        else:
+            symbol = np.where(symbol == b"", default_symbol.encode("utf-8"), symbol).astype(str)
+    return {
+        "symbol": symbol,
+        "ts": _parse_times(block["ts"], layout),
+        "open": block["open"].copy(),
+        "high": block["high"].copy(),
+        "low": block["low"].copy(),
+        "close": block["close"].copy(),
+        "volume": block["volume"].astype(np.int64),
+    }
+
+
+def _line_chunks(path: str, start: int, end: Optional[int], chunk_bytes: int) -> Iterator[List[str]]:
+    """
+    The lines that start within [start, end) bytes of `path` (to EOF without `end`), about
+    `chunk_bytes` at a time. Reading bytes and splitting them is much cheaper than iterating
+    a text file, and np.loadtxt parses a list of lines faster than a file object.
+    """
+    with open(path, "rb") as f:
+        if start > 0:
+            f.seek(start - 1)
+            f.readline()  # finish the line that straddles `start`; it belongs to the previous range
+        pos = f.tell()
+        rest = b""
+        while end is None or pos < end:
+            data = f.read(chunk_bytes if end is None else min(chunk_bytes, end - pos))
+            if not data:
+                break
+            pos += len(data)
+            data = rest + data
+            cut = data.rfind(b"\n") + 1
+            data, rest = data[:cut], data[cut:]
+            if data:
+                yield data.decode("utf-8").splitlines()
+        if end is not None and rest:
+            rest += f.readline()  # the range's last line runs past `end`
+        if rest:
+            yield rest.decode("utf-8").splitlines()
+
+
+def _parse_range(path: str, start: int, end: int, layout: _Layout,
+                 default_symbol: str) -> Dict[str, np.ndarray]:
+    """Parse the lines that start within [start, end) bytes of `path`."""
+    lines = [ln for chunk in _line_chunks(path, start, end, end - start) for ln in chunk]
+    return _parse_block(lines, layout, default_symbol)
+
+
+def _open_csv(csv_path: str) -> Tuple[Path, _Layout, int, int]:
+    """(path, layout, byte offset of the first data row, byte length of that row)."""
     p = Path(csv_path)
     if not p.exists():
         raise SystemExit(f"CSV not found: {csv_path}")
-
     with p.open(newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        if not reader.fieldnames:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
             raise SystemExit("CSV has no header row.")
+        first = next(reader, None)
+    with p.open("rb") as f:
+        f.readline()
+        header_end = f.tell()
+        row_bytes = len(f.readline())
+    return p, _resolve_layout(header, first), header_end, max(1, row_bytes)
 
-        headers = [h.strip().lower() for h in reader.fieldnames]
-        header_set = set(headers)
-
-        has_symbol = "symbol" in header_set
-        has_date = "date" in header_set
-        has_ts = "timestamp" in header_set
-        required_ohlc = {"open", "high", "low", "close", "volume"}
-
-        if not required_ohlc.issubset(header_set) or not (has_date or has_ts or has_symbol):
-            raise SystemExit(
-                "CSV must include open,high,low,close,volume and either 'date' (daily) or 'timestamp' (intraday)."
-            )
-
-        for raw in reader:
-            row = { (k or "").strip().lower(): (v.strip() if isinstance(v, str) else v)
-                    for k, v in raw.items() }
-
-            symbol = (row.get("symbol") or default_symbol).strip()
-
-            if has_ts:
-                ts_str = row["timestamp"]
-                try:
-                    ts = datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
-                except Exception:
-                    ts = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
-                if ts.tzinfo is None:
-                    ts = ts.replace(tzinfo=timezone.utc)
-            else:
-                d: date = date.fromisoformat(row["date"])
-                ts = datetime(d.year, d.month, d.day, tzinfo=timezone.utc)
-
-            vol_raw = row["volume"]
-            try:
-                volume = int(vol_raw)
-            except ValueError:
-                volume = int(float(vol_raw))
-
-            yield {
-                "symbol": symbol,
-                "ts": ts,
-                "open": float(row["open"]),
-                "high": float(row["high"]),
-                "low": float(row["low"]),
-                "close": float(row["close"]),
-                "volume": volume,
-            }
+
+def columns_from_csv(csv_path: str, default_symbol: str, chunk_rows: int = CHUNK_ROWS,
+                     workers: int = 1) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Parse a candle CSV into column chunks: `symbol` (str), `ts` (int64 UTC epoch seconds),
+    float64 OHLC and int64 volume. Column positions and the timestamp format are resolved
+    once from the header and first row; each chunk of about `chunk_rows` rows (sized in bytes
+    from the first row) is then parsed by numpy's C reader into a structured array, and
+    timestamps convert in one cast.
+
+    With `workers > 1` the file is split into byte ranges parsed by a process pool (chunks
+    still come back in file order). This assumes no quoted field contains a newline, which
+    holds for every file the fetch jobs write.
+    """
+    p, layout, header_end, row_bytes = _open_csv(csv_path)
+
+    if workers > 1:
+        size = p.stat().st_size
+        parts = max(workers, -(-(size - header_end) // RANGE_BYTES))
+        bounds = np.linspace(header_end, size, parts + 1).astype(np.int64).tolist()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield from pool.map(_parse_range, itertools.repeat(str(p)), bounds[:-1], bounds[1:],
+                                itertools.repeat(layout), itertools.repeat(default_symbol))
+        return
+
+    for lines in _line_chunks(str(p), header_end, None, max(1, chunk_rows) * row_bytes):
+        chunk = _parse_block(lines, layout, default_symbol)
+        if len(chunk["ts"]):
+            yield chunk
+
+
+def series_from_csv(csv_path: str, default_symbol: str, workers: int = 1) -> CandleSeries:
+    """Whole file as a sorted CandleSeries; the file must hold a single symbol."""
+    chunks = [c for c in columns_from_csv(csv_path, default_symbol, workers=workers) if len(c["ts"])]
+    if not chunks:
+        return CandleSeries.empty(default_symbol)
+    symbols = set(np.unique(np.concatenate([np.unique(c["symbol"]) for c in chunks])).tolist())
+    if len(symbols) > 1:
+        raise ValueError(f"{csv_path} holds several symbols ({sorted(symbols)}); use columns_from_csv")
+    cols = {c: np.concatenate([ch[c] for ch in chunks]) for c in CandleSeries.COLUMNS}
+    return CandleSeries.from_columns(symbols.pop(), cols, sort=True)
+
+
+def series_batches_from_csv(csv_path: str, default_symbol: str, chunk_rows: int = CHUNK_ROWS,
+                            workers: int = 1) -> Iterator[CandleSeries]:
+    """
+    columns_from_csv chunks as CandleSeries (one per symbol in a chunk) for the Mongo ingest,
+    so no row dicts are built before upsert_many. Each batch is sorted by ts (a newest-first
+    file is reversed, a repeated ts keeps its last row) like every CandleSeries.
+    """
+    for chunk in columns_from_csv(csv_path, default_symbol, chunk_rows, workers):
+        symbols = chunk["symbol"]
+        if not len(symbols):
+            continue
+        if (symbols == symbols[0]).all():
+            yield _sorted_series(str(symbols[0]), chunk)
+            continue
+        for sym in np.unique(symbols).tolist():
+            keep = symbols == sym
+            yield _sorted_series(sym, {c: chunk[c][keep] for c in CandleSeries.COLUMNS})
+
+
+def _sorted_series(symbol: str, cols: Dict[str, np.ndarray]) -> CandleSeries:
+    # Oldest-first files (the usual case) are already strictly increasing: skip the sort copy.
+    ts = cols["ts"]
+    return CandleSeries.from_columns(symbol, cols, sort=not bool((ts[1:] > ts[:-1]).all()))
+
+
+def docs_from_csv(csv_path: str, default_symbol: str, chunk_rows: int = CHUNK_ROWS,
+                  workers: int = 1) -> Iterator[Dict[str, Any]]:
+    """Row dicts (tz-aware UTC `ts`) for the Mongo ingest, parsed chunk-wise by columns_from_csv."""
+    for chunk in columns_from_csv(csv_path, default_symbol, chunk_rows, workers):
+        naive = chunk["ts"].astype("datetime64[s]").astype(object)
+        for sym, dt, o, h, l, c, v in zip(chunk["symbol"].tolist(), naive, chunk["open"].tolist(),
+                                          chunk["high"].tolist(), chunk["low"].tolist(),
+                                          chunk["close"].tolist(), chunk["volume"].tolist()):
+            yield {"symbol": sym, "ts": dt.replace(tzinfo=timezone.utc),
+                   "open": o, "high": h, "low": l, "close": c, "volume": v}
@@ -4,7 +4,7 @@ from typing import Dict, List, Any
 
 from config.config import ConfigLoader
 from db.mongo import get_repo
-from models.ctx import Ctx
+from models.ctx import Ctx, build_indicators_ctx, build_resample_ctx, build_universe_ctx
 
 
 def utc_now():
@@ -19,7 +19,10 @@ def main():
     repo = get_repo(cfg.mongo.uri, cfg.mongo.db, cfg.mongo.ctx_collection)
     ctx_col = repo.col
 
-    docs: List[Dict[str, Any]] = [build_ctx("MSFT", 1), build_ctx("AAPL", 1)]
+    docs: List[Dict[str, Any]] = [build_ctx("MSFT", 1), build_ctx("AAPL", 1),
+                                  build_universe_ctx("mega_tech", 5, incremental=True),
+                                  build_resample_ctx("@mega_tech", 5, universe="mega_tech"),
+                                  build_indicators_ctx("@mega_tech", 5, universe="mega_tech")]
 
     result = ctx_col.insert_many(docs)
     print(f"Inserted {len(result.inserted_ids)} ctx docs:", result.inserted_ids)
@@ -1,9 +1,13 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import List, Any, Dict
+from datetime import datetime, timedelta, timezone
+from typing import List, Any, Dict, Optional
 
-import certifi
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
+from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError
+
+from resources import mongo_client
 
 
 @dataclass(frozen=True)
@@ -14,15 +18,106 @@ class MongoConfig:
 
 
 class CtxReader:
-    def __init__(self, cfg: MongoConfig):
-        self._client = MongoClient(cfg.uri, tlsCAFile=certifi.where())
+    def __init__(self, cfg: MongoConfig, client: Optional[MongoClient] = None):
+        self._client = client or mongo_client(cfg.uri)
         self._coll = self._client[cfg.db][cfg.collection]
+        # One lease per symbol (`_id`), held by the node that runs all of that symbol's jobs.
+        self._lanes = self._client[cfg.db][f"{cfg.collection}_lanes"]
+
+    @property
+    def collection(self) -> Collection:
+        return self._coll
 
     def list_jobs(self) -> List[Dict[str, Any]]:
         q = {"is_enabled": True}
         cur = self._coll.find(q)
         return list(cur)
 
+    def get(self, ctx_id: Any) -> Optional[Dict[str, Any]]:
+        return self._coll.find_one({"_id": ctx_id})
+
+    def claim(self, ctx_id: Any, owner: str, lease_sec: float, now: datetime,
+              not_run_since: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """
+        Atomically lease a due job to `owner`. Fails (returns None) when the job is disabled,
+        not due yet, or leased by another node whose lease hasn't expired. With `not_run_since`
+        a job that already ran at or after that time is not claimed again.
+        """
+        q: Dict[str, Any] = {
+            "_id": ctx_id,
+            "is_enabled": True,
+            "$and": [
+                {"$or": [{"next_run": None}, {"next_run": {"$lte": now}}]},
+                {"$or": [{"lease_until": None}, {"lease_until": {"$lte": now}}, {"lease_owner": owner}]},
+            ],
+        }
+        if not_run_since is not None:
+            q["$and"].append({"$or": [{"last_run": None}, {"last_run": {"$lt": not_run_since}}]})
+        return self._coll.find_one_and_update(
+            q,
+            {"$set": {"lease_owner": owner, "lease_until": now + timedelta(seconds=lease_sec)}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def heartbeat(self, owner: str, ctx_ids: List[Any], lease_sec: float, now: datetime) -> int:
+        """Extend the leases `owner` still holds; returns how many were extended."""
+        if not ctx_ids:
+            return 0
+        res = self._coll.update_many(
+            {"_id": {"$in": ctx_ids}, "lease_owner": owner},
+            {"$set": {"lease_until": now + timedelta(seconds=lease_sec)}},
+        )
+        return res.modified_count
+
+    def claim_lane(self, symbol: str, owner: str, lease_sec: float, now: datetime) -> Optional[Dict[str, Any]]:
+        """
+        Atomically lease `symbol`'s lane to `owner`, or extend the lease `owner` already holds.
+        Returns None while another node's lease on it hasn't expired.
+        """
+        try:
+            return self._lanes.find_one_and_update(
+                {"_id": symbol, "$or": [{"lease_until": None}, {"lease_until": {"$lte": now}},
+                                        {"lease_owner": owner}]},
+                {"$set": {"lease_owner": owner, "lease_until": now + timedelta(seconds=lease_sec)}},
+                upsert=True, return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # The lane document exists but didn't match: another node holds it.
+            return None
+
+    def get_lane(self, symbol: str) -> Optional[Dict[str, Any]]:
+        return self._lanes.find_one({"_id": symbol})
+
+    def heartbeat_lanes(self, owner: str, symbols: List[str], lease_sec: float, now: datetime) -> int:
+        """Extend the lane leases `owner` still holds; returns how many were extended."""
+        if not symbols:
+            return 0
+        res = self._lanes.update_many(
+            {"_id": {"$in": symbols}, "lease_owner": owner},
+            {"$set": {"lease_until": now + timedelta(seconds=lease_sec)}},
+        )
+        return res.modified_count
+
+    def release_lanes(self, owner: str, symbols: List[str]) -> None:
+        if symbols:
+            self._lanes.update_many({"_id": {"$in": symbols}, "lease_owner": owner},
+                                    {"$set": {"lease_owner": None, "lease_until": None}})
+
+    def mark_run(self, ctx_id: Any, last_run: Optional[datetime], next_run: Optional[datetime],
+                 owner: Optional[str] = None) -> bool:
+        """
+        Record run times. With `owner` the job's lease is released in the same update, and
+        nothing is written if the lease has meanwhile passed to another node.
+        """
+        q: Dict[str, Any] = {"_id": ctx_id}
+        update: Dict[str, Any] = {"next_run": next_run, "updated_at": datetime.now(timezone.utc)}
+        if last_run is not None:
+            update["last_run"] = last_run
+        if owner is not None:
+            q["lease_owner"] = owner
+            update.update(lease_owner=None, lease_until=None)
+        return self._coll.update_one(q, {"$set": update}).matched_count > 0
+
     @staticmethod
     def describe(ctx: Dict[str, Any]) -> str:
         return (
@@ -30,5 +125,6 @@ class CtxReader:
             f"op={ctx.get('op')}, "
             f"symbol={ctx.get('symbol')}, "
             f"next_run={ctx.get('next_run')}, "
+            f"lease={ctx.get('lease_owner')}, "
             f"enabled={ctx.get('is_enabled')})"
         )
@@ -0,0 +1,181 @@
+from __future__ import annotations
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from logging import getLogger
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import threading
+import time
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.collection import Collection
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = getLogger(__name__)
+
+Change = Tuple[Any, Optional[Dict[str, Any]]]  # (ctx _id, enabled doc or None when removed)
+
+
+class JobCatalog:
+    """
+    In-memory copy of the enabled ctx jobs, loaded once and then kept current from deltas.
+
+    Deltas come from a change stream when the deployment supports one (replica set/Atlas).
+    Otherwise the collection is polled every `poll_sec` for documents whose indexed
+    `updated_at` is at or after the last watermark, minus `overlap_sec` to allow for writer
+    clock skew. Polling can't see deletes or writers that skip `updated_at`, so a full resync
+    runs every `resync_sec`. Consumers drain the accumulated changes with `poll()`.
+    """
+
+    def __init__(self, coll: Collection, poll_sec: float = 60, resync_sec: float = 600,
+                 overlap_sec: float = 5, use_change_stream: bool = True,
+                 on_change: Optional[Callable[[], None]] = None):
+        self._coll = coll
+        self.poll_sec = poll_sec
+        self.resync_sec = resync_sec
+        self.overlap_sec = overlap_sec
+        self.use_change_stream = use_change_stream
+        self.on_change = on_change
+        self.mode = "poll"
+
+        self._jobs: Dict[Any, Dict[str, Any]] = {}
+        self._pending: "OrderedDict[Any, Optional[Dict[str, Any]]]" = OrderedDict()
+        self._watermark: Optional[datetime] = None
+        self._next_poll = 0.0
+        self._next_resync = 0.0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._coll.create_index([("updated_at", ASCENDING)], name="updated_at_1")
+        stream = None
+        if self.use_change_stream:
+            try:
+                # Open the stream before loading so nothing written in between is missed.
+                stream = self._coll.watch(full_document="updateLookup", max_await_time_ms=1000)
+                self.mode = "change_stream"
+            except (OperationFailure, NotImplementedError) as exc:
+                logger.info(f"Change streams unavailable ({exc}); polling updated_at instead")
+        self._resync()
+        if stream is not None:
+            self._thread = threading.Thread(target=self._watch, args=(stream,),
+                                            name="ctx-change-stream", daemon=True)
+            self._thread.start()
+        logger.info(f"Job catalog loaded {len(self._jobs)} jobs ({self.mode})")
+
+    def close(self) -> None:
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def has_changes(self) -> bool:
+        return bool(self._pending)
+
+    def poll(self) -> List[Change]:
+        """Changes since the previous call, in the order they were seen (latest state wins)."""
+        now = time.time()
+        try:
+            if now >= self._next_resync:
+                self._resync()
+            elif self.mode == "poll" and now >= self._next_poll:
+                self._poll_updates()
+        except PyMongoError as exc:
+            logger.error(f"Refreshing the job catalog failed: {exc!r}")
+        with self._lock:
+            changes = list(self._pending.items())
+            self._pending.clear()
+        return changes
+
+    # -------------------------- Internal helpers -----------------------------
+
+    def _set(self, ctx_id: Any, doc: Optional[Dict[str, Any]]) -> None:
+        # Caller holds the lock.
+        if doc is None or not doc.get("is_enabled"):
+            if self._jobs.pop(ctx_id, None) is not None:
+                self._pending[ctx_id] = None
+            return
+        if self._jobs.get(ctx_id) != doc:
+            self._jobs[ctx_id] = doc
+            self._pending.pop(ctx_id, None)
+            self._pending[ctx_id] = doc
+
+    def _notify(self) -> None:
+        if self._pending and self.on_change is not None:
+            self.on_change()
+
+    def _resync(self) -> None:
+        started = datetime.now(timezone.utc)
+        docs = {d["_id"]: d for d in self._coll.find({"is_enabled": True})}
+        latest = self._coll.find_one({"updated_at": {"$ne": None}}, projection={"updated_at": 1},
+                                     sort=[("updated_at", DESCENDING)])
+        with self._lock:
+            for ctx_id in set(self._jobs) - set(docs):
+                self._set(ctx_id, None)
+            for ctx_id, doc in docs.items():
+                self._set(ctx_id, doc)
+            self._watermark = _aware(latest["updated_at"]) if latest else started
+        now = time.time()
+        self._next_poll = now + self.poll_sec
+        self._next_resync = now + self.resync_sec
+        self._notify()
+
+    def _poll_updates(self) -> None:
+        since = self._watermark - timedelta(seconds=self.overlap_sec)
+        cur = self._coll.find({"updated_at": {"$gte": since}}, sort=[("updated_at", ASCENDING)])
+        with self._lock:
+            for doc in cur:
+                self._set(doc["_id"], doc)
+                self._watermark = max(self._watermark, _aware(doc["updated_at"]))
+        self._next_poll = time.time() + self.poll_sec
+        self._notify()
+
+    def _watch(self, stream: Any) -> None:
+        while not self._closed.is_set():
+            try:
+                with stream:
+                    while not self._closed.is_set():
+                        change = stream.try_next()
+                        if change is not None:
+                            self._apply_change(change)
+                return
+            except PyMongoError as exc:
+                if self._closed.is_set():
+                    return
+                logger.warning(f"Ctx change stream interrupted ({exc!r}); resuming")
+                token = getattr(stream, "resume_token", None)
+                stream = self._reopen(token)
+
+    def _reopen(self, token: Any) -> Any:
+        while not self._closed.is_set():
+            try:
+                return self._coll.watch(full_document="updateLookup", resume_after=token,
+                                        max_await_time_ms=1000)
+            except PyMongoError as exc:
+                if token is not None:
+                    # The token fell off the oplog: start a fresh stream and resync everything.
+                    logger.warning(f"Cannot resume ctx change stream ({exc!r}); resyncing")
+                    token = None
+                    self._next_resync = 0.0
+                    continue
+                time.sleep(self.overlap_sec)
+        return None
+
+    def _apply_change(self, change: Dict[str, Any]) -> None:
+        op = change.get("operationType")
+        if op in ("drop", "rename", "dropDatabase", "invalidate"):
+            self._next_resync = 0.0
+            if self.on_change is not None:
+                self.on_change()
+            return
+        ctx_id = change.get("documentKey", {}).get("_id")
+        with self._lock:
+            self._set(ctx_id, None if op == "delete" else change.get("fullDocument"))
+        self._notify()
+
+
+def _aware(dt: datetime) -> datetime:
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
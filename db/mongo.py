@@ -1,13 +1,21 @@
 # mongo_client.py
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Iterable, Mapping, Any, List, Dict, Optional, Tuple
-from datetime import datetime, timezone
-from urllib.parse import urlparse
+from typing import Iterable, Iterator, Mapping, Any, List, Dict, Optional, Sequence, Tuple
+from datetime import datetime, timezone, timedelta
 import os
+import threading
 
-from pymongo import MongoClient, ASCENDING, UpdateOne
-import certifi
+from pymongo import MongoClient, ASCENDING, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure
+import bson
+import numpy as np
+
+from candle_cache import CandleCache
+from indicators import specs_key
+from resources import mongo_client
+from models.candle_series import CandleSeries
+from resample import DAY, IntervalLike, interval_label, parse_interval, resample
 
 
 @dataclass(frozen=True)
@@ -16,30 +24,190 @@ class MongoConfig:
     db: str
     collection: str
     app_name: Optional[str] = "stocker-app"
+    timeseries: bool = False
+    granularity: str = "minutes"
+
+
+# Fields of a stored candle besides `_id`: all a read cache window can give back.
+_DOC_KEYS = frozenset(("symbol", *CandleSeries.COLUMNS))
+
+# Arbitrary updates on time-series collections (filter on ts, $set OHLCV) arrived in 7.0.
+TIMESERIES_MIN_SERVER = (7, 0)
+
+
+def granularity_for(minutes: int) -> str:
+    """Time-series bucket granularity for bars of `minutes` length."""
+    if minutes < 1:
+        return "seconds"
+    return "minutes" if minutes < 60 * 24 else "hours"
+
+
+def _plan_stages(plan: Dict[str, Any]) -> str:
+    stages = []
+    while plan:
+        stages.append(plan.get("stage", "?"))
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return " <- ".join(stages)
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _ts_key(ts: datetime) -> int:
+    """Epoch milliseconds (Mongo's datetime precision); naive values are UTC."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (ts - _EPOCH) // timedelta(milliseconds=1)
+
+
+# BSON element types that can appear in a projected candle document, with their value widths.
+_BSON_FIXED = {0x01: ("<f8", 8), 0x09: ("<i8", 8), 0x10: ("<i4", 4), 0x12: ("<i8", 8)}
+
+
+def _projection(fields: Optional[Sequence[str]]) -> Dict[str, int]:
+    if not fields:
+        return {"_id": 0}
+    return {"_id": 0, **{f: 1 for f in fields}}
+
+
+def _documents(series: CandleSeries, fields: Optional[Sequence[str]]) -> List[Dict[str, Any]]:
+    """`series` as find() returns it with _projection(fields): naive UTC `ts`, no `_id`."""
+    cols = {"symbol": [series.symbol] * len(series), "ts": series.datetimes().astype(object).tolist(),
+            **{c: getattr(series, c).tolist() for c in CandleSeries.COLUMNS[1:]}}
+    keys = [k for k in cols if not fields or k in fields]
+    return [dict(zip(keys, row)) for row in zip(*(cols[k] for k in keys))]
+
 
+def _fixed_layout(raw: bytes, fields: Sequence[str]) -> Optional[np.ndarray]:
+    """
+    View a raw batch as a structured array when every document has the same byte layout
+    (same keys, order and value types), which is the normal case for a projected candle
+    collection. Returns None when the layout differs or holds a variable-width value.
+    """
+    size = int.from_bytes(raw[:4], "little")
+    if size < 5 or len(raw) % size:
+        return None
+    names, formats, offsets = [], [], []
+    skeleton = np.ones(size, dtype=bool)
+    pos = 4
+    while raw[pos] != 0:
+        kind = raw[pos]
+        end = raw.index(0, pos + 1)
+        if kind not in _BSON_FIXED:
+            return None
+        fmt, width = _BSON_FIXED[kind]
+        names.append(raw[pos + 1:end].decode())
+        formats.append(fmt)
+        offsets.append(end + 1)
+        skeleton[end + 1:end + 1 + width] = False
+        pos = end + 1 + width
+    if pos != size - 1 or not set(fields) <= set(names):
+        return None
+    rows = np.frombuffer(raw, dtype=np.uint8).reshape(-1, size)
+    if not (rows[:, skeleton] == rows[0, skeleton]).all():
+        return None
+    dtype = np.dtype({"names": names, "formats": formats, "offsets": offsets, "itemsize": size})
+    return np.frombuffer(raw, dtype=dtype)
 
-def _mask(uri: str) -> str:
-    u = urlparse(uri)
-    if "@" in u.netloc:
-        _, host = u.netloc.split("@", 1)
-        return f"{u.scheme}://***:***@{host}{u.path or ''}{'?' + u.query if u.query else ''}"
-    return uri
+
+def _decode_raw_batch(raw: bytes, fields: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Typed columns from one raw BSON batch; `ts` becomes int64 epoch seconds."""
+    dtypes = CandleSeries.DTYPES
+    records = _fixed_layout(raw, fields) if raw else None
+    if records is not None:
+        cols = {f: records[f] for f in fields}
+        if "ts" in cols:
+            cols["ts"] = cols["ts"] // 1000
+        return {f: np.ascontiguousarray(c, dtype=dtypes.get(f, c.dtype)) for f, c in cols.items()}
+
+    docs = bson.decode_all(raw) if raw else []
+    out: Dict[str, np.ndarray] = {}
+    for f in fields:
+        if f == "ts":
+            out[f] = np.array([_ts_key(d["ts"]) // 1000 for d in docs], dtype=np.int64)
+        else:
+            out[f] = np.array([d.get(f) for d in docs], dtype=dtypes.get(f, object))
+    return out
 
 
 class MongoPriceRepo:
-    def __init__(self, cfg: MongoConfig):
-        print("Connecting to Mongo:", _mask(cfg.uri))
-
-        self.client = MongoClient(
-            cfg.uri,
-            appname=cfg.app_name or "stocker-app",
-            serverSelectionTimeoutMS=60000,
-            connectTimeoutMS=30000,
-            socketTimeoutMS=30000,
-            tlsCAFile=certifi.where(),
-        )
+    def __init__(self, cfg: MongoConfig, client: Optional[MongoClient] = None):
+        # Collections share the process-wide client (and pool) for their URI.
+        self.client = client or mongo_client(cfg.uri, cfg.app_name)
         self.db = self.client[cfg.db]
         self.col = self.db[cfg.collection]
+        self.timeseries = cfg.timeseries
+        self.granularity = cfg.granularity
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+        self.read_cache: Optional[CandleCache] = None
+        self._cached_docs = True
+        self.dirty_consumers: Tuple[str, ...] = ()
+
+    def enable_read_cache(self, max_bars: int = 1_000_000, open_ttl_sec: float = 60) -> CandleCache:
+        """
+        Serve reads through an in-process CandleCache kept current by upsert_many: the series
+        reads (fetch_range_series, latest_n_series and what builds on them) and the document
+        reads fetch_range / latest_n, rebuilt from the cached columns in the shape Mongo
+        returns them. The cache only holds the candle fields (symbol, ts, OHLCV), so document
+        reads asking for other fields, or on a repo that has written any, go to Mongo.
+        """
+        if self.read_cache is None:
+            self.read_cache = CandleCache(max_bars, open_ttl_sec)
+        return self.read_cache
+
+    def ensure_schema(self) -> None:
+        """
+        Idempotently provision the candles collection: optionally as a native time-series
+        collection (metaField=symbol, timeField=ts), and always with a {symbol:1, ts:1} index
+        (unique on regular collections) backing upserts, range reads and latest_n.
+        Called lazily on first use so the same repo class can wrap non-candle collections.
+        Time-series mode needs MongoDB 7.0+: older servers reject the updates (filtered on the
+        timeField, setting measurement fields) that upsert_many sends for revised bars.
+        """
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            if self.timeseries:
+                version = tuple(self.client.server_info().get("versionArray", (0,))[:2])
+                if version < TIMESERIES_MIN_SERVER:
+                    raise RuntimeError(
+                        f"timeseries = true needs MongoDB {'.'.join(map(str, TIMESERIES_MIN_SERVER))}+ "
+                        f"to revise stored bars; this server is {'.'.join(map(str, version))}. "
+                        f"Set timeseries = false under [mongo] or upgrade the server.")
+                try:
+                    self.db.create_collection(self.col.name, timeseries={
+                        "timeField": "ts", "metaField": "symbol", "granularity": self.granularity,
+                    })
+                except CollectionInvalid:
+                    pass  # already exists
+            keys = [("symbol", ASCENDING), ("ts", ASCENDING)]
+            if self.timeseries:
+                # Time-series collections don't support unique indexes.
+                self.col.create_index(keys, name="symbol_1_ts_1")
+            else:
+                try:
+                    self.col.create_index(keys, name="symbol_1_ts_1", unique=True)
+                except OperationFailure as exc:
+                    if exc.code not in (11000, 85, 86):
+                        raise
+                    print(f"Could not create unique (symbol, ts) index on {self.col.name}: {exc}. "
+                          "Remove duplicate candles and restart.")
+            self._schema_ready = True
+
+    def explain_plans(self, symbol: str) -> Dict[str, str]:
+        """Winning plan stages of the repo's read/upsert queries, e.g. to confirm IXSCAN over COLLSCAN."""
+        self.ensure_schema()
+        now = datetime.now(timezone.utc)
+        queries = {
+            "upsert_filter": self.col.find({"symbol": symbol, "ts": now}),
+            "fetch_range": self.col.find({"symbol": symbol, "ts": {"$gte": now - timedelta(days=30), "$lte": now}})
+                               .sort("ts", ASCENDING),
+            "latest_n": self.col.find({"symbol": symbol}).sort("ts", -1).limit(1),
+        }
+        return {name: _plan_stages(cur.explain()["queryPlanner"]["winningPlan"])
+                for name, cur in queries.items()}
 
     def ping(self) -> bool:
         try:
@@ -50,74 +218,430 @@ class MongoPriceRepo:
             return False
 
     def close(self) -> None:
-        self.client.close()
-
-    def upsert_many(self, docs: Iterable[Mapping[str, Any]], ordered: bool = False) -> Dict[str, int]:
-        ops: List[UpdateOne] = []
-        for d in docs:
-            sym = d.get("symbol")
-            ts = d.get("ts")
-            if not sym or not isinstance(sym, str):
-                raise ValueError("doc missing 'symbol' (str)")
-            if not isinstance(ts, datetime):
-                raise ValueError("doc missing 'ts' (datetime)")
-            if ts.tzinfo is None:
-                d = {**d, "ts": ts.replace(tzinfo=timezone.utc)}
-            ops.append(UpdateOne({"symbol": d["symbol"], "ts": d["ts"]},
-                                 {"$set": dict(d)}, upsert=True))
+        """Drop this repo's cached reads; the shared client stays open until resources.shutdown()."""
+        if self.read_cache is not None:
+            self.read_cache.invalidate()
+
+    def upsert_many(self, docs: Iterable[Mapping[str, Any]] | CandleSeries, ordered: bool = False,
+                    skip_unchanged: bool = True) -> Dict[str, int]:
+        """
+        Write candles keyed by (symbol, ts). With `skip_unchanged` (default) the stored bars in the
+        batch's time range are read back in one ranged query per symbol; new bars are inserted,
+        changed bars get a `$set`, and identical bars are not sent at all. Time-series
+        collections always take this path since they don't support upserts.
+        """
+        self.ensure_schema()
+        if isinstance(docs, CandleSeries):
+            # Fresh dicts with a str symbol and tz-aware ts; only a repeated ts needs handling.
+            rows = docs.to_docs()
+            unique = len(np.unique(docs.ts)) == len(docs)
+        else:
+            rows = []
+            for d in docs:
+                sym = d.get("symbol")
+                ts = d.get("ts")
+                if not sym or not isinstance(sym, str):
+                    raise ValueError("doc missing 'symbol' (str)")
+                if not isinstance(ts, datetime):
+                    raise ValueError("doc missing 'ts' (datetime)")
+                if ts.tzinfo is None:
+                    d = {**d, "ts": ts.replace(tzinfo=timezone.utc)}
+                rows.append(dict(d))
+            unique = False
+        if not unique:
+            # Duplicate (symbol, ts) rows in one batch (a revised bar): the last one wins, as it
+            # would across batches.
+            latest = {(d["symbol"], _ts_key(d["ts"])): d for d in rows}
+            if len(latest) < len(rows):
+                rows = list(latest.values())
+        if not rows:
+            return {"matched": 0, "upserted": 0, "modified": 0, "unchanged": 0}
+        if self.read_cache is None:
+            return self._write(rows, ordered, skip_unchanged)
+        if self._cached_docs and any(k not in _DOC_KEYS for d in rows for k in d):
+            self._cached_docs = False  # documents carry fields the cache can't return
+
+        try:
+            res = self._write(rows, ordered, skip_unchanged)
+        except BaseException:
+            for sym in {d["symbol"] for d in rows}:
+                self.read_cache.invalidate(sym)
+            raise
+        self.read_cache.apply(rows)
+        return res
+
+    def _write(self, rows: List[Dict[str, Any]], ordered: bool, skip_unchanged: bool) -> Dict[str, int]:
+        if not skip_unchanged and not self.timeseries:
+            ops = [UpdateOne({"symbol": d["symbol"], "ts": d["ts"]}, {"$set": d}, upsert=True)
+                   for d in rows]
+            res = self.col.bulk_write(ops, ordered=ordered)
+            self._mark_dirty(rows)
+            return {"matched": res.matched_count, "upserted": len(res.upserted_ids or {}),
+                    "modified": res.modified_count, "unchanged": res.matched_count - res.modified_count}
+
+        stored = self._stored_for(rows)
+        ops: List[Any] = []
+        sent: List[Dict[str, Any]] = []
+        matched = unchanged = 0
+        for d in rows:
+            existing = stored.get((d["symbol"], _ts_key(d["ts"])))
+            if existing is None:
+                ops.append(InsertOne(d))
+                sent.append(d)
+                continue
+            matched += 1
+            if all(existing.get(k) == v for k, v in d.items() if k not in ("symbol", "ts")):
+                unchanged += 1
+            else:
+                ops.append(UpdateOne({"symbol": d["symbol"], "ts": d["ts"]}, {"$set": d}))
+                sent.append(d)
         if not ops:
-            return {"matched": 0, "upserted": 0}
-        res = self.col.bulk_write(ops, ordered=ordered)
-        return {"matched": res.matched_count, "upserted": len(res.upserted_ids or {})}
+            return {"matched": matched, "upserted": 0, "modified": 0, "unchanged": unchanged}
 
-    def fetch_range(self, symbol: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
-        if start.tzinfo is None: start = start.replace(tzinfo=timezone.utc)
-        if end.tzinfo is None: end = end.replace(tzinfo=timezone.utc)
-        cur = self.col.find(
-            {"symbol": symbol, "ts": {"$gte": start, "$lte": end}},
-            projection={"_id": 0}
-        ).sort("ts", ASCENDING)
-        return list(cur)
-
-    def latest_n(self, symbol: str, n: int) -> List[Dict[str, Any]]:
-        rows = list(self.col.find({"symbol": symbol}, projection={"_id": 0})
+        try:
+            res = self.col.bulk_write(ops, ordered=ordered)
+        except BulkWriteError as exc:
+            errors = exc.details.get("writeErrors", [])
+            if not errors or any(e.get("code") != 11000 for e in errors):
+                raise
+            inserted, modified = exc.details.get("nInserted", 0), exc.details.get("nModified", 0)
+            # Rows are unique per batch, so a duplicate key means another writer inserted that
+            # (symbol, ts) after _stored_for read it: write our values over theirs. An ordered
+            # bulk stops at its first error, so everything after it is replayed too.
+            first = min(e["index"] for e in errors)
+            redo = range(first, len(ops)) if ordered else sorted(e["index"] for e in errors)
+            res = self.col.bulk_write([
+                UpdateOne({"symbol": sent[i]["symbol"], "ts": sent[i]["ts"]},
+                          {"$set": {k: v for k, v in sent[i].items() if k != "_id"}}, upsert=True)
+                for i in redo
+            ], ordered=ordered)
+            counts = {"matched": matched + res.matched_count,
+                      "upserted": inserted + len(res.upserted_ids or {}),
+                      "modified": modified + res.modified_count, "unchanged": unchanged}
+        else:
+            counts = {"matched": matched, "upserted": res.inserted_count, "modified": res.modified_count,
+                      "unchanged": unchanged}
+        self._mark_dirty(sent)
+        return counts
+
+    def _stored_for(self, rows: List[Dict[str, Any]]) -> Dict[Tuple[str, int], Dict[str, Any]]:
+        fields = {k for d in rows for k in d}
+        spans: Dict[str, Tuple[datetime, datetime]] = {}
+        for d in rows:
+            lo, hi = spans.get(d["symbol"], (d["ts"], d["ts"]))
+            spans[d["symbol"]] = (min(lo, d["ts"]), max(hi, d["ts"]))
+
+        stored: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        for sym, (lo, hi) in spans.items():
+            cur = self.col.find({"symbol": sym, "ts": {"$gte": lo, "$lte": hi}},
+                                projection={**{f: 1 for f in fields}, "_id": 0})
+            for doc in cur:
+                stored[(sym, _ts_key(doc["ts"]))] = doc
+        return stored
+
+    def iter_range(self, symbol: str, start: datetime, end: datetime, batch_size: int = 5000,
+                   fields: Optional[Sequence[str]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream documents with start <= ts <= end in ts order, `batch_size` per server round trip.
+        Only one batch is held in memory; `fields` limits the returned keys.
+        """
+        self.ensure_schema()
+        cur = self.col.find(self._range_filter(symbol, start, end), projection=_projection(fields),
+                            sort=[("ts", ASCENDING)], batch_size=batch_size)
+        try:
+            yield from cur
+        finally:
+            cur.close()
+
+    def fetch_range(self, symbol: str, start: datetime, end: datetime,
+                    fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Documents with start <= ts <= end in ts order, without `_id`; from the read cache when on."""
+        if self._serves_docs(fields):
+            return _documents(self.fetch_range_series(symbol, start, end), fields)
+        return list(self.iter_range(symbol, start, end, fields=fields))
+
+    def fetch_range_columns(self, symbol: str, start: datetime, end: datetime,
+                            fields: Sequence[str] = CandleSeries.COLUMNS,
+                            batch_size: int = 50000) -> Dict[str, np.ndarray]:
+        """
+        Columnar read: raw BSON batches are decoded straight into typed numpy arrays
+        (`ts` as int64 epoch seconds) without building a dict per document.
+        """
+        self.ensure_schema()
+        fields = tuple(dict.fromkeys(("ts", *fields)))
+        cur = self.col.find_raw_batches(self._range_filter(symbol, start, end),
+                                        projection=_projection(fields),
+                                        sort=[("ts", ASCENDING)], batch_size=batch_size)
+        parts = [_decode_raw_batch(raw, fields) for raw in cur]
+        if not parts:
+            return {f: np.empty(0, dtype=CandleSeries.DTYPES.get(f, object)) for f in fields}
+        return {f: np.concatenate([p[f] for p in parts]) for f in fields}
+
+    def fetch_range_series(self, symbol: str, start: datetime, end: datetime) -> CandleSeries:
+        if self.read_cache is not None:
+            return self.read_cache.range(symbol, start, end,
+                                         lambda lo, hi: self._load_range(symbol, lo, hi))
+        return CandleSeries.from_columns(symbol, self.fetch_range_columns(symbol, start, end))
+
+    def latest_n(self, symbol: str, n: int, fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """The newest `n` stored documents, oldest first; from the read cache when on."""
+        if self._serves_docs(fields):
+            return _documents(self.latest_n_series(symbol, n), fields)
+        self.ensure_schema()
+        rows = list(self.col.find({"symbol": symbol}, projection=_projection(fields))
                     .sort("ts", -1).limit(n))
         rows.reverse()
         return rows
 
-_repo: Optional[MongoPriceRepo] = None
-_repo_key: Optional[Tuple[str, str, str, Optional[str]]] = None  # (uri, db, collection, app_name)
+    def latest_n_series(self, symbol: str, n: int) -> CandleSeries:
+        if self.read_cache is not None:
+            return self.read_cache.latest(symbol, n, lambda k: self._load_latest(symbol, k))
+        return self._load_latest(symbol, n)
+
+    def fetch_resampled(self, symbol: str, start: datetime, end: datetime, interval: IntervalLike,
+                        session: str = "extended", tz: str = "America/New_York") -> CandleSeries:
+        """
+        `interval` bars labelled start <= ts <= end, aggregated on the fly from the stored bars
+        (see resample.resample). Reads go through the read cache when it is enabled.
+        """
+        minutes = parse_interval(interval)
+        if end.tzinfo is None: end = end.replace(tzinfo=timezone.utc)
+        # The last bucket extends past `end`; a daily bar's session ends the next UTC day.
+        span = timedelta(days=2) if minutes == DAY else timedelta(minutes=minutes)
+        bars = self.fetch_range_series(symbol, start, end + span - timedelta(seconds=1))
+        return resample(bars, minutes, session, tz).between(start, end)
+
+    def earliest_ts(self, symbol: str) -> Optional[datetime]:
+        self.ensure_schema()
+        row = self.col.find_one({"symbol": symbol}, projection={"_id": 0, "ts": 1}, sort=[("ts", ASCENDING)])
+        if row is None:
+            return None
+        ts = row["ts"]
+        return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+    def latest_ts(self, symbol: str) -> Optional[datetime]:
+        if self.read_cache is not None:
+            series = self.latest_n_series(symbol, 1)
+            return series.end() if len(series) else None
+        rows = self.latest_n(symbol, 1, fields=("ts",))
+        if not rows:
+            return None
+        ts = rows[0]["ts"]
+        return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+    @property
+    def watermarks(self):
+        """`<collection>_watermarks`: newest stored ts per (symbol, bar interval), `_id` "SYM|5"."""
+        return self.db[f"{self.col.name}_watermarks"]
+
+    def watermark(self, symbol: str, minutes: int) -> Optional[datetime]:
+        """
+        Newest ts written for `symbol` by a `minutes`-bar fetch. Unlike latest_ts this doesn't
+        see bars of other intervals stored for the same symbol (a 1-min and a 5-min job).
+        """
+        row = self.watermarks.find_one({"_id": f"{symbol}|{int(minutes)}"}, projection={"ts": 1})
+        if row is None:
+            return None
+        ts = row["ts"]
+        return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+    def advance_watermarks(self, docs: Iterable[Mapping[str, Any]] | CandleSeries, minutes: int) -> None:
+        """Raise the (symbol, `minutes`) watermarks to the newest ts of just-stored `docs`."""
+        newest: Dict[str, datetime] = {}
+        if isinstance(docs, CandleSeries):
+            if len(docs):
+                newest[docs.symbol] = docs.end()
+        else:
+            for d in docs:
+                ts = d["ts"] if d["ts"].tzinfo else d["ts"].replace(tzinfo=timezone.utc)
+                if d["symbol"] not in newest or ts > newest[d["symbol"]]:
+                    newest[d["symbol"]] = ts
+        if not newest:
+            return
+        self.watermarks.bulk_write([
+            UpdateOne({"_id": f"{sym}|{int(minutes)}"},
+                      {"$max": {"ts": ts}, "$setOnInsert": {"symbol": sym, "interval": int(minutes)}},
+                      upsert=True)
+            for sym, ts in newest.items()
+        ], ordered=False)
+
+    def stored_intervals(self, symbol: str) -> List[int]:
+        """Bar intervals (minutes) that fetches have written for `symbol`, per its watermarks."""
+        return sorted(d["interval"] for d in self.watermarks.find({"symbol": symbol}, projection={"interval": 1}))
+
+    @property
+    def dirty(self):
+        """
+        `<collection>_dirty`: per (symbol, consumer), `_id` "SYM|resample:15min", the oldest ts
+        inserted or changed since that consumer last took its mark.
+        """
+        return self.db[f"{self.col.name}_dirty"]
+
+    def track_dirty(self, consumers: Iterable[str]) -> None:
+        """Keep dirty marks for `consumers` (jobs reading this collection incrementally) on every write."""
+        self.dirty_consumers = tuple(dict.fromkeys((*self.dirty_consumers, *consumers)))
+
+    def mark_dirty(self, since: Mapping[str, datetime], consumers: Sequence[str]) -> None:
+        """Lower the dirty marks of `consumers` to `since` ({symbol: ts})."""
+        if since and consumers:
+            self.dirty.bulk_write([
+                UpdateOne({"_id": f"{sym}|{c}"},
+                          {"$min": {"ts": ts}, "$setOnInsert": {"symbol": sym, "consumer": c}}, upsert=True)
+                for sym, ts in since.items() for c in consumers
+            ], ordered=False)
+
+    def take_dirty_since(self, symbol: str, consumer: str) -> Optional[datetime]:
+        """
+        Oldest ts written for `symbol` since `consumer`'s previous take, clearing its mark. A
+        consumer that fails before acting on it hands it back with mark_dirty.
+        """
+        row = self.dirty.find_one_and_delete({"_id": f"{symbol}|{consumer}"})
+        if row is None:
+            return None
+        ts = row["ts"]
+        return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+    def _mark_dirty(self, rows: List[Dict[str, Any]]) -> None:
+        # Marked after the write, so a consumer never takes a mark before its bars are readable.
+        # The bars are stored either way: a failed mark is reported, not raised.
+        if not self.dirty_consumers or not rows:
+            return
+        oldest: Dict[str, datetime] = {}
+        for d in rows:
+            if d["symbol"] not in oldest or d["ts"] < oldest[d["symbol"]]:
+                oldest[d["symbol"]] = d["ts"]
+        try:
+            self.mark_dirty(oldest, self.dirty_consumers)
+        except Exception as exc:
+            print(f"Could not mark {', '.join(sorted(oldest))} dirty in {self.dirty.name}: {exc}")
 
-def _resolve_cfg(uri: Optional[str], db: Optional[str], coll: Optional[str], app_name: Optional[str]) -> MongoConfig:
+    def _load_range(self, symbol: str, lo: int, hi: int) -> CandleSeries:
+        start = datetime.fromtimestamp(lo, timezone.utc)
+        end = datetime.fromtimestamp(hi, timezone.utc)
+        return CandleSeries.from_columns(symbol, self.fetch_range_columns(symbol, start, end))
+
+    def _load_latest(self, symbol: str, n: int) -> CandleSeries:
+        self.ensure_schema()
+        fields = CandleSeries.COLUMNS
+        cur = self.col.find_raw_batches({"symbol": symbol}, projection=_projection(fields),
+                                        sort=[("ts", -1)], limit=n)
+        parts = [_decode_raw_batch(raw, fields) for raw in cur]
+        if not parts:
+            return CandleSeries.empty(symbol)
+        cols = {f: np.concatenate([p[f] for p in parts])[::-1] for f in fields}
+        return CandleSeries.from_columns(symbol, cols)
+
+    def _serves_docs(self, fields: Optional[Sequence[str]]) -> bool:
+        return (self.read_cache is not None and self._cached_docs
+                and (not fields or all(f in _DOC_KEYS for f in fields)))
+
+    @staticmethod
+    def _range_filter(symbol: str, start: datetime, end: datetime) -> Dict[str, Any]:
+        if start.tzinfo is None: start = start.replace(tzinfo=timezone.utc)
+        if end.tzinfo is None: end = end.replace(tzinfo=timezone.utc)
+        return {"symbol": symbol, "ts": {"$gte": start, "$lte": end}}
+
+_repos: Dict[Tuple[str, str, str], MongoPriceRepo] = {}
+_repo_keys: Dict[Tuple[str, str, str], Tuple[Any, ...]] = {}  # -> (app_name, timeseries, granularity)
+_repos_lock = threading.Lock()
+
+def _resolve_cfg(uri: Optional[str], db: Optional[str], coll: Optional[str], app_name: Optional[str],
+                 timeseries: bool = False, granularity: str = "minutes") -> MongoConfig:
     uri = uri or os.getenv("MONGO_URI")
     db = (db or os.getenv("MONGO_DB") or "stocker").strip()
     coll = (coll or os.getenv("MONGO_COLLECTION") or "prices").strip()
     if not uri:
         raise SystemExit("Missing MONGO_URI (env or pass to get_repo)")
-    return MongoConfig(uri=uri, db=db, collection=coll, app_name=app_name or "stocker-app")
+    return MongoConfig(uri=uri, db=db, collection=coll, app_name=app_name or "stocker-app",
+                       timeseries=timeseries, granularity=granularity)
 
 def get_repo(uri: Optional[str] = None,
              db: Optional[str] = None,
              collection: Optional[str] = None,
-             app_name: Optional[str] = "stocker-app") -> MongoPriceRepo:
-    global _repo, _repo_key
-    cfg = _resolve_cfg(uri, db, collection, app_name)
-    key = (cfg.uri, cfg.db, cfg.collection, cfg.app_name)
-
-    if _repo is None:
-        repo = MongoPriceRepo(cfg)
-        if not repo.ping():
-            raise SystemExit("Mongo ping failed – check URI/network/firewall/TLS trust.")
-        _repo, _repo_key = repo, key
-        return _repo
-
-    if _repo_key != key:
-        raise RuntimeError("Mongo repo already initialized with a different config. Call reset_repo() first.")
-    return _repo
+             app_name: Optional[str] = "stocker-app",
+             timeseries: bool = False,
+             granularity: str = "minutes") -> MongoPriceRepo:
+    """One repo per (uri, db, collection); all repos on a URI share its MongoClient."""
+    cfg = _resolve_cfg(uri, db, collection, app_name, timeseries, granularity)
+    key = (cfg.uri, cfg.db, cfg.collection)
+    options = (cfg.app_name, cfg.timeseries, cfg.granularity)
+
+    with _repos_lock:
+        repo = _repos.get(key)
+        if repo is None:
+            repo = MongoPriceRepo(cfg)
+            if not repo.ping():
+                raise SystemExit("Mongo ping failed – check URI/network/firewall/TLS trust.")
+            _repos[key], _repo_keys[key] = repo, options
+            return repo
+
+        if _repo_keys[key] != options:
+            raise RuntimeError(f"Mongo repo for {cfg.db}.{cfg.collection} already initialized with "
+                               f"different options. Call reset_repo() first.")
+        return repo
+
+def resample_consumer(interval: IntervalLike) -> str:
+    """Dirty-mark consumer name of the resample job deriving `interval` bars from the candles."""
+    return f"resample:{interval_label(parse_interval(interval))}"
+
+def indicators_consumer(specs: Sequence[str]) -> str:
+    """Dirty-mark consumer name of the indicators job computing `specs`."""
+    return f"indicators:{specs_key(specs)}"
+
+def _bars_label(interval: IntervalLike) -> str:
+    return "base" if str(interval).strip().lower() == "base" else interval_label(parse_interval(interval))
+
+def _dirty_consumers(cfg: Any, label: str) -> List[str]:
+    # The configured jobs reading the `label` bars incrementally: every writer of them keeps
+    # their marks, and collections nobody reads that way get none.
+    consumers = [resample_consumer(i) for i in cfg.resample.intervals] if label == "base" else []
+    if label in {_bars_label(i) for i in cfg.indicators.intervals}:
+        consumers.append(indicators_consumer(cfg.indicators.specs))
+    return consumers
+
+def get_candles_repo(cfg: Any) -> MongoPriceRepo:
+    """
+    Candles repo for an AppConfig, honouring the [mongo] time-series and read cache options
+    and keeping dirty marks for the [resample] and [indicators] jobs that read it.
+    """
+    repo = get_repo(uri=cfg.mongo.uri,
+                    db=cfg.mongo.db,
+                    collection=cfg.mongo.candles_collection,
+                    timeseries=cfg.mongo.timeseries,
+                    granularity=cfg.mongo.granularity or granularity_for(cfg.intraday_minutes))
+    if cfg.mongo.read_cache_bars > 0:
+        repo.enable_read_cache(cfg.mongo.read_cache_bars, cfg.mongo.read_cache_ttl_sec)
+    repo.track_dirty(_dirty_consumers(cfg, "base"))
+    return repo
+
+def get_resampled_repo(cfg: Any, interval: IntervalLike) -> MongoPriceRepo:
+    """Repo of `interval` bars resampled from the candles collection, e.g. `prices_15min`."""
+    minutes = parse_interval(interval)
+    # Named after the collection the candles repo resolved ([mongo], MONGO_COLLECTION or "prices").
+    candles = get_candles_repo(cfg).col.name
+    repo = get_repo(uri=cfg.mongo.uri,
+                    db=cfg.mongo.db,
+                    collection=f"{candles}_{interval_label(minutes)}",
+                    timeseries=cfg.mongo.timeseries,
+                    granularity=granularity_for(minutes))
+    repo.track_dirty(_dirty_consumers(cfg, interval_label(minutes)))
+    return repo
+
+def get_bars_repo(cfg: Any, interval: IntervalLike) -> MongoPriceRepo:
+    """The candles repo for interval "base", else the resampled repo of `interval`."""
+    if str(interval).strip().lower() == "base":
+        return get_candles_repo(cfg)
+    return get_resampled_repo(cfg, interval)
+
+def get_indicators_repo(cfg: Any, interval: IntervalLike) -> MongoPriceRepo:
+    """Indicator rows, keyed by (symbol, ts) like their bars, e.g. `indicators_15min`."""
+    return get_repo(uri=cfg.mongo.uri,
+                    db=cfg.mongo.db,
+                    collection=f"{cfg.indicators.collection}_{_bars_label(interval)}")
 
 def reset_repo() -> None:
-    global _repo, _repo_key
-    if _repo is not None:
-        _repo.close()
-    _repo = None
-    _repo_key = None
+    with _repos_lock:
+        for repo in _repos.values():
+            repo.close()
+        _repos.clear()
+        _repo_keys.clear()
@@ -0,0 +1,354 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+import hashlib
+import re
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from models.candle_series import CandleSeries
+from resample import utc_offsets
+
+DEFAULT_SPECS = ("sma20", "ema20", "ema50", "rsi14", "atr14", "bb20", "vwap")
+
+Columns = Mapping[str, np.ndarray]
+
+
+def _ewm(x: np.ndarray, alpha: float, y0: float) -> np.ndarray:
+    """
+    y[k] = (1 - alpha) * y[k-1] + alpha * x[k], starting from y[-1] = y0, without a Python loop
+    per element: within a block y[k] = d^k * (y0 + alpha * cumsum(x[j] / d^j)) with d = 1 - alpha.
+    Blocks are kept short enough that d^-k stays below ~e^20, which keeps the cumsum exact to
+    float64 precision.
+    """
+    out = np.empty(len(x), dtype=np.float64)
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        out[:] = x
+        return out
+    block = max(1, min(4096, int(20.0 / -np.log(decay))))
+    powers = decay ** np.arange(1, block + 1)
+    for lo in range(0, len(x), block):
+        seg = x[lo:lo + block]
+        w = powers[:len(seg)]
+        out[lo:lo + len(seg)] = w * (y0 + alpha * np.cumsum(seg / w))
+        y0 = out[lo + len(seg) - 1]
+    return out
+
+
+class _Smoother:
+    """Exponential smoothing seeded with the mean of the first `n` values (NaN before that)."""
+
+    def __init__(self, n: int, alpha: float):
+        self.n = n
+        self.alpha = alpha
+        self.value: Optional[float] = None
+        self.warm: List[float] = []
+
+    def run(self, x: np.ndarray) -> np.ndarray:
+        out = np.full(len(x), np.nan)
+        start = 0
+        if self.value is None:
+            start = min(len(x), self.n - len(self.warm))
+            self.warm.extend(x[:start].tolist())
+            if len(self.warm) < self.n:
+                return out
+            self.value = float(np.mean(self.warm))
+            self.warm = []
+            out[start - 1] = self.value
+        if start < len(x):
+            out[start:] = _ewm(x[start:], self.alpha, self.value)
+            self.value = float(out[-1])
+        return out
+
+    def state(self) -> Dict[str, Any]:
+        return {"value": self.value, "warm": list(self.warm)}
+
+    def load(self, state: Mapping[str, Any]) -> None:
+        self.value = state["value"]
+        self.warm = list(state["warm"])
+
+
+class _Window:
+    """Carries the last n-1 values so rolling windows span update() calls."""
+
+    def __init__(self, n: int):
+        self.n = n
+        self.tail = np.empty(0, dtype=np.float64)
+
+    def extend(self, x: np.ndarray) -> Tuple[np.ndarray, int]:
+        """(tail + x, offset of x in it); the tail is advanced past x."""
+        full = np.concatenate((self.tail, x))
+        offset = len(self.tail)
+        self.tail = full[len(full) - min(len(full), self.n - 1):] if self.n > 1 else full[:0]
+        return full, offset
+
+    def state(self) -> Dict[str, Any]:
+        return {"tail": self.tail.tolist()}
+
+    def load(self, state: Mapping[str, Any]) -> None:
+        self.tail = np.asarray(state["tail"], dtype=np.float64)
+
+
+class _Indicator:
+    name: str
+    columns: Tuple[str, ...]
+
+    def update(self, cols: Columns) -> Dict[str, np.ndarray]:
+        raise NotImplementedError
+
+    def state(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def load(self, state: Mapping[str, Any]) -> None:
+        raise NotImplementedError
+
+
+class SMA(_Indicator):
+    def __init__(self, n: int = 20, source: str = "close"):
+        self.name = f"sma{n}"
+        self.columns = (self.name,)
+        self.source = source
+        self.window = _Window(n)
+
+    def update(self, cols: Columns) -> Dict[str, np.ndarray]:
+        n = self.window.n
+        full, offset = self.window.extend(cols[self.source].astype(np.float64))
+        out = np.full(len(full), np.nan)
+        if len(full) >= n:
+            out[n - 1:] = sliding_window_view(full, n).mean(axis=1)
+        return {self.name: out[offset:]}
+
+    def state(self) -> Dict[str, Any]:
+        return self.window.state()
+
+    def load(self, state: Mapping[str, Any]) -> None:
+        self.window.load(state)
+
+
+class EMA(_Indicator):
+    def __init__(self, n: int = 20, source: str = "close"):
+        self.name = f"ema{n}"
+        self.columns = (self.name,)
+        self.source = source
+        self.smoother = _Smoother(n, 2.0 / (n + 1))
+
+    def update(self, cols: Columns) -> Dict[str, np.ndarray]:
+        return {self.name: self.smoother.run(cols[self.source].astype(np.float64))}
+
+    def state(self) -> Dict[str, Any]:
+        return self.smoother.state()
+
+    def load(self, state: Mapping[str, Any]) -> None:
+        self.smoother.load(state)
+
+
+class _Diffs:
+    """Hands out close-to-previous-close pairs across update() calls."""
+
+    def __init__(self):
+        self.prev_close: Optional[float] = None
+
+    def previous(self, close: np.ndarray) -> np.ndarray:
+        """Previous close of each bar; NaN for the very first bar seen."""
+        prev = np.empty(len(close), dtype=np.float64)
+        if len(close):
+            prev[0] = np.nan if self.prev_close is None else self.prev_close
+            prev[1:] = close[:-1]
+            self.prev_close = float(close[-1])
+        return prev
+
+
+class RSI(_Indicator):
+    """Wilder's RSI: gains and losses smoothed with alpha = 1/n, seeded with their n-bar means."""
+
+    def __init__(self, n: int = 14):
+        self.name = f"rsi{n}"
+        self.columns = (self.name,)
+        self.diffs = _Diffs()
+        self.gain = _Smoother(n, 1.0 / n)
+        self.loss = _Smoother(n, 1.0 / n)
+
+    def update(self, cols: Columns) -> Dict[str, np.ndarray]:
+        close = cols["close"].astype(np.float64)
+        prev = self.diffs.previous(close)
+        out = np.full(len(close), np.nan)
+        has_prev = ~np.isnan(prev)  # only the first bar ever lacks one
+        d = (close - prev)[has_prev]
+        avg_gain = self.gain.run(np.maximum(d, 0.0))
+        avg_loss = self.loss.run(np.maximum(-d, 0.0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = np.where(avg_loss == 0.0, np.where(avg_gain == 0.0, 50.0, 100.0),
+                           100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+        out[has_prev] = np.where(np.isnan(avg_gain), np.nan, rsi)
+        return {self.name: out}
+
+    def state(self) -> Dict[str, Any]:
+        return {"prev_close": self.diffs.prev_close, "gain": self.gain.state(), "loss": self.loss.state()}
+
+    def load(self, state: Mapping[str, Any]) -> None:
+        self.diffs.prev_close = state["prev_close"]
+        self.gain.load(state["gain"])
+        self.loss.load(state["loss"])
+
+
+class ATR(_Indicator):
+    """Wilder's average true range; the first bar's true range is its high - low."""
+
+    def __init__(self, n: int = 14):
+        self.name = f"atr{n}"
+        self.columns = (self.name,)
+        self.diffs = _Diffs()
+        self.smoother = _Smoother(n, 1.0 / n)
+
+    def update(self, cols: Columns) -> Dict[str, np.ndarray]:
+        high = cols["high"].astype(np.float64)
+        low = cols["low"].astype(np.float64)
+        prev = self.diffs.previous(cols["close"].astype(np.float64))
+        tr = np.fmax(high - low, np.fmax(np.abs(high - prev), np.abs(low - prev)))
+        return {self.name: self.smoother.run(tr)}
+
+    def state(self) -> Dict[str, Any]:
+        return {"prev_close": self.diffs.prev_close, **self.smoother.state()}
+
+    def load(self, state: Mapping[str, Any]) -> None:
+        self.diffs.prev_close = state["prev_close"]
+        self.smoother.load(state)
+
+
+class Bollinger(_Indicator):
+    """n-bar SMA of close with bands `k` population standard deviations above and below."""
+
+    def __init__(self, n: int = 20, k: float = 2.0):
+        self.name = f"bb{n}"
+        self.columns = (f"{self.name}_mid", f"{self.name}_upper", f"{self.name}_lower")
+        self.k = k
+        self.window = _Window(n)
+
+    def update(self, cols: Columns) -> Dict[str, np.ndarray]:
+        n = self.window.n
+        full, offset = self.window.extend(cols["close"].astype(np.float64))
+        mid = np.full(len(full), np.nan)
+        std = np.full(len(full), np.nan)
+        if len(full) >= n:
+            windows = sliding_window_view(full, n)
+            mid[n - 1:] = windows.mean(axis=1)
+            std[n - 1:] = windows.std(axis=1)
+        mid, std = mid[offset:], std[offset:]
+        mid_col, upper_col, lower_col = self.columns
+        return {mid_col: mid, upper_col: mid + self.k * std, lower_col: mid - self.k * std}
+
+    def state(self) -> Dict[str, Any]:
+        return self.window.state()
+
+    def load(self, state: Mapping[str, Any]) -> None:
+        self.window.load(state)
+
+
+class VWAP(_Indicator):
+    """Volume-weighted typical price (h+l+c)/3, reset at each local trading day in `tz`."""
+
+    def __init__(self, tz: str = "America/New_York"):
+        self.name = "vwap"
+        self.columns = (self.name,)
+        self.tz = tz
+        self.day: Optional[int] = None
+        self.pv = 0.0
+        self.vol = 0.0
+
+    def update(self, cols: Columns) -> Dict[str, np.ndarray]:
+        ts = cols["ts"]
+        if not len(ts):
+            return {self.name: np.empty(0)}
+        day = (ts + utc_offsets(ts, self.tz)) // 86400
+        vol = cols["volume"].astype(np.float64)
+        pv = (cols["high"] + cols["low"] + cols["close"]) / 3.0 * vol
+        cpv, cvol = np.empty(len(ts)), np.empty(len(ts))
+
+        # Sums restart at every new day (one cumsum per day, not a running total minus
+        # offsets, which would lose precision); the first day may continue the last update.
+        bounds = np.concatenate(([0], np.flatnonzero(day[1:] != day[:-1]) + 1, [len(ts)]))
+        carry = self.day is not None and day[0] == self.day
+        for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            np.cumsum(pv[lo:hi], out=cpv[lo:hi])
+            np.cumsum(vol[lo:hi], out=cvol[lo:hi])
+            if carry:
+                cpv[lo:hi] += self.pv
+                cvol[lo:hi] += self.vol
+                carry = False
+
+        self.day, self.pv, self.vol = int(day[-1]), float(cpv[-1]), float(cvol[-1])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return {self.name: np.where(cvol > 0, cpv / cvol, np.nan)}
+
+    def state(self) -> Dict[str, Any]:
+        return {"day": self.day, "pv": self.pv, "vol": self.vol}
+
+    def load(self, state: Mapping[str, Any]) -> None:
+        self.day, self.pv, self.vol = state["day"], state["pv"], state["vol"]
+
+
+_SPEC = re.compile(r"^(sma|ema|rsi|atr|bb|vwap)(\d*)$")
+_DEFAULT_N = {"sma": 20, "ema": 20, "rsi": 14, "atr": 14, "bb": 20}
+
+
+def parse_spec(spec: str, tz: str = "America/New_York") -> _Indicator:
+    """Indicator from a spec like "sma20", "ema50", "rsi14", "atr14", "bb20" or "vwap"."""
+    m = _SPEC.match(spec.strip().lower())
+    if not m or (m.group(1) == "vwap" and m.group(2)):
+        raise ValueError(f"Unknown indicator {spec!r}; expected e.g. sma20, ema50, rsi14, atr14, bb20, vwap")
+    kind, digits = m.groups()
+    if kind == "vwap":
+        return VWAP(tz)
+    n = int(digits) if digits else _DEFAULT_N[kind]
+    if n < 1:
+        raise ValueError(f"Indicator period must be positive: {spec!r}")
+    return {"sma": SMA, "ema": EMA, "rsi": RSI, "atr": ATR, "bb": Bollinger}[kind](n)
+
+
+def _normalized(specs: Sequence[str]) -> Tuple[str, ...]:
+    return tuple(dict.fromkeys(s.strip().lower() for s in specs if s.strip()))
+
+
+def specs_key(specs: Sequence[str]) -> str:
+    """Short stable hash of `specs` (as IndicatorSet normalizes them), e.g. to name a checkpoint."""
+    return hashlib.sha1("|".join(_normalized(specs)).encode()).hexdigest()[:12]
+
+
+class IndicatorSet:
+    """
+    A group of indicators over one symbol's bars. `update()` takes the next bars in ts order
+    and returns each output column aligned to them; every indicator carries only a fixed-size
+    state (a few scalars or its last n-1 closes) between calls, so appending k bars costs
+    O(k) however long the history is. Each call is vectorized over its block, so computing
+    the full history in one call and feeding it bar by bar give the same values.
+    `state()`/`load()` round-trip that state through plain JSON/BSON types.
+    """
+
+    def __init__(self, specs: Sequence[str] = DEFAULT_SPECS, tz: str = "America/New_York"):
+        self.specs = _normalized(specs)
+        self.indicators = [parse_spec(s, tz) for s in self.specs]
+
+    @property
+    def columns(self) -> Tuple[str, ...]:
+        return tuple(c for ind in self.indicators for c in ind.columns)
+
+    def update(self, series: CandleSeries) -> Dict[str, np.ndarray]:
+        cols = series.columns()
+        out: Dict[str, np.ndarray] = {}
+        for ind in self.indicators:
+            out.update(ind.update(cols))
+        return out
+
+    def state(self) -> Dict[str, Any]:
+        return {spec: ind.state() for spec, ind in zip(self.specs, self.indicators)}
+
+    def load(self, state: Mapping[str, Any]) -> "IndicatorSet":
+        for spec, ind in zip(self.specs, self.indicators):
+            ind.load(state[spec])
+        return self
+
+
+def compute(series: CandleSeries, specs: Sequence[str] = DEFAULT_SPECS,
+            tz: str = "America/New_York") -> Dict[str, np.ndarray]:
+    """Indicator columns over a whole series in one vectorized pass."""
+    return IndicatorSet(specs, tz).update(series)
@@ -1,10 +1,12 @@
 # main.py
 #!/usr/bin/env python3
 from __future__ import annotations
+from dataclasses import replace
 
 from config.config_parser import parse_args
 from config.config import ConfigLoader
 from logger.logger import setup_logging, get_logger
+import resources
 from scheduler.scheduler import schedule
 
 def main():
@@ -12,9 +14,19 @@ def main():
     logger.info("Received args: %s", vars(args))
 
     cfg = ConfigLoader.load(args.config)
+    if args.format:
+        cfg = replace(cfg, output_format=args.format)
+    if args.daemon:
+        cfg = replace(cfg, scheduler=replace(cfg.scheduler, daemon=True))
     logger.info("Loaded config: %s", cfg)
 
-    schedule(cfg)
+    resources.configure(http_pool_size=cfg.http_pool_size,
+                        mongo_max_pool_size=cfg.mongo.max_pool_size,
+                        mongo_min_pool_size=cfg.mongo.min_pool_size)
+    try:
+        schedule(cfg)
+    finally:
+        resources.shutdown()
 
 if __name__ == "__main__":
     setup_logging()
@@ -1,5 +1,6 @@
-from dataclasses import dataclass
-from models import MongoSettings
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+from models import CacheSettings, CoverageSettings, IndicatorSettings, IngestSettings, MongoSettings, ResampleSettings, SchedulerSettings
 
 @dataclass(frozen=True)
 class AppConfig:
@@ -9,4 +10,15 @@ class AppConfig:
     symbol: str
     days: int
     intraday_minutes: int
-    mongo: MongoSettings
\ No newline at end of file
+    mongo: MongoSettings
+    calls_per_minute: int = 5
+    calls_per_day: Optional[int] = None
+    output_format: str = "csv"
+    http_pool_size: int = 10
+    scheduler: SchedulerSettings = field(default_factory=SchedulerSettings)
+    cache: CacheSettings = field(default_factory=CacheSettings)
+    ingest: IngestSettings = field(default_factory=IngestSettings)
+    universes: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+    resample: ResampleSettings = field(default_factory=ResampleSettings)
+    indicators: IndicatorSettings = field(default_factory=IndicatorSettings)
+    coverage: CoverageSettings = field(default_factory=CoverageSettings)
@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class CacheSettings:
+    enabled: bool = True
+    dir: str = ".cache/alpha_vantage"
+    max_mb: int = 512
+    recent_ttl_sec: int = 300
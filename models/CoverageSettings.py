@@ -0,0 +1,10 @@
+from dataclasses import dataclass
+from typing import Literal
+
+
+@dataclass(frozen=True)
+class CoverageSettings:
+    enabled: bool = True
+    collection: str = "coverage"
+    session: Literal["regular", "extended"] = "regular"
+    min_fill: float = 0.99
@@ -0,0 +1,10 @@
+from dataclasses import dataclass
+from typing import Tuple
+
+
+@dataclass(frozen=True)
+class IndicatorSettings:
+    specs: Tuple[str, ...] = ("sma20", "ema20", "ema50", "rsi14", "atr14", "bb20", "vwap")
+    intervals: Tuple[str, ...] = ("base",)
+    collection: str = "indicators"
+    chunk_days: int = 30
@@ -0,0 +1,10 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class IngestSettings:
+    batch_size: int = 1000
+    workers: int = 1
+    max_in_flight: int = 4
+    max_retries: int = 3
+    parse_workers: int = 1
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass(frozen=True)
@@ -7,4 +8,10 @@ class MongoSettings:
     db: str
     candles_collection: str
     ctx_collection: str
-    tasks_collection: str
\ No newline at end of file
+    tasks_collection: str
+    timeseries: bool = False
+    granularity: Optional[str] = None
+    read_cache_bars: int = 1_000_000
+    read_cache_ttl_sec: int = 60
+    max_pool_size: int = 100
+    min_pool_size: int = 0
@@ -0,0 +1,11 @@
+from dataclasses import dataclass
+from typing import Literal, Tuple
+
+
+@dataclass(frozen=True)
+class ResampleSettings:
+    intervals: Tuple[str, ...] = ("5min", "15min", "30min", "60min", "1d")
+    session: Literal["regular", "extended", "all"] = "extended"
+    daily_session: Literal["regular", "extended", "all"] = "regular"
+    tz: str = "America/New_York"
+    chunk_days: int = 30
@@ -0,0 +1,15 @@
+from dataclasses import dataclass
+from typing import Literal, Optional
+
+
+@dataclass(frozen=True)
+class SchedulerSettings:
+    max_in_flight: int = 1
+    daemon: bool = False
+    refresh_sec: int = 60
+    late_policy: Literal["coalesce", "skip"] = "coalesce"
+    late_grace_sec: int = 60
+    lease_sec: int = 300
+    node_id: Optional[str] = None
+    ctx_discovery: Literal["full", "incremental"] = "full"
+    resync_sec: int = 600
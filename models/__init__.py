@@ -1,4 +1,10 @@
-from .AppConfig import AppConfig
+from .CacheSettings import CacheSettings
+from .CoverageSettings import CoverageSettings
+from .IndicatorSettings import IndicatorSettings
+from .IngestSettings import IngestSettings
 from .MongoSettings import MongoSettings
+from .ResampleSettings import ResampleSettings
+from .SchedulerSettings import SchedulerSettings
+from .AppConfig import AppConfig
 
-__all__ = ['AppConfig', 'MongoSettings']
+__all__ = ['AppConfig', 'CacheSettings', 'CoverageSettings', 'IndicatorSettings', 'IngestSettings', 'MongoSettings', 'ResampleSettings', 'SchedulerSettings']
@@ -2,7 +2,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import date, datetime
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Candle:
     symbol: str
     date: date
@@ -12,7 +12,7 @@ class Candle:
     close: float
     volume: int
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class IntradayCandle:
     symbol: str
     ts: datetime
@@ -0,0 +1,155 @@
+from __future__ import annotations
+from dataclasses import is_dataclass, asdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Union
+import numpy as np
+
+TimeLike = Union[datetime, int, np.integer]
+
+
+def to_epoch(t: TimeLike) -> int:
+    """UTC epoch seconds; naive datetimes are taken as UTC (same as the Mongo repo)."""
+    if isinstance(t, datetime):
+        if t.tzinfo is None:
+            t = t.replace(tzinfo=timezone.utc)
+        return int(t.timestamp())
+    return int(t)
+
+
+class CandleSeries:
+    """
+    Intraday candles of one symbol stored column-wise in contiguous arrays, sorted by `ts`
+    (int64 UTC epoch seconds). Slicing returns zero-copy views; time-range lookups are
+    binary searches on `ts`.
+    """
+
+    __slots__ = ("symbol", "ts", "open", "high", "low", "close", "volume")
+
+    COLUMNS = ("ts", "open", "high", "low", "close", "volume")
+    DTYPES = {"ts": np.int64, "open": np.float64, "high": np.float64,
+              "low": np.float64, "close": np.float64, "volume": np.int64}
+
+    def __init__(self, symbol: str, ts: np.ndarray, open: np.ndarray, high: np.ndarray,
+                 low: np.ndarray, close: np.ndarray, volume: np.ndarray):
+        self.symbol = symbol
+        self.ts = ts
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    # -------------------------- Construction ---------------------------------
+
+    @classmethod
+    def empty(cls, symbol: str) -> "CandleSeries":
+        return cls(symbol, **{c: np.empty(0, dtype=dt) for c, dt in cls.DTYPES.items()})
+
+    @classmethod
+    def from_columns(cls, symbol: str, cols: Mapping[str, Sequence[Any]], sort: bool = False) -> "CandleSeries":
+        arrays = {c: np.asarray(cols[c], dtype=dt) for c, dt in cls.DTYPES.items()}
+        series = cls(symbol, **arrays)
+        return series.sorted() if sort else series
+
+    @classmethod
+    def from_records(cls, records: Iterable[Any], symbol: Optional[str] = None) -> "CandleSeries":
+        """Build from dicts or IntradayCandle-like objects with a datetime `ts`."""
+        cols: Dict[str, List[Any]] = {c: [] for c in cls.COLUMNS}
+        for item in records:
+            if not isinstance(item, dict):
+                item = asdict(item) if is_dataclass(item) else {k: getattr(item, k) for k in ("symbol", *cls.COLUMNS)}
+            if symbol is None:
+                symbol = item["symbol"]
+            cols["ts"].append(to_epoch(item["ts"]))
+            for c in ("open", "high", "low", "close", "volume"):
+                cols[c].append(item[c])
+        if symbol is None:
+            raise ValueError("symbol is required for an empty series")
+        return cls.from_columns(symbol, cols, sort=True)
+
+    @classmethod
+    def concat(cls, parts: Sequence["CandleSeries"]) -> "CandleSeries":
+        """Plain concatenation, no reordering; parts must already be in ts order."""
+        if not parts:
+            raise ValueError("nothing to concatenate")
+        return cls(parts[0].symbol, **{c: np.concatenate([getattr(p, c) for p in parts])
+                                       for c in cls.COLUMNS})
+
+    @classmethod
+    def merge(cls, parts: Sequence["CandleSeries"]) -> "CandleSeries":
+        """Sorted union of `parts`; on duplicate ts the bar from the later part wins."""
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            raise ValueError("nothing to merge")
+        if len(parts) == 1:
+            return parts[0]
+        return cls.concat(parts).sorted()
+
+    def sorted(self) -> "CandleSeries":
+        """Copy sorted by ts with duplicate timestamps collapsed to their last occurrence."""
+        order = np.argsort(self.ts, kind="stable")
+        ts = self.ts[order]
+        keep = np.ones(len(ts), dtype=bool)
+        keep[:-1] = ts[1:] != ts[:-1]
+        idx = order[keep]
+        return self._take(idx)
+
+    # -------------------------- Access ---------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def __getitem__(self, item: slice) -> "CandleSeries":
+        if not isinstance(item, slice):
+            raise TypeError("CandleSeries supports slice indexing only; use to_docs() for rows")
+        return CandleSeries(self.symbol, **{c: getattr(self, c)[item] for c in self.COLUMNS})
+
+    def __repr__(self) -> str:
+        span = ""
+        if len(self):
+            span = f", {self.start().isoformat()} .. {self.end().isoformat()}"
+        return f"CandleSeries({self.symbol!r}, {len(self)} bars{span})"
+
+    def start(self) -> datetime:
+        return datetime.fromtimestamp(int(self.ts[0]), timezone.utc)
+
+    def end(self) -> datetime:
+        return datetime.fromtimestamp(int(self.ts[-1]), timezone.utc)
+
+    def between(self, start: Optional[TimeLike] = None, end: Optional[TimeLike] = None) -> "CandleSeries":
+        """View of bars with start <= ts <= end (either bound optional)."""
+        lo = 0 if start is None else int(np.searchsorted(self.ts, to_epoch(start), side="left"))
+        hi = len(self) if end is None else int(np.searchsorted(self.ts, to_epoch(end), side="right"))
+        return self[lo:hi]
+
+    def newer_than(self, t: TimeLike) -> "CandleSeries":
+        """View of bars with ts strictly after `t`."""
+        return self[int(np.searchsorted(self.ts, to_epoch(t), side="right")):]
+
+    def valid(self) -> "CandleSeries":
+        """Bars with finite prices, low <= open/close <= high and non-negative volume."""
+        ok = (np.isfinite(self.open) & np.isfinite(self.high) & np.isfinite(self.low)
+              & np.isfinite(self.close) & (self.volume >= 0)
+              & (self.low <= np.minimum(self.open, self.close))
+              & (self.high >= np.maximum(self.open, self.close)))
+        return self if ok.all() else self._take(np.flatnonzero(ok))
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        return {c: getattr(self, c) for c in self.COLUMNS}
+
+    def datetimes(self) -> np.ndarray:
+        return self.ts.astype("datetime64[s]")
+
+    def iter_docs(self) -> Iterator[Dict[str, Any]]:
+        """Row dicts in the shape the Mongo repo stores (tz-aware UTC `ts`)."""
+        naive = self.datetimes().astype(object)
+        for dt, o, h, l, c, v in zip(naive, self.open.tolist(), self.high.tolist(),
+                                     self.low.tolist(), self.close.tolist(), self.volume.tolist()):
+            yield {"symbol": self.symbol, "ts": dt.replace(tzinfo=timezone.utc),
+                   "open": o, "high": h, "low": l, "close": c, "volume": v}
+
+    def to_docs(self) -> List[Dict[str, Any]]:
+        return list(self.iter_docs())
+
+    def _take(self, idx: np.ndarray) -> "CandleSeries":
+        return CandleSeries(self.symbol, **{c: getattr(self, c)[idx] for c in self.COLUMNS})
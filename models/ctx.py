@@ -3,7 +3,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field, asdict
 from datetime import datetime, timezone
-from typing import Optional, Literal, Dict, Any
+from typing import Optional, Literal, Dict, Any, List
 
 
 def utc_now() -> datetime:
@@ -17,11 +17,25 @@ class Ctx:
     minute_interval: int = 1
     is_enabled: bool = True
     task_interval: int = 0
-    type: Literal["fetch_intraday"] = "fetch_intraday"
+    resume: bool = False
+    incremental: bool = False
+    write_mode: Literal["overwrite", "append"] = "overwrite"
+    tee: bool = False
+    symbols: Optional[List[str]] = None
+    universe: Optional[str] = None
+    intervals: Optional[List[str]] = None
+    indicators: Optional[List[str]] = None
+    type: Literal["fetch_intraday", "fetch_universe", "resample", "indicators",
+                  "rebuild_coverage"] = "fetch_intraday"
     timezone: str = "UTC"
     last_run: Optional[datetime] = None
+    next_run: Optional[datetime] = None
+    lease_owner: Optional[str] = None
+    lease_until: Optional[datetime] = None
     created_at: datetime = field(default_factory=utc_now)
-    op: Literal["fetch_and_save_intraday"] = "fetch_and_save_intraday"
+    updated_at: datetime = field(default_factory=utc_now)
+    op: Literal["fetch_and_save_intraday", "ingest_csv_to_mongo", "fetch_to_mongo",
+                "fetch_universe", "resample", "indicators", "rebuild_coverage"] = "fetch_and_save_intraday"
 
     def to_dict(self) -> Dict[str, Any]:
         return asdict(self)
@@ -30,3 +44,40 @@ class Ctx:
 def build_ctx(symbol: str, task_interval_minutes: int) -> Dict[str, Any]:
     ctx = Ctx(symbol=symbol, task_interval=task_interval_minutes)
     return ctx.to_dict()
+
+
+def build_universe_ctx(name: str, task_interval_minutes: int, symbols: Optional[List[str]] = None,
+                       **kwargs: Any) -> Dict[str, Any]:
+    """
+    One ctx for a whole symbol universe: `symbols` inline, or resolved at run time from the
+    [universes] entry `name`. `symbol` holds "@name" so logs and scheduler lanes can tell
+    universe jobs apart.
+    """
+    ctx = Ctx(symbol=f"@{name}", symbols=symbols, universe=None if symbols else name,
+              type="fetch_universe", op="fetch_universe", task_interval=task_interval_minutes,
+              **kwargs)
+    return ctx.to_dict()
+
+
+def build_resample_ctx(symbol: str, task_interval_minutes: int, intervals: Optional[List[str]] = None,
+                       **kwargs: Any) -> Dict[str, Any]:
+    """
+    Resample the stored bars of `symbol` (or of a universe, via `symbols`/`universe`) into
+    `intervals`, default the [resample] intervals. Give it the same `symbol` as the fetch job
+    so both share a scheduler lane and resampling runs after the fetch.
+    """
+    ctx = Ctx(symbol=symbol, intervals=intervals, type="resample", op="resample",
+              task_interval=task_interval_minutes, **kwargs)
+    return ctx.to_dict()
+
+
+def build_indicators_ctx(symbol: str, task_interval_minutes: int, intervals: Optional[List[str]] = None,
+                         indicators: Optional[List[str]] = None, **kwargs: Any) -> Dict[str, Any]:
+    """
+    Keep `indicators` (default: [indicators] specs) current over the bars of `intervals`
+    ("base" or resampled intervals). Like build_resample_ctx, share the fetch job's `symbol`
+    so it runs after the fetch (and after resampling) in the same lane.
+    """
+    ctx = Ctx(symbol=symbol, intervals=intervals, indicators=indicators, type="indicators",
+              op="indicators", task_interval=task_interval_minutes, **kwargs)
+    return ctx.to_dict()
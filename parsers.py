@@ -1,11 +1,22 @@
 from __future__ import annotations
 from typing import Dict, List
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+from functools import lru_cache
 from zoneinfo import ZoneInfo
+import numpy as np
 from models.candle import Candle, IntradayCandle
+from models.candle_series import CandleSeries
 
 EXCHANGE_TZ = ZoneInfo("America/New_York")
 
+INTRADAY_COLUMNS = ("ts", "open", "high", "low", "close", "volume")
+
+@lru_cache(maxsize=4096)
+def _utc_offset_sec(local_day: int) -> int:
+    # Offset at local noon: DST switches at 02:00, before any session (pre-market opens 04:00).
+    noon = datetime(1970, 1, 1, 12) + timedelta(days=local_day)
+    return int(noon.replace(tzinfo=EXCHANGE_TZ).utcoffset().total_seconds())
+
 class DailyParser:
     @staticmethod
     def parse_timeseries(data: Dict, symbol: str) -> List[Candle]:
@@ -44,3 +55,39 @@ class IntradayParser:
             ))
         candles.sort(key=lambda c: c.ts)
         return candles
+
+    @staticmethod
+    def parse_intraday_columns(data: Dict) -> Dict[str, np.ndarray]:
+        """
+        Columnar variant of parse_intraday_timeseries: sorted arrays keyed by INTRADAY_COLUMNS,
+        `ts` as int64 UTC epoch seconds. Timestamps are parsed in one batch and the exchange
+        UTC offset is resolved once per local date instead of once per bar.
+        """
+        block = next((v for k, v in data.items() if "Time Series" in k), {})
+        if not block:
+            return {
+                "ts": np.empty(0, dtype=np.int64),
+                **{c: np.empty(0, dtype=np.float64) for c in ("open", "high", "low", "close")},
+                "volume": np.empty(0, dtype=np.int64),
+            }
+
+        local = np.array(list(block.keys()), dtype="datetime64[s]").astype(np.int64)
+        days, day_idx = np.unique(local // 86400, return_inverse=True)
+        offsets = np.array([_utc_offset_sec(int(d)) for d in days], dtype=np.int64)
+        ts = local - offsets[day_idx]
+
+        entries = list(block.values())
+        cols = {
+            "ts": ts,
+            "open": np.array([e["1. open"] for e in entries], dtype=np.float64),
+            "high": np.array([e["2. high"] for e in entries], dtype=np.float64),
+            "low": np.array([e["3. low"] for e in entries], dtype=np.float64),
+            "close": np.array([e["4. close"] for e in entries], dtype=np.float64),
+            "volume": np.array([e["5. volume"] for e in entries], dtype=np.int64),
+        }
+        order = np.argsort(ts, kind="stable")
+        return {k: v[order] for k, v in cols.items()}
+
+    @staticmethod
+    def parse_intraday_series(data: Dict, symbol: str) -> CandleSeries:
+        return CandleSeries.from_columns(symbol, IntradayParser.parse_intraday_columns(data))
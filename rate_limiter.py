@@ -0,0 +1,101 @@
+from __future__ import annotations
+from typing import Dict, Optional, Tuple
+import asyncio
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """Continuously refilling bucket: `capacity` tokens per `period_sec`, bursts up to `capacity`."""
+
+    def __init__(self, capacity: int, period_sec: float):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = float(capacity)
+        self.rate = capacity / period_sec
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1.0
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter combining a per-minute and an optional per-day token bucket.
+    A call is admitted only when every bucket has a token; `penalize` pauses all callers
+    after the API reports throttling.
+    """
+
+    def __init__(self, calls_per_minute: int, calls_per_day: Optional[int] = None,
+                 max_wait_sec: Optional[float] = 120.0):
+        self.calls_per_minute = calls_per_minute
+        self.calls_per_day = calls_per_day
+        self.max_wait_sec = max_wait_sec
+        self._buckets = [TokenBucket(calls_per_minute, 60.0)]
+        if calls_per_day:
+            self._buckets.append(TokenBucket(calls_per_day, 86400.0))
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Take a token and return 0.0, or return the seconds to wait before retrying."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max([self._blocked_until - now] + [b.wait_time(now) for b in self._buckets])
+            if wait > 0:
+                return wait
+            for b in self._buckets:
+                b.take()
+            return 0.0
+
+    def acquire(self) -> None:
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            if self.max_wait_sec is not None and wait > self.max_wait_sec:
+                raise RuntimeError(f"API call budget exhausted; next call allowed in {wait:.0f}s")
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            if self.max_wait_sec is not None and wait > self.max_wait_sec:
+                raise RuntimeError(f"API call budget exhausted; next call allowed in {wait:.0f}s")
+            await asyncio.sleep(wait)
+
+    def penalize(self, seconds: float) -> None:
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+def jittered_backoff(attempt: int, base_sec: float, max_sec: float) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(max, base * 2^(attempt-1)))."""
+    return random.uniform(0, min(max_sec, base_sec * (2 ** (attempt - 1))))
+
+
+_limiters: Dict[Tuple[int, Optional[int]], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(calls_per_minute: int, calls_per_day: Optional[int] = None) -> RateLimiter:
+    """Process-wide limiter per plan so every client/worker draws from the same API budget."""
+    key = (calls_per_minute, calls_per_day or None)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = RateLimiter(calls_per_minute, calls_per_day)
+        return limiter
@@ -0,0 +1,169 @@
+from __future__ import annotations
+from functools import lru_cache
+from typing import Dict, Optional, Tuple, Union
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+import numpy as np
+
+from models.candle_series import CandleSeries
+
+DAY = 24 * 60  # interval (minutes) of daily bars
+
+# Local minute-of-day windows [open, close) of each session; "all" keeps every bar.
+SESSIONS: Dict[str, Tuple[int, int]] = {
+    "regular": (9 * 60 + 30, 16 * 60),
+    "extended": (4 * 60, 20 * 60),
+    "all": (0, DAY),
+}
+
+IntervalLike = Union[int, str]
+
+
+def parse_interval(value: IntervalLike) -> int:
+    """Bar length in minutes from 5, "5", "5min", "1h", "60m" or "1d"/"daily" (= DAY)."""
+    if isinstance(value, (int, np.integer)):
+        minutes = int(value)
+    else:
+        s = str(value).strip().lower()
+        if s in ("d", "1d", "day", "daily"):
+            return DAY
+        for suffix, mult in (("min", 1), ("m", 1), ("h", 60)):
+            if s.endswith(suffix) and s[:-len(suffix)].isdigit():
+                minutes = int(s[:-len(suffix)]) * mult
+                break
+        else:
+            if not s.isdigit():
+                raise ValueError(f"Unknown bar interval {value!r}")
+            minutes = int(s)
+    if not 0 < minutes <= DAY:
+        raise ValueError(f"Bar interval must be 1..{DAY} minutes, got {value!r}")
+    return minutes
+
+
+def interval_label(minutes: int) -> str:
+    """Collection/log suffix: "5min", "60min", "1d"."""
+    return "1d" if minutes == DAY else f"{minutes}min"
+
+
+@lru_cache(maxsize=65536)
+def _offset_at_hour(tz: str, hour: int) -> int:
+    # Zone offsets only change on whole UTC hours (true for every US/EU exchange zone).
+    return int(datetime.fromtimestamp(hour * 3600, ZoneInfo(tz)).utcoffset().total_seconds())
+
+
+def utc_offsets(ts: np.ndarray, tz: str) -> np.ndarray:
+    """UTC offset (seconds) of `tz` at each epoch second in `ts`, looked up once per distinct hour."""
+    if not len(ts):
+        return np.empty(0, dtype=np.int64)
+    hours, inverse = np.unique(ts // 3600, return_inverse=True)
+    offsets = np.fromiter((_offset_at_hour(tz, int(h)) for h in hours), dtype=np.int64, count=len(hours))
+    return offsets[inverse]
+
+
+def _buckets(ts: np.ndarray, minutes: int, session: str, tz: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (keep, starts, labels) for sorted `ts`: `keep` masks the bars inside the session; `starts`
+    are the indexes (into the kept bars) where each output bar begins and `labels` its UTC ts.
+    Intraday buckets are laid on a grid anchored at the session open of each local day; daily
+    bars are labelled with the local date at 00:00 UTC, as the daily CSVs are.
+    """
+    try:
+        open_min, close_min = SESSIONS[session]
+    except KeyError:
+        raise ValueError(f"Unknown session {session!r}; expected one of {sorted(SESSIONS)}") from None
+    offsets = utc_offsets(ts, tz)
+    day, second = np.divmod(ts + offsets, 86400)
+    minute = second // 60
+    keep = (minute >= open_min) & (minute < close_min)
+    if not keep.all():
+        day, minute, offsets = day[keep], minute[keep], offsets[keep]
+
+    if minutes == DAY:
+        key = day
+    else:
+        key = day * DAY + open_min + (minute - open_min) // minutes * minutes
+    if not len(key):
+        return keep, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    # A new intraday bucket also starts where the offset changes, so a repeated local hour
+    # (DST fall back, only reachable with session="all") doesn't merge with the one before it.
+    # A daily bucket is the whole local day, whatever its offsets.
+    change = key[1:] != key[:-1]
+    if minutes != DAY:
+        change |= offsets[1:] != offsets[:-1]
+    starts = np.concatenate(([0], np.flatnonzero(change) + 1))
+    if minutes == DAY:
+        labels = key[starts] * 86400
+    else:
+        labels = key[starts] * 60 - offsets[starts]
+    return keep, starts, labels
+
+
+def resample(series: CandleSeries, interval: IntervalLike, session: str = "extended",
+             tz: str = "America/New_York") -> CandleSeries:
+    """
+    Aggregate sorted bars into `interval` bars (first open, max high, min low, last close,
+    summed volume), each labelled with its bucket start. Buckets follow the exchange calendar
+    in `tz`: intraday bars are aligned to the `session` open (09:30 for "regular", 04:00 for
+    "extended", which for 5..60-minute bars is the same as clock alignment), and bars outside
+    the session are dropped. The whole series is reduced in one pass with np.ufunc.reduceat.
+    """
+    minutes = parse_interval(interval)
+    return _reduce(series, *_buckets(series.ts, minutes, session, tz))
+
+
+def _reduce(series: CandleSeries, keep: np.ndarray, starts: np.ndarray, labels: np.ndarray) -> CandleSeries:
+    if not len(starts):
+        return CandleSeries.empty(series.symbol)
+    cols = series.columns() if keep.all() else {c: v[keep] for c, v in series.columns().items()}
+    ends = np.append(starts[1:], len(cols["ts"])) - 1
+    return CandleSeries(
+        series.symbol,
+        ts=labels.astype(np.int64),
+        open=cols["open"][starts],
+        high=np.maximum.reduceat(cols["high"], starts),
+        low=np.minimum.reduceat(cols["low"], starts),
+        close=cols["close"][ends],
+        volume=np.add.reduceat(cols["volume"], starts),
+    )
+
+
+class Resampler:
+    """
+    Incremental resampling of one symbol's bar stream. `update()` folds in newly arrived bars
+    and returns the output bars they changed: the bucket that was still open (re-emitted with
+    its new values) plus any newer ones. Only the source bars of the open bucket are kept, so
+    each update costs O(new bars); revised copies of bars in the open bucket replace the old
+    ones, while bars older than the open bucket raise ValueError (resample that range again).
+    """
+
+    def __init__(self, symbol: str, interval: IntervalLike, session: str = "extended",
+                 tz: str = "America/New_York"):
+        self.symbol = symbol
+        self.minutes = parse_interval(interval)
+        self.session = session
+        self.tz = tz
+        self._open = CandleSeries.empty(symbol)   # source bars of the newest bucket
+        self._open_label: Optional[int] = None
+
+    @property
+    def last(self) -> CandleSeries:
+        """The newest (possibly still filling) output bar, or an empty series."""
+        return resample(self._open, self.minutes, self.session, self.tz)
+
+    def update(self, bars: CandleSeries) -> CandleSeries:
+        if not len(bars):
+            return CandleSeries.empty(self.symbol)
+        keep, _, labels = _buckets(bars.ts, self.minutes, self.session, self.tz)
+        if not len(labels):
+            return CandleSeries.empty(self.symbol)
+        if self._open_label is not None and labels.min() < self._open_label:
+            first = datetime.fromtimestamp(int(bars.ts[np.argmax(keep)]), timezone.utc)
+            raise ValueError(f"{self.symbol}: bar at {first.isoformat()} is older than the open "
+                             f"{interval_label(self.minutes)} bucket; resample that range again")
+
+        merged = CandleSeries.merge([self._open, bars])
+        keep, starts, labels = _buckets(merged.ts, self.minutes, self.session, self.tz)
+        # Keep the source bars of the newest bucket for the next update.
+        self._open = merged._take(np.flatnonzero(keep)[starts[-1]:])
+        self._open_label = int(labels[-1])
+        return _reduce(merged, keep, starts, labels)
@@ -0,0 +1,92 @@
+# resources.py
+"""
+Process-wide shared connections.
+
+Jobs used to open their own `requests.Session` and `MongoClient`, paying a TCP + TLS handshake
+(and a fresh Mongo connection pool) every time. This registry hands out one pooled HTTP
+session and one MongoClient per URI for the whole process; repos and readers open their
+collections on top of those. Call `configure()` before first use to size the pools, and
+`shutdown()` (also run at interpreter exit) to close everything.
+"""
+from __future__ import annotations
+from typing import Dict, Optional
+from urllib.parse import urlparse
+import atexit
+import threading
+
+import certifi
+import requests
+from pymongo import MongoClient
+from requests.adapters import HTTPAdapter
+
+_lock = threading.Lock()
+_http: Optional[requests.Session] = None
+_mongo: Dict[str, MongoClient] = {}
+_settings = {"http_pool_size": 10, "mongo_max_pool_size": 100, "mongo_min_pool_size": 0}
+
+
+def configure(http_pool_size: Optional[int] = None,
+              mongo_max_pool_size: Optional[int] = None,
+              mongo_min_pool_size: Optional[int] = None) -> None:
+    """Pool sizes for connections opened from now on; existing ones keep their pools."""
+    with _lock:
+        for key, value in (("http_pool_size", http_pool_size),
+                           ("mongo_max_pool_size", mongo_max_pool_size),
+                           ("mongo_min_pool_size", mongo_min_pool_size)):
+            if value is not None:
+                _settings[key] = value
+
+
+def http_session() -> requests.Session:
+    """Shared keep-alive session; its pool holds up to `http_pool_size` connections per host."""
+    global _http
+    with _lock:
+        if _http is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=_settings["http_pool_size"])
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http = session
+        return _http
+
+
+def mongo_client(uri: str, app_name: Optional[str] = "stocker-app") -> MongoClient:
+    """One MongoClient (and connection pool) per URI; the first caller's app name is used."""
+    with _lock:
+        client = _mongo.get(uri)
+        if client is None:
+            print("Connecting to Mongo:", _mask(uri))
+            client = _mongo[uri] = MongoClient(
+                uri,
+                appname=app_name or "stocker-app",
+                serverSelectionTimeoutMS=60000,
+                connectTimeoutMS=30000,
+                socketTimeoutMS=30000,
+                maxPoolSize=_settings["mongo_max_pool_size"],
+                minPoolSize=_settings["mongo_min_pool_size"],
+                tlsCAFile=certifi.where(),
+            )
+        return client
+
+
+def shutdown() -> None:
+    """Close the shared HTTP session and every MongoClient."""
+    global _http
+    with _lock:
+        if _http is not None:
+            _http.close()
+            _http = None
+        for client in _mongo.values():
+            client.close()
+        _mongo.clear()
+
+
+def _mask(uri: str) -> str:
+    u = urlparse(uri)
+    if "@" in u.netloc:
+        _, host = u.netloc.split("@", 1)
+        return f"{u.scheme}://***:***@{host}{u.path or ''}{'?' + u.query if u.query else ''}"
+    return uri
+
+
+atexit.register(shutdown)
@@ -0,0 +1,140 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional, Tuple
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+EXCHANGE_TZ = ZoneInfo("America/New_York")
+
+
+class ResponseCache:
+    """
+    Persistent, gzip-compressed cache of Alpha Vantage payloads keyed by request params.
+
+    Closed month slices (`month` before the current exchange month) never change and are kept
+    until evicted; anything else (latest window, current month, daily series) expires after
+    `recent_ttl_sec`. Compact requests are never cached: they exist to get the newest bars.
+    When the directory grows past `max_bytes`, least recently used entries (by file mtime,
+    refreshed on every hit) are deleted.
+    """
+
+    IGNORED_PARAMS = {"apikey"}
+
+    def __init__(self, root: str = ".cache/alpha_vantage", max_bytes: int = 512 * 1024 * 1024,
+                 recent_ttl_sec: float = 300):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.recent_ttl_sec = recent_ttl_sec
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._size = sum(p.stat().st_size for p in self.root.rglob("*.json.gz"))
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "bytes": self._size}
+
+    def get(self, params: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+        if not self._cacheable(params):
+            return None
+        path = self._path(params)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count(hit=False)
+            return None
+
+        ttl = self._ttl(params)
+        if ttl is not None and time.time() - entry["stored_at"] > ttl:
+            self._count(hit=False)
+            return None
+
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        self._count(hit=True)
+        return entry["data"]
+
+    def put(self, params: Mapping[str, Any], data: Dict[str, Any]) -> None:
+        if not self._cacheable(params):
+            return
+        path = self._path(params)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+            json.dump({"stored_at": time.time(), "data": data}, f)
+
+        with self._lock:
+            old = path.stat().st_size if path.exists() else 0
+            os.replace(tmp, path)
+            self._size += path.stat().st_size - old
+            if self._size > self.max_bytes:
+                self._evict()
+
+    # -------------------------- Internal helpers -----------------------------
+
+    def _key(self, params: Mapping[str, Any]) -> str:
+        items = sorted((k, str(v)) for k, v in params.items() if k not in self.IGNORED_PARAMS)
+        return hashlib.sha256(json.dumps(items).encode("utf-8")).hexdigest()
+
+    def _path(self, params: Mapping[str, Any]) -> Path:
+        key = self._key(params)
+        return self.root / key[:2] / f"{key}.json.gz"
+
+    @staticmethod
+    def _cacheable(params: Mapping[str, Any]) -> bool:
+        return params.get("outputsize") != "compact"
+
+    def _ttl(self, params: Mapping[str, Any]) -> Optional[float]:
+        month = params.get("month")
+        if month and str(month) < datetime.now(EXCHANGE_TZ).strftime("%Y-%m"):
+            return None
+        return self.recent_ttl_sec
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _evict(self) -> None:
+        # Caller holds the lock. Trim to 90% so we don't evict on every put.
+        entries = []
+        for p in self.root.rglob("*.json.gz"):
+            st = p.stat()
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        target = int(self.max_bytes * 0.9)
+        for _, size, p in entries:
+            if self._size <= target:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            self._size -= size
+            self.evictions += 1
+
+
+_caches: Dict[Tuple[str, int, float], ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+def get_cache(root: str, max_bytes: int, recent_ttl_sec: float) -> ResponseCache:
+    """Process-wide cache per directory so hit/miss counters cover every client."""
+    key = (str(Path(root).resolve()), max_bytes, recent_ttl_sec)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = ResponseCache(root, max_bytes, recent_ttl_sec)
+        return cache
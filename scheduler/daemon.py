@@ -0,0 +1,328 @@
+# daemon.py
+from __future__ import annotations
+
+import heapq
+import math
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from logging import getLogger
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from ctx.ctx_reader import CtxReader
+from ctx.job_catalog import JobCatalog
+
+logger = getLogger(__name__)
+
+
+def _epoch(dt: Optional[datetime]) -> Optional[float]:
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _utc(epoch: Optional[float]) -> Optional[datetime]:
+    return None if epoch is None else datetime.fromtimestamp(epoch, timezone.utc)
+
+
+def next_due(due: float, interval_sec: float, now: float) -> float:
+    """First slot after `now` on the `due + k * interval` grid; missed slots collapse into it."""
+    if due > now:
+        return due
+    return due + (math.floor((now - due) / interval_sec) + 1) * interval_sec
+
+
+class JobDaemon:
+    """
+    Long-running scheduler loop. Jobs sit in a min-heap keyed by their next due time and the
+    loop sleeps until the earliest one (or the next ctx refresh). A job is never queued again
+    while it is still running, and runs that were missed while late are coalesced into one
+    (`late_policy="coalesce"`) or dropped in favour of the next slot (`"skip"`, once more than
+    `late_grace_sec` late). `last_run`/`next_run` are written back to the ctx collection.
+    Jobs with `task_interval` 0 run once per daemon start.
+
+    Several daemons can share one ctx collection: a due job is only run after it has been
+    leased to this node (`node_id`) with CtxReader.claim. A heartbeat thread keeps the leases
+    of running jobs alive, and finishing a job releases its lease. If a node dies, its jobs are
+    claimed by another node once the lease lapses (`lease_sec`). A symbol's jobs are pinned to
+    one node as well: before running a symbol's lane the node leases the symbol itself
+    (CtxReader.claim_lane) and keeps renewing that lease while it is up, so an ingest always
+    runs where the fetch wrote its file. Stopping releases the symbols it held.
+
+    With a JobCatalog the ctx collection is read in full once and then only changes are
+    applied; without one every refresh re-reads all enabled jobs.
+    """
+
+    def __init__(self, cfg: Any, reader: CtxReader, run_job: Callable[[Any, dict], None],
+                 max_in_flight: int = 1, refresh_sec: float = 60,
+                 late_policy: str = "coalesce", late_grace_sec: float = 60,
+                 lease_sec: float = 300, node_id: Optional[str] = None,
+                 catalog: Optional[JobCatalog] = None):
+        self.cfg = cfg
+        self.reader = reader
+        self.run_job = run_job
+        self.max_in_flight = max(1, max_in_flight)
+        self.refresh_sec = refresh_sec
+        self.late_policy = late_policy
+        self.late_grace_sec = late_grace_sec
+        self.lease_sec = lease_sec
+        self.node_id = node_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.started_at = time.time()
+        self.catalog = catalog
+
+        self._jobs: Dict[Any, dict] = {}
+        self._due: Dict[Any, float] = {}
+        self._heap: List[Tuple[float, int, Any]] = []
+        self._seq = 0
+        self._running: Set[Any] = set()
+        self._ran_once: Set[Any] = set()
+        self._leased: Set[Any] = set()
+        self._lanes_held: Set[str] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def run(self) -> None:
+        logger.info(f"Scheduler daemon {self.node_id} started (max_in_flight={self.max_in_flight}, "
+                    f"refresh every {self.refresh_sec}s, late_policy={self.late_policy}, "
+                    f"lease {self.lease_sec}s)")
+        next_refresh = 0.0
+        if self.catalog is not None:
+            self.catalog.on_change = self._wake.set
+            self.catalog.start()
+        heartbeat = threading.Thread(target=self._heartbeat, name="lease-heartbeat", daemon=True)
+        heartbeat.start()
+        pool = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="job")
+        try:
+            while not self._stop.is_set():
+                now = time.time()
+                if now >= next_refresh or (self.catalog is not None and self.catalog.has_changes()):
+                    try:
+                        self._refresh(now)
+                    except Exception as exc:
+                        logger.error(f"Reading ctx jobs failed: {exc!r}")
+                    next_refresh = now + self.refresh_sec
+
+                for lane in self._lanes(self._pop_due(now)):
+                    pool.submit(self._run_lane, lane)
+
+                with self._lock:
+                    next_at = self._heap[0][0] if self._heap else math.inf
+                self._wake.wait(max(0.0, min(next_at, next_refresh) - time.time()))
+                self._wake.clear()
+        finally:
+            logger.info(f"Stopping; waiting for {len(self._leased)} running job(s)")
+            # Lanes that haven't started hold no leases; other nodes pick those jobs up.
+            pool.shutdown(wait=True, cancel_futures=True)
+            self._stop.set()
+            heartbeat.join()
+            self._release_lanes()
+            if self.catalog is not None:
+                self.catalog.close()
+        logger.info("Scheduler daemon stopped")
+
+    # -------------------------- Internal helpers -----------------------------
+
+    def _push(self, job_id: Any, due: float) -> None:
+        # Caller holds the lock. Superseded heap entries are dropped lazily in _pop_due.
+        self._seq += 1
+        self._due[job_id] = due
+        heapq.heappush(self._heap, (due, self._seq, job_id))
+
+    def _refresh(self, now: float) -> None:
+        if self.catalog is not None:
+            changes = self.catalog.poll()
+        else:
+            jobs = {job["_id"]: job for job in self.reader.list_jobs()}
+            changes = list(jobs.items()) + [(job_id, None) for job_id in set(self._jobs) - set(jobs)]
+        with self._lock:
+            for job_id, job in changes:
+                self._apply(job_id, job, now)
+        if changes:
+            logger.info(f"Tracking {len(self._jobs)} jobs ({len(self._running)} running, "
+                        f"{len(changes)} changed)")
+
+    def _apply(self, job_id: Any, job: Optional[dict], now: float) -> None:
+        # Caller holds the lock.
+        if job is None:
+            self._jobs.pop(job_id, None)
+            self._due.pop(job_id, None)
+            return
+        self._jobs[job_id] = job
+        if job_id in self._running or job_id in self._ran_once:
+            return
+        due = _epoch(job.get("next_run"))
+        current = self._due.get(job_id)
+        # New job, or next_run moved (another node ran it, or it was edited to run now).
+        if current is None or (due is not None and abs(current - due) > 1):
+            self._push(job_id, now if due is None else due)
+
+    def _pop_due(self, now: float) -> List[Tuple[dict, float]]:
+        due_jobs: List[Tuple[dict, float]] = []
+        skipped: List[Tuple[Any, float]] = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due, _, job_id = heapq.heappop(self._heap)
+                if self._due.get(job_id) != due:
+                    continue
+                del self._due[job_id]
+                job = self._jobs[job_id]
+                interval = self._interval_sec(job)
+                if self.late_policy == "skip" and interval and now - due > self.late_grace_sec:
+                    nxt = next_due(due, interval, now)
+                    self._push(job_id, nxt)
+                    skipped.append((job_id, nxt))
+                    continue
+                self._running.add(job_id)
+                due_jobs.append((job, due))
+        for job_id, nxt in skipped:
+            logger.warning(f"Skipping late run of {job_id}; next run at {_utc(nxt).isoformat()}")
+            self._mark(job_id, None, nxt)
+        return due_jobs
+
+    @staticmethod
+    def _lanes(due_jobs: List[Tuple[dict, float]]) -> List[List[Tuple[dict, float]]]:
+        # Same grouping as the one-shot scheduler: a symbol's jobs run in order on one thread.
+        lanes: "OrderedDict[Any, List[Tuple[dict, float]]]" = OrderedDict()
+        for job, due in due_jobs:
+            lanes.setdefault(job.get("symbol"), []).append((job, due))
+        return list(lanes.values())
+
+    def _run_lane(self, lane: List[Tuple[dict, float]]) -> None:
+        symbol = lane[0][0].get("symbol")
+        if symbol is not None and not self._claim_lane(symbol, lane):
+            return
+        for job, due in lane:
+            job = self._claim(job)
+            if job is None:
+                continue
+            started = time.time()
+            try:
+                self.run_job(self.cfg, job)
+            finally:
+                nxt = self._reschedule(job, due, time.time())
+                if not self._mark(job["_id"], started, nxt, owner=self.node_id):
+                    logger.warning(f"Lease on {job['_id']} was lost while it ran; run times not recorded")
+                with self._lock:
+                    self._leased.discard(job["_id"])
+                self._wake.set()
+
+    def _claim_lane(self, symbol: str, lane: List[Tuple[dict, float]]) -> bool:
+        now = time.time()
+        try:
+            lease = self.reader.claim_lane(symbol, self.node_id, self.lease_sec, _utc(now))
+            state = lease or self.reader.get_lane(symbol)
+        except Exception as exc:
+            logger.error(f"Claiming lane {symbol} failed: {exc!r}")
+            lease, state = None, None
+        with self._lock:
+            if lease is not None:
+                self._lanes_held.add(symbol)
+                return True
+            self._lanes_held.discard(symbol)
+            # Another node runs this symbol: check again once its lease could have lapsed. If
+            # it runs the jobs meanwhile, their moved next_run reschedules them on refresh.
+            retry = max(_epoch((state or {}).get("lease_until")) or 0.0, now + self.refresh_sec)
+            for job, _ in lane:
+                self._running.discard(job["_id"])
+                if job["_id"] in self._jobs:
+                    self._push(job["_id"], retry)
+        logger.info(f"Lane {symbol} is leased by {(state or {}).get('lease_owner')}; "
+                    f"next check at {_utc(retry).isoformat()}")
+        return False
+
+    def _release_lanes(self) -> None:
+        with self._lock:
+            symbols = list(self._lanes_held)
+            self._lanes_held.clear()
+        try:
+            self.reader.release_lanes(self.node_id, symbols)
+        except Exception as exc:
+            logger.error(f"Releasing lanes failed: {exc!r}")
+
+    def _claim(self, job: dict) -> Optional[dict]:
+        job_id = job["_id"]
+        now = time.time()
+        once = None if self._interval_sec(job) else _utc(self.started_at)
+        try:
+            claimed = self.reader.claim(job_id, self.node_id, self.lease_sec, _utc(now), not_run_since=once)
+            state = claimed or self.reader.get(job_id)
+        except Exception as exc:
+            logger.error(f"Claiming {job_id} failed: {exc!r}")
+            claimed = None
+            state = {**job, "next_run": _utc(now + self.refresh_sec)}
+
+        with self._lock:
+            if claimed is not None:
+                self._jobs[job_id] = claimed
+                self._leased.add(job_id)
+                return claimed
+            # Another node holds the lease or has already run this slot: follow its schedule.
+            self._running.discard(job_id)
+            if state is None or not state.get("is_enabled"):
+                self._jobs.pop(job_id, None)
+                return None
+            self._jobs[job_id] = state
+            if once is not None and state.get("next_run") is None:
+                self._ran_once.add(job_id)
+                return None
+            retry = max(_epoch(state.get("next_run")) or 0.0,
+                        _epoch(state.get("lease_until")) or 0.0, now + 1)
+            self._push(job_id, retry)
+        logger.info(f"{job_id} is leased by {state.get('lease_owner')} or already ran; "
+                    f"next check at {_utc(retry).isoformat()}")
+        return None
+
+    def _heartbeat(self) -> None:
+        interval = max(1.0, self.lease_sec / 3)
+        while not self._stop.wait(interval):
+            with self._lock:
+                ids = list(self._leased)
+                symbols = list(self._lanes_held)
+            now = _utc(time.time())
+            try:
+                renewed = self.reader.heartbeat(self.node_id, ids, self.lease_sec, now)
+                lanes = self.reader.heartbeat_lanes(self.node_id, symbols, self.lease_sec, now)
+            except Exception as exc:
+                logger.error(f"Lease heartbeat failed: {exc!r}")
+                continue
+            if renewed < len(ids):
+                logger.warning(f"Renewed {renewed} of {len(ids)} leases; the rest passed to other nodes")
+            if lanes < len(symbols):
+                logger.warning(f"Renewed {lanes} of {len(symbols)} lane leases; the rest passed to other nodes")
+
+    def _reschedule(self, job: dict, due: float, finished: float) -> Optional[float]:
+        job_id = job["_id"]
+        with self._lock:
+            self._running.discard(job_id)
+            current = self._jobs.get(job_id)
+            interval = self._interval_sec(current) if current else 0
+            if not interval:
+                self._ran_once.add(job_id)
+                return None
+            nxt = next_due(due, interval, finished)
+            self._push(job_id, nxt)
+            return nxt
+
+    def _mark(self, job_id: Any, last_run: Optional[float], next_run: Optional[float],
+              owner: Optional[str] = None) -> bool:
+        try:
+            return self.reader.mark_run(job_id, last_run=_utc(last_run), next_run=_utc(next_run),
+                                        owner=owner)
+        except Exception as exc:
+            logger.error(f"Could not record run times for {job_id}: {exc!r}")
+            return True
+
+    @staticmethod
+    def _interval_sec(job: dict) -> float:
+        return float(job.get("task_interval") or 0) * 60
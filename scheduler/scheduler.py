@@ -2,24 +2,41 @@
 from __future__ import annotations
 
 from logging import getLogger
+import signal
 import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Callable, Dict, Any
+from typing import Callable, Dict, Any, List
 from ctx.ctx_reader import CtxReader
+from ctx.job_catalog import JobCatalog
+from columnar import with_format
 
 from db.mongo import MongoConfig
+from scheduler.daemon import JobDaemon
 from tasks.data_fetcher import fetch_and_save_intraday
 from tasks.ingest_to_mongo import ingest_csv_to_mongo
+from tasks.fetch_to_mongo import fetch_to_mongo
+from tasks.fetch_universe import fetch_universe, resolve_symbols
+from tasks.resample_to_mongo import resample_to_mongo
+from tasks.indicators_to_mongo import indicators_to_mongo
+from tasks.rebuild_coverage import rebuild_coverage
 
 logger = getLogger(__name__)
 
-def _outfile_from_ctx(ctx: dict, base_dir: str = "DATA") -> str:
+def _outfile_from_ctx(ctx: dict, fmt: str = "csv", base_dir: str = "DATA") -> str:
     sym = ctx["symbol"]
+    if ctx.get("write_mode") == "append":
+        # One growing file per symbol/interval instead of a new dated snapshot per day.
+        p = Path(base_dir) / sym
+        p.mkdir(parents=True, exist_ok=True)
+        return with_format(str(p / f"{sym}_m{ctx['minute_interval']}.csv"), fmt)
     day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
     p = Path(base_dir) / sym / day
     p.mkdir(parents=True, exist_ok=True)
-    return str(p / f"{sym}_m{ctx['minute_interval']}_d{ctx['days_back']}.csv")
+    return with_format(str(p / f"{sym}_m{ctx['minute_interval']}_d{ctx['days_back']}.csv"), fmt)
 
 
 DISPATCH: Dict[str, Callable[[Any, dict], None]] = {
@@ -28,15 +45,95 @@ DISPATCH: Dict[str, Callable[[Any, dict], None]] = {
         symbol=ctx["symbol"],
         days=int(ctx["days_back"]),
         minutes=int(ctx["minute_interval"]),
-        outfile=_outfile_from_ctx(ctx),
+        outfile=_outfile_from_ctx(ctx, cfg.output_format),
+        resume=bool(ctx.get("resume", False)),
+        incremental=bool(ctx.get("incremental", False)),
+        append=ctx.get("write_mode") == "append",
     ),
     "ingest_csv_to_mongo": lambda cfg, ctx: ingest_csv_to_mongo(
         cfg,
-        csv_path=_outfile_from_ctx(ctx),
+        csv_path=_outfile_from_ctx(ctx, cfg.output_format),
         default_symbol=ctx["symbol"],
+        batch_size=cfg.ingest.batch_size,
+        workers=cfg.ingest.workers,
+        max_in_flight=cfg.ingest.max_in_flight,
+        max_retries=cfg.ingest.max_retries,
+        parse_workers=cfg.ingest.parse_workers,
+        minutes=int(ctx["minute_interval"]),
+    ),
+    "fetch_to_mongo": lambda cfg, ctx: fetch_to_mongo(
+        cfg,
+        symbol=ctx["symbol"],
+        days=int(ctx["days_back"]),
+        minutes=int(ctx["minute_interval"]),
+        tee_path=_outfile_from_ctx(ctx, cfg.output_format) if ctx.get("tee") else None,
+        resume=bool(ctx.get("resume", False)),
+        incremental=bool(ctx.get("incremental", False)),
+    ),
+    "fetch_universe": lambda cfg, ctx: fetch_universe(
+        cfg,
+        symbols=resolve_symbols(cfg, ctx),
+        days=int(ctx["days_back"]),
+        minutes=int(ctx["minute_interval"]),
+        tee_path=(lambda sym: _outfile_from_ctx({**ctx, "symbol": sym}, cfg.output_format))
+                 if ctx.get("tee") else None,
+        resume=bool(ctx.get("resume", False)),
+        incremental=bool(ctx.get("incremental", False)),
+        fetch_workers=cfg.scheduler.max_in_flight,
+    ),
+    "resample": lambda cfg, ctx: resample_to_mongo(
+        cfg,
+        symbols=resolve_symbols(cfg, ctx) if ctx.get("symbols") or ctx.get("universe") else [ctx["symbol"]],
+        intervals=ctx.get("intervals"),
+    ),
+    "indicators": lambda cfg, ctx: indicators_to_mongo(
+        cfg,
+        symbols=resolve_symbols(cfg, ctx) if ctx.get("symbols") or ctx.get("universe") else [ctx["symbol"]],
+        intervals=ctx.get("intervals"),
+        specs=ctx.get("indicators"),
+    ),
+    "rebuild_coverage": lambda cfg, ctx: rebuild_coverage(
+        cfg,
+        symbols=resolve_symbols(cfg, ctx) if ctx.get("symbols") or ctx.get("universe") else [ctx["symbol"]],
+        minutes=int(ctx["minute_interval"]),
+        days=int(ctx["days_back"]),
     ),
 }
 
+def _run_job(cfg, job: dict) -> None:
+    op = job.get("op")
+    fn = DISPATCH.get(op)
+    if not fn:
+        logger.error(f"{op} is not supported")
+        return
+
+    logger.info(f"Running {op} for {job.get('symbol')}")
+    started = time.perf_counter()
+    try:
+        fn(cfg, job)
+    except (Exception, SystemExit) as exc:
+        logger.error(f"{op} for {job.get('symbol')} failed after "
+                     f"{time.perf_counter() - started:.2f}s: {exc!r}")
+        return
+    logger.info(f"Finished {op} for {job.get('symbol')} in {time.perf_counter() - started:.2f}s")
+
+
+def _run_lane(cfg, lane: List[dict]) -> None:
+    # Jobs of one symbol stay ordered (fetch before ingest); lanes run concurrently.
+    for job in lane:
+        _run_job(cfg, job)
+
+
+def _run_concurrently(cfg, jobs: List[dict], max_in_flight: int) -> None:
+    lanes: "OrderedDict[Any, List[dict]]" = OrderedDict()
+    for job in jobs:
+        lanes.setdefault(job.get("symbol"), []).append(job)
+
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="job") as pool:
+        for lane in lanes.values():
+            pool.submit(_run_lane, cfg, lane)
+
+
 def schedule(cfg) -> None:
     logger.info("Starting scheduler")
     mongo_cfg = MongoConfig(
@@ -45,18 +142,36 @@ def schedule(cfg) -> None:
         collection = cfg.mongo.ctx_collection,
     )
     ctxReader = CtxReader(mongo_cfg)
+    max_in_flight = max(1, cfg.scheduler.max_in_flight)
+
+    if cfg.scheduler.daemon:
+        catalog = None
+        if cfg.scheduler.ctx_discovery == "incremental":
+            catalog = JobCatalog(ctxReader.collection,
+                                 poll_sec=cfg.scheduler.refresh_sec,
+                                 resync_sec=cfg.scheduler.resync_sec)
+        daemon = JobDaemon(cfg, ctxReader, _run_job,
+                           max_in_flight=max_in_flight,
+                           refresh_sec=cfg.scheduler.refresh_sec,
+                           late_policy=cfg.scheduler.late_policy,
+                           late_grace_sec=cfg.scheduler.late_grace_sec,
+                           lease_sec=cfg.scheduler.lease_sec,
+                           node_id=cfg.scheduler.node_id,
+                           catalog=catalog)
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: daemon.stop())
+        daemon.run()
+        sys.exit(0)
 
     while True:
         jobs = ctxReader.list_jobs()
         logger.info(f"Found {len(jobs)} jobs")
 
-        for job in jobs:
-            op = job.get("op")
-            logger.info(f"Running {op}")
-            fn = DISPATCH.get(op)
-            if not fn:
-                logger.error(f"{op} is not supported")
-                continue
-
-            fn(cfg, job)
+        started = time.perf_counter()
+        if max_in_flight > 1:
+            _run_concurrently(cfg, jobs, max_in_flight)
+        else:
+            _run_lane(cfg, jobs)
+        logger.info(f"Ran {len(jobs)} jobs in {time.perf_counter() - started:.2f}s "
+                    f"(max_in_flight={max_in_flight})")
         sys.exit(0)
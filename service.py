@@ -1,55 +1,110 @@
 # service.py
 from __future__ import annotations
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 from zoneinfo import ZoneInfo
 
+from models.candle_series import CandleSeries
+from parsers import IntradayParser
+
 EXCHANGE_TZ = ZoneInfo("America/New_York")
 
 class TimeSeriesService:
-    def __init__(self, client):
+    # Without `month`, outputsize=full returns the trailing 30 days of intraday bars.
+    RECENT_WINDOW_DAYS = 30
+    # outputsize=compact returns only the latest 100 bars.
+    COMPACT_BARS = 100
+
+    def __init__(self, client, max_workers: int = 4):
         self.client = client
+        self.max_workers = max_workers
+
+    def last_n_intraday_minutes(self, *, symbol: str, minutes: int, days: int,
+                                skip_months: Iterable[str] = ()) -> CandleSeries:
+        """
+        Bars of the last `days` days: the recent window plus every older `month=YYYY-MM` slice,
+        fetched concurrently. Months in `skip_months` (already stored) are not requested.
+        """
+        interval = f"{minutes}min"
+        months = self._months_to_fetch(days, skip_months)
+
+        def fetch(month: Optional[str]) -> CandleSeries:
+            payload = self.client.fetch_time_series_intraday(
+                symbol=symbol, interval=interval, outputsize="full", month=month
+            )
+            return self._parse_intraday_payload(symbol, payload)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(months)))) as pool:
+            parts = list(pool.map(fetch, months))
+
+        return self._merge_and_trim(symbol, parts, days)
 
-    def last_n_intraday_minutes(self, *, symbol: str, minutes: int, days: int) -> List[Dict[str, Any]]:
+    async def last_n_intraday_minutes_async(self, *, symbol: str, minutes: int, days: int,
+                                            skip_months: Iterable[str] = ()) -> CandleSeries:
+        """Same as last_n_intraday_minutes for an AsyncMarketDataClient; slices are fetched concurrently."""
         interval = f"{minutes}min"
+        months = self._months_to_fetch(days, skip_months)
 
-        recent = self.client.fetch_time_series_intraday(
-            symbol=symbol, interval=interval, outputsize="full", month=None
-        )
-        bars = self._parse_intraday_payload(symbol, recent)
-
-        if days > 30:
-            first_of_month = datetime.now(timezone.utc).date().replace(day=1)
-            prev_month = (first_of_month - timedelta(days=1)).strftime("%Y-%m")
-            older = self.client.fetch_time_series_intraday(
-                symbol=symbol,
-                interval=interval,
-                outputsize="full",
-                month=prev_month
+        payloads = await asyncio.gather(*(
+            self.client.fetch_time_series_intraday(
+                symbol=symbol, interval=interval, outputsize="full", month=month
             )
-            bars.extend(self._parse_intraday_payload(symbol, older))
+            for month in months
+        ))
+        parts = [self._parse_intraday_payload(symbol, payload) for payload in payloads]
+        return self._merge_and_trim(symbol, parts, days)
 
-        dedup = {(b["ts"], b["symbol"]): b for b in bars}
-        bars = sorted(dedup.values(), key=lambda b: b["ts"])
+    def intraday_since(self, *, symbol: str, minutes: int, since: datetime) -> CandleSeries:
+        """
+        Only bars strictly newer than `since` (the last stored ts). Small gaps are served by a
+        compact request (latest COMPACT_BARS bars), larger ones by the full window or a backfill.
+        """
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        gap = datetime.now(timezone.utc) - since
+        interval = f"{minutes}min"
+
+        if gap > timedelta(days=self.RECENT_WINDOW_DAYS):
+            bars = self.last_n_intraday_minutes(symbol=symbol, minutes=minutes, days=gap.days + 1)
+        else:
+            # Bars are never denser than one per interval, so a gap this short fits in compact.
+            compact = gap <= timedelta(minutes=minutes * self.COMPACT_BARS)
+            payload = self.client.fetch_time_series_intraday(
+                symbol=symbol, interval=interval,
+                outputsize="compact" if compact else "full", month=None
+            )
+            bars = self._parse_intraday_payload(symbol, payload)
+        return bars.newer_than(since)
+
+    @classmethod
+    def months_for_lookback(cls, days: int) -> List[str]:
+        """`YYYY-MM` slices (oldest first) covering the part of the lookback older than the recent window."""
+        if days <= cls.RECENT_WINDOW_DAYS:
+            return []
+        now = datetime.now(EXCHANGE_TZ).date()
+        first = (now - timedelta(days=days)).replace(day=1)
+        last = (now - timedelta(days=cls.RECENT_WINDOW_DAYS)).replace(day=1)
+        months: List[str] = []
+        while first <= last:
+            months.append(first.strftime("%Y-%m"))
+            first = (first + timedelta(days=32)).replace(day=1)
+        return months
+
+    @classmethod
+    def _months_to_fetch(cls, days: int, skip_months: Iterable[str]) -> List[Optional[str]]:
+        skip = set(skip_months)
+        return [None] + [m for m in cls.months_for_lookback(days) if m not in skip]
+
+    @staticmethod
+    def _merge_and_trim(symbol: str, parts: List[CandleSeries], days: int) -> CandleSeries:
+        # Later parts are older month slices; the recent window (first) is authoritative.
+        merged = CandleSeries.merge(parts[::-1]) if any(len(p) for p in parts) else CandleSeries.empty(symbol)
         cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-        return [b for b in bars if b["ts"] >= cutoff]
+        return merged.between(cutoff, None)
 
     @staticmethod
-    def _parse_intraday_payload(symbol: str, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Convert AV intraday JSON into normalized dicts with UTC timestamps."""
-        block = next((v for k, v in payload.items() if "Time Series" in k), {})
-        rows: List[Dict[str, Any]] = []
-        for ts_local, fields in block.items():
-            # e.g. "2025-08-22 15:35:00" in US/Eastern -> UTC
-            dt_local = datetime.strptime(ts_local, "%Y-%m-%d %H:%M:%S").replace(tzinfo=EXCHANGE_TZ)
-            ts_utc = dt_local.astimezone(timezone.utc)
-            rows.append({
-                "symbol": symbol,
-                "ts": ts_utc,
-                "open": float(fields["1. open"]),
-                "high": float(fields["2. high"]),
-                "low": float(fields["3. low"]),
-                "close": float(fields["4. close"]),
-                "volume": int(fields["5. volume"]),
-            })
-        return rows
+    def _parse_intraday_payload(symbol: str, payload: Dict[str, Any]) -> CandleSeries:
+        """Convert AV intraday JSON into a ts-sorted CandleSeries (UTC epoch seconds)."""
+        return IntradayParser.parse_intraday_series(payload, symbol)
@@ -1,25 +1,93 @@
 from __future__ import annotations
-from datetime import datetime, timezone
-from typing import Any
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional, Set
 
 from writer import CsvWriter
+from columnar import ColumnarStore, format_of
 from client import AlphaVantageClient
-from service import TimeSeriesService
+from rate_limiter import get_limiter
+from response_cache import get_cache
+from resources import http_session
+from service import TimeSeriesService, EXCHANGE_TZ
+from models.candle_series import CandleSeries
+from coverage_index import complete_months_of, get_coverage
+from db.mongo import get_candles_repo
 
-def fetch_and_save_intraday(cfg: Any, symbol: str, days: int, minutes: int, outfile: str) -> int:
-    av = AlphaVantageClient(base_url=cfg.base_url, api_key=cfg.api_key)
-    svc = TimeSeriesService(av)
+def _stored_months(cfg: Any, symbol: str, days: int, minutes: int) -> Set[str]:
+    """
+    Month slices already complete in Mongo: every trading day in the month has at least
+    [coverage] min_fill of its session stored. Judged from the coverage index when it tracks
+    the symbol, else from the stored bars' timestamps; a month with any hole is fetched again.
+    """
+    months = TimeSeriesService.months_for_lookback(days)
+    if not months:
+        return set()
+    start = datetime.strptime(months[0], "%Y-%m").replace(tzinfo=EXCHANGE_TZ)
+    end = datetime.now(EXCHANGE_TZ).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end -= timedelta(seconds=1)
+    coverage = get_coverage(cfg)
+    if coverage is not None and coverage.tracked(symbol, minutes):
+        complete = coverage.complete_months(symbol, minutes, start, end, session=cfg.coverage.session,
+                                            min_fill=cfg.coverage.min_fill)
+    else:
+        ts = get_candles_repo(cfg).fetch_range_columns(symbol, start, end, fields=("ts",))["ts"]
+        complete = complete_months_of(ts, minutes, start, end, cfg.resample.tz,
+                                      session=cfg.coverage.session, min_fill=cfg.coverage.min_fill)
+    return complete & set(months)
+
+def _watermark(cfg: Any, symbol: str, minutes: int) -> Optional[datetime]:
+    # Per (symbol, interval): bars another interval's job stored must not move this one's start.
+    return get_candles_repo(cfg).watermark(symbol, minutes)
+
+def save_candles(outfile: str, candles: Any, append: bool = False) -> int:
+    if format_of(outfile) == "csv":
+        return CsvWriter.write_intraday(outfile, candles, append=append)
+    return ColumnarStore.write(outfile, candles, append=append)
+
+def build_client(cfg: Any) -> AlphaVantageClient:
+    cache = None
+    if cfg.cache.enabled:
+        cache = get_cache(cfg.cache.dir, cfg.cache.max_mb * 1024 * 1024, cfg.cache.recent_ttl_sec)
+    return AlphaVantageClient(base_url=cfg.base_url, api_key=cfg.api_key,
+                              limiter=get_limiter(cfg.calls_per_minute, cfg.calls_per_day),
+                              cache=cache, session=http_session())
 
+def fetch_intraday(cfg: Any, svc: TimeSeriesService, symbol: str, days: int, minutes: int,
+                   resume: bool = False, incremental: bool = False) -> CandleSeries:
+    """Fetch step shared by the fetch jobs: incremental from the stored watermark, else the full window."""
     today = datetime.now(timezone.utc).date()
+    since = _watermark(cfg, symbol, minutes) if incremental else None
+    if since is not None:
+        print(f"[{today}] Fetching {minutes}-minute intraday for {symbol} newer than {since.isoformat()} …")
+        candles = svc.intraday_since(symbol=symbol, minutes=minutes, since=since)
+        print(f"Fetched {len(candles)} new {minutes}-minute bars")
+        return candles
+
     print(f"[{today}] Fetching {minutes}-minute intraday for {symbol}, last {days} days …")
 
-    candles = svc.last_n_intraday_minutes(symbol=symbol, minutes=minutes, days=days)
+    skip_months = _stored_months(cfg, symbol, days, minutes) if resume else set()
+    if skip_months:
+        print(f"Resuming: {len(skip_months)} month(s) already stored, skipping {sorted(skip_months)}")
+
+    candles = svc.last_n_intraday_minutes(symbol=symbol, minutes=minutes, days=days,
+                                          skip_months=skip_months)
     if not candles:
         raise SystemExit("No data returned.")
 
     print(f"Fetched {len(candles)} {minutes}-minute bars")
-    CsvWriter.write_intraday(outfile, candles)
-    print(f"Saved {len(candles)} rows to {outfile}")
+    return candles
 
-    av.close()
+def fetch_and_save_intraday(cfg: Any, symbol: str, days: int, minutes: int, outfile: str,
+                            resume: bool = False, incremental: bool = False, append: bool = False) -> int:
+    av = build_client(cfg)
+    svc = TimeSeriesService(av)
+    try:
+        candles = fetch_intraday(cfg, svc, symbol, days, minutes, resume=resume, incremental=incremental)
+        # Without append the file is always rewritten, so a following ingest never replays an older run's bars.
+        written = save_candles(outfile, candles, append)
+        print(f"Saved {written} rows to {outfile}")
+        if av.cache is not None:
+            print(f"Response cache: {av.cache.stats()}")
+    finally:
+        av.close()
     return len(candles)
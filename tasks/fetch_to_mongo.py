@@ -0,0 +1,52 @@
+# tasks/fetch_to_mongo.py
+from __future__ import annotations
+from typing import Any, Dict, Optional
+
+from coverage_index import get_coverage
+from db.mongo import get_candles_repo
+from service import TimeSeriesService
+from tasks.data_fetcher import build_client, fetch_intraday, save_candles
+from tasks.ingest_to_mongo import record_written
+
+def fetch_to_mongo(cfg: Any,
+                   symbol: str,
+                   days: int,
+                   minutes: int,
+                   tee_path: Optional[str] = None,
+                   resume: bool = False,
+                   incremental: bool = False,
+                   batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Fetch -> parse -> validate -> batched upsert straight into the candles collection, without
+    the CSV round-trip. `tee_path`, if given, also writes the bars to a file (csv/npy/npz).
+    """
+    repo = get_candles_repo(cfg)
+    av = build_client(cfg)
+    try:
+        candles = fetch_intraday(cfg, TimeSeriesService(av), symbol, days, minutes,
+                                 resume=resume, incremental=incremental)
+    finally:
+        av.close()
+
+    valid = candles.valid()
+    rejected = len(candles) - len(valid)
+    if rejected:
+        print(f"Dropped {rejected} invalid bars for {symbol}")
+
+    if tee_path:
+        written = save_candles(tee_path, valid)
+        print(f"Saved {written} rows to {tee_path}")
+
+    coverage = get_coverage(cfg)
+    total_upserted = 0
+    total_matched = 0
+    for start in range(0, len(valid), batch_size):
+        batch = valid[start:start + batch_size]
+        res = repo.upsert_many(batch, ordered=False)
+        record_written(repo, coverage, batch, minutes)
+        total_upserted += res["upserted"]
+        total_matched  += res["matched"]
+
+    print(f"Mongo upserted: {total_upserted} | matched/updated: {total_matched} | processed: {len(valid)}")
+    return {"upserted": total_upserted, "matched": total_matched,
+            "processed": len(valid), "rejected": rejected}
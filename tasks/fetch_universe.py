@@ -0,0 +1,94 @@
+# tasks/fetch_universe.py
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from coverage_index import get_coverage
+from db.mongo import get_candles_repo
+from models.candle_series import CandleSeries
+from service import TimeSeriesService
+from tasks.data_fetcher import build_client, fetch_intraday, save_candles
+from tasks.ingest_to_mongo import ingest_docs, record_written
+
+
+def resolve_symbols(cfg: Any, ctx: Dict[str, Any]) -> List[str]:
+    """Symbols of a universe ctx: its own `symbols` list, else the named [universes] entry."""
+    symbols = ctx.get("symbols") or []
+    if not symbols and ctx.get("universe"):
+        name = ctx["universe"]
+        if name not in cfg.universes:
+            raise SystemExit(f"Unknown universe {name!r}; define it under [universes] in config.ini")
+        symbols = cfg.universes[name]
+    return list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+
+
+def fetch_universe(cfg: Any,
+                   symbols: Sequence[str],
+                   days: int,
+                   minutes: int,
+                   tee_path: Optional[Callable[[str], str]] = None,
+                   resume: bool = False,
+                   incremental: bool = False,
+                   fetch_workers: int = 4) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch every symbol with one shared client (HTTP session, rate limiter, response cache)
+    and upsert all their bars through a single bulk ingest; bars are written as soon as each
+    symbol's fetch completes. `tee_path(symbol)`, if given, also writes each symbol to a file.
+    A failing symbol doesn't stop the others; the per-symbol outcome is returned and printed.
+    """
+    repo = get_candles_repo(cfg)
+    av = build_client(cfg)
+    svc = TimeSeriesService(av)
+    coverage = get_coverage(cfg)
+    outcomes: Dict[str, Dict[str, Any]] = {s: {"status": "pending", "bars": 0, "rejected": 0}
+                                           for s in symbols}
+
+    def fetch_one(symbol: str) -> CandleSeries:
+        return fetch_intraday(cfg, svc, symbol, days, minutes, resume=resume, incremental=incremental)
+
+    def fetched_docs(pool: ThreadPoolExecutor) -> Iterator[Dict[str, Any]]:
+        futures = {pool.submit(fetch_one, s): s for s in symbols}
+        for fut in as_completed(futures):
+            symbol = futures[fut]
+            out = outcomes[symbol]
+            try:
+                candles = fut.result()
+            except (Exception, SystemExit) as exc:
+                out.update(status="fetch_failed", error=str(exc))
+                continue
+            valid = candles.valid()
+            out.update(status="ok" if len(valid) else "empty", bars=len(valid),
+                       rejected=len(candles) - len(valid))
+            if tee_path is not None and len(valid):
+                try:
+                    save_candles(tee_path(symbol), valid)
+                except OSError as exc:
+                    out["tee_error"] = str(exc)
+            yield from valid.iter_docs()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, fetch_workers), thread_name_prefix="universe") as pool:
+            stats = ingest_docs(repo, fetched_docs(pool),
+                                batch_size=cfg.ingest.batch_size,
+                                workers=cfg.ingest.workers,
+                                max_in_flight=cfg.ingest.max_in_flight,
+                                max_retries=cfg.ingest.max_retries,
+                                on_written=lambda batch: record_written(repo, coverage, batch, minutes))
+    finally:
+        av.close()
+
+    for symbol, failed in stats.failed_by_symbol.items():
+        outcomes[symbol].update(status="write_failed", failed_rows=failed)
+
+    stats.report(cfg.ingest.workers)
+    counts: Dict[str, int] = {}
+    for out in outcomes.values():
+        counts[out["status"]] = counts.get(out["status"], 0) + 1
+    print(f"Universe of {len(symbols)} symbols: "
+          + ", ".join(f"{status}={n}" for status, n in sorted(counts.items())))
+    for symbol, out in outcomes.items():
+        if out["status"] not in ("ok", "empty"):
+            print(f"  {symbol}: {out['status']} {out.get('error', '')}".rstrip())
+    if av.cache is not None:
+        print(f"Response cache: {av.cache.stats()}")
+    return outcomes
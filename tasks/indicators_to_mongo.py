@@ -0,0 +1,121 @@
+# tasks/indicators_to_mongo.py
+from __future__ import annotations
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+import numpy as np
+
+from db.mongo import get_bars_repo, get_indicators_repo, get_repo, indicators_consumer
+from indicators import IndicatorSet, specs_key
+from models.candle_series import CandleSeries
+
+
+def _rows(series: CandleSeries, values: Dict[str, np.ndarray]) -> Iterator[Dict[str, Any]]:
+    # NaN (warm-up) is stored as null so unchanged rows compare equal on re-runs.
+    naive = series.datetimes().astype(object)
+    cols = {name: np.where(np.isnan(v), None, v).tolist() for name, v in values.items()}
+    for i, dt in enumerate(naive):
+        yield {"symbol": series.symbol, "ts": dt.replace(tzinfo=timezone.utc),
+               **{name: col[i] for name, col in cols.items()}}
+
+
+def _utc(ts: Optional[datetime]) -> Optional[datetime]:
+    return ts if ts is None or ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def _update_interval(src: Any, dst: Any, states: Any, symbol: str, interval: str,
+                     ind: IndicatorSet, chunk: timedelta, dirty: Optional[datetime]) -> int:
+    key = f"{symbol}|{interval}|{specs_key(ind.specs)}"
+    first = src.earliest_ts(symbol)
+    saved = states.find_one({"_id": key})
+    checkpoint: Optional[datetime] = None
+    if saved is not None and tuple(saved.get("specs", ())) == ind.specs:
+        checkpoint = _utc(saved["last_ts"])
+        first_ts = _utc(saved.get("first_ts"))
+        # Bars stored before the first computed one, or written at/below the checkpoint since
+        # the last run (a backfill, a revised bar), invalidate the saved state: start over.
+        if (first is not None and first_ts is not None and first < first_ts) \
+                or (dirty is not None and dirty <= checkpoint):
+            print(f"Indicators for {symbol} {interval}: bars changed before {checkpoint}, recomputing")
+            checkpoint = None
+    if checkpoint is not None:
+        ind.load(saved["state"])
+        lo: Optional[datetime] = checkpoint + timedelta(seconds=1)
+        first_ts = _utc(saved.get("first_ts")) or first
+    else:
+        lo = first_ts = first
+    end = src.latest_ts(symbol)
+    if lo is None or end is None or lo > end:
+        return 0
+
+    state = ind.state()
+    n = 0
+    while lo <= end:
+        hi = min(lo + chunk, end + timedelta(seconds=1))
+        bars = src.fetch_range_series(symbol, lo, hi - timedelta(seconds=1))
+        lo = hi
+        if not len(bars):
+            continue
+        # The newest bar (end of the final chunk) is computed but not checkpointed.
+        done = bars[:-1] if hi > end else bars
+        values = ind.update(done)
+        if len(done):
+            state, checkpoint = ind.state(), done.end()
+        if hi > end:
+            last = ind.update(bars[-1:])
+            values = {k: np.concatenate((v, last[k])) for k, v in values.items()}
+        dst.upsert_many(_rows(bars, values))
+        n += len(bars)
+
+    if checkpoint is not None:
+        states.replace_one({"_id": key}, {"_id": key, "symbol": symbol, "interval": interval,
+                                          "specs": list(ind.specs), "first_ts": first_ts,
+                                          "last_ts": checkpoint, "state": state,
+                                          "updated_at": datetime.now(timezone.utc)},
+                           upsert=True)
+    return n
+
+
+def indicators_to_mongo(cfg: Any,
+                        symbols: Sequence[str],
+                        intervals: Optional[Sequence[str]] = None,
+                        specs: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, int]]:
+    """
+    Compute indicator columns (default: [indicators] specs) over each symbol's bars of every
+    interval ("base" = the candles collection, else its resampled collection) and upsert one
+    row per bar into get_indicators_repo. The IndicatorSet state is checkpointed in
+    `<collection>_state`, one document per (symbol, interval, specs hash), so a run only reads
+    and computes the bars added since the last one. The newest bar may still change (an open
+    resampled bucket, a revised last minute), so the checkpoint is taken just before it and
+    the next run computes it again. Older changes are picked up from this job's dirty marks on
+    the bars repo (upsert_many records the oldest ts it inserted or changed, for the
+    [indicators] specs) and from its earliest bar: when either falls at or below the
+    checkpoint, the series is recomputed from its first bar. Bars written around upsert_many
+    (e.g. by hand in the shell), or for `specs` other than the configured ones, are not marked;
+    delete the state document to recompute.
+    """
+    st = cfg.indicators
+    specs = tuple(specs or st.specs)
+    consumer = indicators_consumer(specs)
+    chunk = timedelta(days=max(1, st.chunk_days))
+    states = get_repo(uri=cfg.mongo.uri, db=cfg.mongo.db, collection=f"{st.collection}_state").col
+    written: Dict[str, Dict[str, int]] = {}
+
+    for symbol in symbols:
+        counts: Dict[str, int] = {}
+        for interval in intervals or st.intervals:
+            src = get_bars_repo(cfg, interval)
+            dst = get_indicators_repo(cfg, interval)
+            dirty = src.take_dirty_since(symbol, consumer)
+            try:
+                counts[interval] = _update_interval(src, dst, states, symbol, interval,
+                                                    IndicatorSet(specs, cfg.resample.tz), chunk, dirty)
+            except BaseException:
+                # Not acted on: hand the mark back for the next run.
+                if dirty is not None:
+                    src.mark_dirty({symbol: dirty}, [consumer])
+                raise
+
+        written[symbol] = counts
+        print(f"Indicators for {symbol}: " + ", ".join(f"{k}={n} bars" for k, n in counts.items()))
+    return written
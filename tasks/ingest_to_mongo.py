@@ -1,38 +1,245 @@
 # tasks/ingest_csv_to_mongo.py
 from __future__ import annotations
-from typing import Any, Dict, List
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+import queue
+import threading
+import time
 
-from csv_to_mongo_helper import docs_from_csv
-from db.mongo import get_repo
+from pymongo.errors import PyMongoError
 
-def ingest_csv_to_mongo(cfg: Any,
-                        csv_path: str,
-                        default_symbol: str,
-                        batch_size: int = 1000) -> Dict[str, int]:
+from csv_to_mongo_helper import series_batches_from_csv
+from columnar import ColumnarStore, format_of
+from coverage_index import CoverageIndex, get_coverage
+from db.mongo import get_candles_repo, MongoPriceRepo
+from models.candle_series import CandleSeries
+from rate_limiter import jittered_backoff
+
+# A write batch: row dicts, or a CandleSeries slice (its dicts are only built inside upsert_many).
+Batch = Union[List[Dict[str, Any]], CandleSeries]
 
-    repo = get_repo(uri=cfg.mongo.uri,
-                    db=cfg.mongo.db,
-                    collection=cfg.mongo.candles_collection)
 
-    total_upserted = 0
-    total_matched = 0
-    total = 0
+class _IngestStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.upserted = 0
+        self.matched = 0
+        self.unchanged = 0
+        self.processed = 0
+        self.failed_batches = 0
+        self.failed_rows = 0
+        self.failed_by_symbol: Dict[str, int] = {}
+        self.latencies: List[float] = []
+        self.elapsed = 0.0
 
-    batch: List[Dict] = []
-    for doc in docs_from_csv(csv_path, default_symbol):
+    def record(self, batch: Batch, res: Optional[Dict[str, int]], latency: float) -> None:
+        with self.lock:
+            self.latencies.append(latency)
+            if res is None:
+                self.failed_batches += 1
+                self.failed_rows += len(batch)
+                if isinstance(batch, CandleSeries):
+                    counts = {batch.symbol: len(batch)}
+                else:
+                    counts = Counter(d["symbol"] for d in batch)
+                for sym, n in counts.items():
+                    self.failed_by_symbol[sym] = self.failed_by_symbol.get(sym, 0) + n
+                return
+            self.upserted += res["upserted"]
+            self.matched += res["matched"]
+            self.unchanged += res.get("unchanged", 0)
+            self.processed += len(batch)
+
+    def report(self, workers: int) -> None:
+        lat = sorted(self.latencies)
+        p50 = lat[len(lat) // 2] * 1000 if lat else 0.0
+        worst = lat[-1] * 1000 if lat else 0.0
+        print(f"Mongo upserted: {self.upserted} | matched/updated: {self.matched} "
+              f"(unchanged, not sent: {self.unchanged}) | processed: {self.processed}")
+        print(f"Ingest: {self.processed / self.elapsed if self.elapsed else 0:,.0f} rows/s over {len(lat)} batches "
+              f"(p50 {p50:.1f} ms, max {worst:.1f} ms, workers={workers})"
+              + (f" | failed batches: {self.failed_batches} ({self.failed_rows} rows)" if self.failed_batches else ""))
+
+
+def _batches(docs: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch: List[Dict[str, Any]] = []
+    for doc in docs:
         batch.append(doc)
         if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _series_batches(series: Iterable[CandleSeries], batch_size: int) -> Iterator[CandleSeries]:
+    for part in series:
+        for start in range(0, len(part), batch_size):
+            yield part[start:start + batch_size]
+
+
+OnWritten = Callable[[Batch], None]
+
+
+def record_coverage(coverage: Optional[CoverageIndex], bars: Any, minutes: Optional[int]) -> None:
+    """Mark written bars in the coverage index; a failure here never fails the write itself."""
+    if coverage is None or not minutes:
+        return
+    try:
+        coverage.record(bars, minutes)
+    except Exception as exc:
+        # Bookkeeping only: any failure (Mongo or an unexpected bar) is logged, never raised.
+        print(f"Could not update the coverage index: {exc!r}")
+
+
+def record_written(repo: MongoPriceRepo, coverage: Optional[CoverageIndex], bars: Any,
+                   minutes: Optional[int]) -> None:
+    """
+    Bookkeeping for bars of `minutes` length once they are stored: advance their (symbol,
+    interval) watermarks and mark them in the coverage index. Neither ever fails the write.
+    """
+    if not minutes:
+        return
+    try:
+        repo.advance_watermarks(bars, minutes)
+    except Exception as exc:
+        print(f"Could not advance the {minutes}-minute watermark: {exc!r}")
+    record_coverage(coverage, bars, minutes)
+
+
+def _write_batch(repo: MongoPriceRepo, batch: Batch, stats: _IngestStats,
+                 max_retries: int, on_written: Optional[OnWritten] = None) -> None:
+    started = time.perf_counter()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
             res = repo.upsert_many(batch, ordered=False)
-            total_upserted += res["upserted"]
-            total_matched  += res["matched"]
-            total          += len(batch)
-            batch.clear()
+            break
+        except PyMongoError as exc:
+            # Upserts are idempotent, so replaying a partially applied batch is safe.
+            if attempt >= max_retries:
+                print(f"Batch of {len(batch)} failed after {attempt} attempts: {exc}")
+                res = None
+                break
+            time.sleep(jittered_backoff(attempt, 0.5, 10))
+        except Exception as exc:
+            # A malformed doc (missing symbol/ts, unencodable value) fails the same way every time.
+            print(f"Batch of {len(batch)} rejected: {exc!r}")
+            res = None
+            break
+    stats.record(batch, res, time.perf_counter() - started)
+    if res is not None and on_written is not None:
+        on_written(batch)
 
-    if batch:
-        res = repo.upsert_many(batch, ordered=False)
-        total_upserted += res["upserted"]
-        total_matched  += res["matched"]
-        total          += len(batch)
 
-    print(f"Mongo upserted: {total_upserted} | matched/updated: {total_matched} | processed: {total}")
-    return {"upserted": total_upserted, "matched": total_matched, "processed": total}
+def _worker(repo: MongoPriceRepo, q: "queue.Queue[Optional[Batch]]",
+            stats: _IngestStats, max_retries: int, on_written: Optional[OnWritten],
+            errors: List[BaseException]) -> None:
+    while True:
+        batch = q.get()
+        if batch is None:
+            return
+        try:
+            _write_batch(repo, batch, stats, max_retries, on_written)
+        except BaseException as exc:
+            errors.append(exc)
+            return
+
+
+def _put(q: "queue.Queue[Optional[Batch]]", item: Optional[Batch],
+         threads: List[threading.Thread]) -> bool:
+    """Blocking put that gives up (returns False) once no writer is left to drain the queue."""
+    while True:
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            if not any(t.is_alive() for t in threads):
+                return False
+
+
+def ingest_docs(repo: MongoPriceRepo,
+                docs: Iterable[Dict[str, Any]],
+                batch_size: int = 1000,
+                workers: int = 1,
+                max_in_flight: int = 4,
+                max_retries: int = 3,
+                on_written: Optional[OnWritten] = None) -> _IngestStats:
+    """Upsert row dicts in batches of `batch_size` via ingest_batches."""
+    return ingest_batches(repo, _batches(docs, batch_size), workers=workers, max_in_flight=max_in_flight,
+                          max_retries=max_retries, on_written=on_written)
+
+
+def ingest_batches(repo: MongoPriceRepo,
+                   batches: Iterable[Batch],
+                   workers: int = 1,
+                   max_in_flight: int = 4,
+                   max_retries: int = 3,
+                   on_written: Optional[OnWritten] = None) -> _IngestStats:
+    """
+    Upsert `batches` (row dict lists or CandleSeries). With `workers > 1` producing and writing
+    overlap: the producer fills a queue bounded at `max_in_flight` batches (it blocks when the
+    writers fall behind) and `workers` threads drain it with bulk writes, retrying failed
+    batches. `on_written` is called (from the writing thread) with every batch once it is
+    stored. Batches that can't be written are counted as failed; an unexpected error in a
+    writer stops the ingest and is raised here once the other writers are done.
+    """
+    stats = _IngestStats()
+    started = time.perf_counter()
+    if workers <= 1:
+        for batch in batches:
+            _write_batch(repo, batch, stats, max_retries, on_written)
+    else:
+        q: "queue.Queue[Optional[Batch]]" = queue.Queue(maxsize=max_in_flight)
+        errors: List[BaseException] = []
+        threads = [threading.Thread(target=_worker, args=(repo, q, stats, max_retries, on_written, errors),
+                                    name=f"ingest-{i}", daemon=True)
+                   for i in range(workers)]
+        for t in threads:
+            t.start()
+        try:
+            for batch in batches:
+                if errors or not _put(q, batch, threads):
+                    break
+        finally:
+            for _ in threads:
+                if not _put(q, None, threads):
+                    break
+            for t in threads:
+                t.join()
+        if errors:
+            raise errors[0]
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+
+def ingest_csv_to_mongo(cfg: Any,
+                        csv_path: str,
+                        default_symbol: str,
+                        batch_size: int = 1000,
+                        workers: int = 1,
+                        max_in_flight: int = 4,
+                        max_retries: int = 3,
+                        parse_workers: int = 1,
+                        minutes: Optional[int] = None) -> Dict[str, int]:
+    """
+    Upsert a fetched file (CSV or columnar) into the candles collection via ingest_batches,
+    as CandleSeries slices of `batch_size` bars.
+    `parse_workers > 1` parses large CSVs in byte ranges on a process pool. Given the bar
+    length `minutes`, stored batches also advance the watermarks and the coverage index.
+    """
+    repo = get_candles_repo(cfg)
+    coverage = get_coverage(cfg) if minutes else None
+
+    if format_of(csv_path) == "csv":
+        series = series_batches_from_csv(csv_path, default_symbol, workers=parse_workers)
+    else:
+        series = [ColumnarStore.read(csv_path)]
+
+    stats = ingest_batches(repo, _series_batches(series, batch_size), workers=workers,
+                           max_in_flight=max_in_flight, max_retries=max_retries,
+                           on_written=lambda batch: record_written(repo, coverage, batch, minutes))
+    stats.report(workers)
+    return {"upserted": stats.upserted, "matched": stats.matched, "unchanged": stats.unchanged,
+            "processed": stats.processed, "failed": stats.failed_rows}
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# tasks/migrate_to_timeseries.py
+"""
+Copy the candles collection into a native MongoDB time-series collection.
+
+    python -m tasks.migrate_to_timeseries --config config.ini [--target prices_ts] [--swap]
+
+With --swap the original collection is renamed to `<name>_backup` and the time-series copy takes
+its name; set `timeseries = true` under [mongo] afterwards.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional
+import argparse
+
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
+
+from config.config import ConfigLoader
+from db.mongo import MongoConfig, MongoPriceRepo, granularity_for
+
+
+def migrate(cfg: Any, target: Optional[str] = None, granularity: Optional[str] = None,
+            batch_size: int = 5000, swap: bool = False) -> Dict[str, int]:
+    source = cfg.mongo.candles_collection or "prices"
+    target = target or f"{source}_ts"
+    granularity = granularity or cfg.mongo.granularity or granularity_for(cfg.intraday_minutes)
+
+    dst = MongoPriceRepo(MongoConfig(uri=cfg.mongo.uri, db=cfg.mongo.db, collection=target,
+                                     timeseries=True, granularity=granularity))
+    dst.ensure_schema()
+    if dst.col.estimated_document_count():
+        # Time-series collections have no unique index, so a second copy would duplicate bars.
+        raise SystemExit(f"{target} already holds documents; drop it before migrating again.")
+    src = dst.db[source]
+
+    copied = 0
+    batch: List[Dict[str, Any]] = []
+    cur = src.find({}, projection={"_id": 0}, batch_size=batch_size).sort([("symbol", ASCENDING), ("ts", ASCENDING)])
+    for doc in cur:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            copied += _insert(dst, batch)
+            batch = []
+    if batch:
+        copied += _insert(dst, batch)
+    print(f"Copied {copied} candles from {source} to time-series collection {target} ({granularity})")
+
+    if swap:
+        src.rename(f"{source}_backup")
+        dst.col.rename(source)
+        print(f"Renamed {source} -> {source}_backup and {target} -> {source}")
+
+    dst.close()
+    return {"copied": copied}
+
+
+def _insert(dst: MongoPriceRepo, batch: List[Dict[str, Any]]) -> int:
+    try:
+        return len(dst.col.insert_many(batch, ordered=False).inserted_ids)
+    except BulkWriteError as exc:
+        return exc.details.get("nInserted", 0)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Migrate candles into a MongoDB time-series collection.")
+    p.add_argument("--config", default="config.ini", help="Path to config.ini")
+    p.add_argument("--target", help="Target collection (default: <candles_collection>_ts)")
+    p.add_argument("--granularity", choices=["seconds", "minutes", "hours"],
+                   help="Bucket granularity (default: derived from intradayMinutes)")
+    p.add_argument("--batch-size", type=int, default=5000)
+    p.add_argument("--swap", action="store_true", help="Replace the source collection with the copy")
+    args = p.parse_args()
+
+    cfg = ConfigLoader.load(args.config)
+    migrate(cfg, target=args.target, granularity=args.granularity,
+            batch_size=args.batch_size, swap=args.swap)
+
+
+if __name__ == "__main__":
+    main()
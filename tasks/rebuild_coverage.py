@@ -0,0 +1,39 @@
+# tasks/rebuild_coverage.py
+from __future__ import annotations
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Sequence
+
+from coverage_index import get_coverage
+from db.mongo import get_candles_repo
+
+
+def rebuild_coverage(cfg: Any, symbols: Sequence[str], minutes: int, days: int) -> Dict[str, int]:
+    """
+    Rebuild the coverage index of the last `days` days from the candles collection (for bars
+    stored before the index existed, or after bars were deleted) and print what is missing.
+    Symbols with candles fetched at another interval too are skipped: a rebuild can't tell
+    which stored bars are `minutes` bars.
+    """
+    coverage = get_coverage(cfg)
+    if coverage is None:
+        raise SystemExit("The coverage index is disabled; set enabled = true under [coverage]")
+    repo = get_candles_repo(cfg)
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=days)
+    found: Dict[str, int] = {}
+    for symbol in symbols:
+        others = [m for m in repo.stored_intervals(symbol) if m != minutes]
+        if others:
+            print(f"Not rebuilding {minutes}min coverage of {symbol}: {repo.col.name} also holds its "
+                  f"{', '.join(f'{m}min' for m in others)} bars")
+            continue
+        found[symbol] = coverage.rebuild(repo, symbol, minutes, start, end)
+        fill = coverage.day_fill(symbol, minutes, start, end, cfg.coverage.session)
+        partial = sorted(day for day, (have, want) in fill.items() if have < want)
+        missing = sum(want - have for have, want in fill.values())
+        holes = coverage.months_with_holes(symbol, minutes, start, end, cfg.coverage.session,
+                                           cfg.coverage.min_fill)
+        print(f"Coverage {symbol} {minutes}min, last {days} days: {found[symbol]} bars stored, "
+              f"{missing} {cfg.coverage.session}-session bars missing on {len(partial)} of {len(fill)} "
+              f"trading days" + (f"; months below min_fill: {sorted(holes)}" if holes else ""))
+    return found
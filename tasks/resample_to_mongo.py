@@ -0,0 +1,107 @@
+# tasks/resample_to_mongo.py
+from __future__ import annotations
+from datetime import datetime, time, timedelta, timezone
+from typing import Any, Dict, Optional, Sequence
+from zoneinfo import ZoneInfo
+
+from db.mongo import get_candles_repo, get_resampled_repo, resample_consumer
+from resample import DAY, Resampler, interval_label, parse_interval
+
+
+def _day_start(ts: datetime, tz: str) -> datetime:
+    # Local midnight of the day holding `ts`: no output bucket spans it.
+    local = ts.astimezone(ZoneInfo(tz)).date()
+    return datetime.combine(local, time(0), ZoneInfo(tz)).astimezone(timezone.utc)
+
+
+def _resume_at(newest: Optional[datetime], dirty: Optional[datetime], minutes: int,
+               first: datetime, tz: str) -> datetime:
+    """First source bar to read for a target whose newest bar is `newest`, given its dirty mark."""
+    if newest is None:
+        since = first
+    elif minutes == DAY:
+        # Daily bars are labelled with the local date at 00:00 UTC, not their first minute.
+        since = datetime.combine(newest.date(), time(0), ZoneInfo(tz)).astimezone(timezone.utc)
+    else:
+        since = newest
+    if dirty is not None and dirty < since:
+        # A backfilled or revised bar: aggregate again from the start of its local day.
+        since = max(first, _day_start(dirty, tz))
+    return since
+
+
+def resample_to_mongo(cfg: Any,
+                      symbols: Sequence[str],
+                      intervals: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, int]]:
+    """
+    Derive `intervals` bars (default: [resample] intervals) from the stored candles and upsert
+    them into one collection per interval (see get_resampled_repo). Each interval resumes at
+    the newest bar it already holds, which may have been written while still filling, so a run
+    only reads the source bars from there on, in chunks of `chunk_days`. Candles inserted or
+    changed below that point since the last run (a backfill, a revised bar) are found through
+    the interval's dirty mark on the candles repo, and their local days are aggregated again.
+    Intraday intervals use the [resample] session, daily bars the daily_session. A symbol whose
+    candles were fetched at several intervals (see MongoPriceRepo.stored_intervals) is skipped,
+    since its bars can't be told apart, and intervals that aren't a multiple of the stored one
+    are skipped for it.
+    """
+    rs = cfg.resample
+    src = get_candles_repo(cfg)
+    minutes = list(dict.fromkeys(parse_interval(i) for i in (intervals or rs.intervals)))
+    chunk = timedelta(days=max(1, rs.chunk_days))
+    written: Dict[str, Dict[str, int]] = {}
+
+    for symbol in symbols:
+        end = src.latest_ts(symbol)
+        first = src.earliest_ts(symbol) if end is not None else None
+        if end is None or first is None:
+            print(f"No stored bars for {symbol}; nothing to resample")
+            continue
+        bases = src.stored_intervals(symbol)
+        if len(bases) > 1:
+            print(f"{symbol} has bars of several intervals ({', '.join(f'{m}min' for m in bases)}) "
+                  f"in {src.col.name}; not resampling a mix of them")
+            continue
+        base = bases[0] if bases else cfg.intraday_minutes
+        usable = [m for m in minutes if m % base == 0]
+        if len(usable) < len(minutes):
+            print(f"Not resampling the {base}min bars of {symbol} to "
+                  f"{', '.join(interval_label(m) for m in minutes if m % base)}: not a multiple of {base}min")
+        if not usable:
+            continue
+
+        targets = {m: get_resampled_repo(cfg, m) for m in usable}
+        dirty = {m: src.take_dirty_since(symbol, resample_consumer(m)) for m in usable}
+        try:
+            counts = _resample_symbol(src, targets, symbol, first, end, dirty, chunk, rs)
+        except BaseException:
+            # Not acted on: hand the marks back for the next run.
+            for m, ts in dirty.items():
+                if ts is not None:
+                    src.mark_dirty({symbol: ts}, [resample_consumer(m)])
+            raise
+        written[symbol] = counts
+    return written
+
+
+def _resample_symbol(src: Any, targets: Dict[int, Any], symbol: str, first: datetime, end: datetime,
+                     dirty: Dict[int, Optional[datetime]], chunk: timedelta, rs: Any) -> Dict[str, int]:
+    since = {m: _resume_at(repo.latest_ts(symbol), dirty[m], m, first, rs.tz) for m, repo in targets.items()}
+    resamplers = {m: Resampler(symbol, m, rs.daily_session if m == DAY else rs.session, rs.tz)
+                  for m in targets}
+    counts = {interval_label(m): 0 for m in targets}
+
+    lo = min(since.values())
+    while lo <= end:
+        hi = min(lo + chunk, end + timedelta(seconds=1))
+        bars = src.fetch_range_series(symbol, lo, hi - timedelta(seconds=1))
+        for m, resampler in resamplers.items():
+            out = resampler.update(bars.between(since[m], None))
+            if len(out):
+                targets[m].upsert_many(out)
+                counts[interval_label(m)] += len(out)
+        lo = hi
+
+    span = f"{min(since.values()).isoformat()} .. {end.isoformat()}"
+    print(f"Resampled {symbol} ({span}): " + ", ".join(f"{k}={n}" for k, n in counts.items()))
+    return counts
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The modules live at the repo root (no package), as main.py imports them.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
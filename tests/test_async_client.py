@@ -0,0 +1,150 @@
+from __future__ import annotations
+import asyncio
+from collections import Counter
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Tuple
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from async_client import AsyncAlphaVantageClient
+from response_cache import ResponseCache
+from service import EXCHANGE_TZ, TimeSeriesService
+
+
+def _bar(local: datetime, close: float) -> dict:
+    return {local.strftime("%Y-%m-%d %H:%M:%S"): {
+        "1. open": "1.0", "2. high": "2.0", "3. low": "0.5", "4. close": str(close), "5. volume": "100"}}
+
+
+def _recent_local() -> datetime:
+    return (datetime.now(EXCHANGE_TZ) - timedelta(days=1)).replace(hour=10, minute=0, second=0,
+                                                                     microsecond=0, tzinfo=None)
+
+
+class StubAlphaVantage:
+    """Canned Alpha Vantage JSON; the first `throttled` calls per request are answered with a throttle note."""
+
+    def __init__(self, throttled: int = 0, note_key: str = "Note", unavailable: Tuple[str, ...] = ()):
+        self.throttled = throttled
+        self.note_key = note_key
+        self.unavailable = unavailable  # symbols answered with one HTTP 503 first
+        self.calls: Counter = Counter()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        q = request.query
+        assert q["apikey"] == "demo"
+        key = (q["function"], q.get("symbol"), q.get("month"))
+        self.calls[key] += 1
+        if q.get("symbol") in self.unavailable and self.calls[key] == 1:
+            # Past aiohttp's read-ahead: the connection stays checked out until the body is read.
+            return web.Response(status=503, text="Service Unavailable " * 200_000)
+        if self.calls[key] <= self.throttled:
+            msg = ("Thank you for using Alpha Vantage! Our standard API rate limit is 5 requests per minute."
+                   if self.note_key == "Information" else "Please slow down.")
+            return web.json_response({self.note_key: msg})
+        if "month" in q:
+            local = datetime.strptime(q["month"], "%Y-%m").replace(day=15, hour=10)
+        else:
+            local = _recent_local()
+        # AV sometimes labels JSON as text/plain.
+        return web.json_response({"Meta Data": {"2. Symbol": q["symbol"]},
+                                  f"Time Series ({q['interval']})": _bar(local, 1.5)},
+                                 content_type="text/plain")
+
+
+def _run(stub: StubAlphaVantage, body, **client_kw):
+    async def main():
+        app = web.Application()
+        app.router.add_get("/query", stub.handle)
+        async with TestServer(app) as server:
+            async with AsyncAlphaVantageClient(str(server.make_url("/query")), "demo", max_retries=3,
+                                               **{"backoff_sec": 0.01, **client_kw}) as client:
+                return await body(client)
+    return asyncio.run(main())
+
+
+def test_fetch_series_and_intraday():
+    stub = StubAlphaVantage()
+
+    async def body(client):
+        raw = await client.fetch_series("TIME_SERIES_INTRADAY", symbol="IBM", interval="5min")
+        intraday = await client.fetch_time_series_intraday("IBM", interval="5min", month="2024-03")
+        return raw, intraday
+
+    raw, intraday = _run(stub, body)
+    assert raw["Meta Data"]["2. Symbol"] == "IBM"
+    assert list(intraday["Time Series (5min)"]) == ["2024-03-15 10:00:00"]
+    assert stub.calls[("TIME_SERIES_INTRADAY", "IBM", "2024-03")] == 1
+
+
+def test_throttle_note_is_retried():
+    for note_key in ("Note", "Information"):
+        stub = StubAlphaVantage(throttled=1, note_key=note_key)
+        data = _run(stub, lambda c: c.fetch_time_series_intraday("IBM", interval="1min"))
+        assert "Time Series (1min)" in data
+        assert stub.calls[("TIME_SERIES_INTRADAY", "IBM", None)] == 2
+
+
+def test_last_n_intraday_minutes_async_fans_out():
+    stub = StubAlphaVantage(throttled=1)
+    days = 100
+    bars = _run(stub, lambda c: TimeSeriesService(c).last_n_intraday_minutes_async(
+        symbol="IBM", minutes=5, days=days))
+
+    months = TimeSeriesService.months_for_lookback(days)
+    assert set(stub.calls) == {("TIME_SERIES_INTRADAY", "IBM", m) for m in [None, *months]}
+    assert all(n == 2 for n in stub.calls.values())
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    expected = sorted(dt for dt in (
+        *(datetime.strptime(m, "%Y-%m").replace(day=15, hour=10, tzinfo=EXCHANGE_TZ) for m in months),
+        _recent_local().replace(tzinfo=EXCHANGE_TZ),
+    ) if dt >= cutoff)
+    assert [int(t) for t in bars.ts] == [int(dt.timestamp()) for dt in expected]
+
+
+def test_backoff_sleep_releases_the_pooled_connection():
+    stub = StubAlphaVantage(unavailable=("SLOW",))
+
+    async def body(client):
+        client._backoff = lambda attempt: 0.5
+        slow = asyncio.ensure_future(client.fetch_time_series_intraday("SLOW", interval="1min"))
+        await asyncio.sleep(0.1)  # SLOW got its 503 and is backing off
+        started = time.perf_counter()
+        await client.fetch_time_series_intraday("FAST", interval="1min")
+        fast = time.perf_counter() - started
+        await slow
+        return fast
+
+    # One pooled connection: FAST only gets it if SLOW's backoff doesn't hold it.
+    assert _run(stub, body, pool_size=1) < 0.3
+    assert stub.calls[("TIME_SERIES_INTRADAY", "SLOW", None)] == 2
+
+
+def test_cache_io_runs_off_the_event_loop(tmp_path):
+    class RecordingCache(ResponseCache):
+        threads = set()
+
+        def get(self, params):
+            self.threads.add(threading.get_ident())
+            return super().get(params)
+
+        def put(self, params, data):
+            self.threads.add(threading.get_ident())
+            super().put(params, data)
+
+    stub = StubAlphaVantage()
+    cache = RecordingCache(str(tmp_path))
+
+    async def body(client):
+        loop_thread = threading.get_ident()
+        first = await client.fetch_time_series_intraday("IBM", interval="1min", month="2024-03")
+        second = await client.fetch_time_series_intraday("IBM", interval="1min", month="2024-03")
+        return loop_thread, first, second
+
+    loop_thread, first, second = _run(stub, body, cache=cache)
+    assert first == second and stub.calls[("TIME_SERIES_INTRADAY", "IBM", "2024-03")] == 1
+    assert cache.threads and loop_thread not in cache.threads
@@ -0,0 +1,110 @@
+from __future__ import annotations
+from typing import List, Tuple
+
+import candle_cache
+from candle_cache import CandleCache
+from models.candle_series import CandleSeries
+
+T0 = 1_700_000_000
+
+
+def _bars(symbol: str, lo: int, hi: int) -> CandleSeries:
+    ts = [t for t in range(T0, T0 + 1000 * 60, 60) if lo <= t <= hi]
+    c = [float(t - T0) for t in ts]
+    return CandleSeries.from_columns(symbol, {"ts": ts, "open": c, "high": c, "low": c, "close": c,
+                                              "volume": [1] * len(ts)})
+
+
+class Loader:
+    def __init__(self, symbol: str = "X"):
+        self.symbol = symbol
+        self.calls: List[Tuple[int, int]] = []
+
+    def __call__(self, lo: int, hi: int) -> CandleSeries:
+        self.calls.append((lo, hi))
+        return _bars(self.symbol, lo, hi)
+
+
+def test_overlapping_ranges_load_only_the_missing_edges():
+    cache, load = CandleCache(), Loader()
+    cache.range("X", T0 + 6000, T0 + 12000, load)
+    assert load.calls == [(T0 + 6000, T0 + 12000)]
+
+    # Inside the window: a hit, nothing loaded.
+    assert cache.range("X", T0 + 7000, T0 + 8000, load).ts.tolist() == _bars("X", T0 + 7000, T0 + 8000).ts.tolist()
+    assert len(load.calls) == 1
+
+    # Wider on both sides: only the two edges are read, and the result is the full range.
+    got = cache.range("X", T0 + 3000, T0 + 15000, load)
+    assert load.calls[1:] == [(T0 + 3000, T0 + 5999), (T0 + 12001, T0 + 15000)]
+    assert got.ts.tolist() == _bars("X", T0 + 3000, T0 + 15000).ts.tolist()
+    assert cache.stats()["hits"] == 1 and cache.stats()["partial_hits"] == 1
+
+    # The window grew, so the earlier wide range is now a hit.
+    cache.range("X", T0 + 3000, T0 + 15000, load)
+    assert len(load.calls) == 3
+
+
+def test_disjoint_range_is_a_miss_and_keeps_the_window():
+    cache, load = CandleCache(), Loader()
+    cache.range("X", T0, T0 + 600, load)
+    cache.range("X", T0 + 30000, T0 + 30600, load)
+    cache.range("X", T0, T0 + 600, load)
+    assert len(load.calls) == 2 and cache.stats()["misses"] == 2
+
+
+def test_writes_fold_into_the_window_and_invalidate_in_flight_loads():
+    cache, load = CandleCache(), Loader()
+    cache.range("X", T0, T0 + 600, load)
+    at = lambda sec: {"symbol": "X", "ts": T0 + sec, "open": 9.0, "high": 9.0, "low": 9.0, "close": 9.0, "volume": 1}
+    cache.apply([at(120)])
+    assert cache.range("X", T0 + 120, T0 + 120, load).close.tolist() == [9.0]
+
+    # A write between a miss's load and its store: the loaded bars are not cached.
+    def racing(lo, hi):
+        cache.apply([at(60 * 500)])
+        return _bars("Y", lo, hi)
+
+    cache.range("Y", T0, T0 + 600, racing)
+    assert cache.stats()["symbols"] == 2  # "Y" was stored: the write was for "X"
+    cache.invalidate("Y")
+
+    def racing_same(lo, hi):
+        cache.apply([{**at(0), "symbol": "Y"}])
+        return _bars("Y", lo, hi)
+
+    cache.range("Y", T0, T0 + 600, racing_same)
+    assert cache.stats()["symbols"] == 1
+
+
+def test_least_recently_used_windows_are_evicted():
+    cache = CandleCache(max_bars=25)
+    loads = {s: Loader(s) for s in "ABC"}
+    cache.range("A", T0, T0 + 600, loads["A"])       # 11 bars
+    cache.range("B", T0, T0 + 600, loads["B"])       # 22
+    cache.range("A", T0, T0 + 60, loads["A"])        # touch A
+    cache.range("C", T0, T0 + 600, loads["C"])       # 33 > 25: B goes
+    assert cache.stats()["evictions"] == 1 and cache.stats()["bars"] == 22
+    cache.range("A", T0, T0 + 600, loads["A"])
+    cache.range("B", T0, T0 + 600, loads["B"])
+    assert len(loads["A"].calls) == 1 and len(loads["B"].calls) == 2
+
+
+def test_latest_is_served_from_an_open_window_until_its_ttl(monkeypatch):
+    clock = [float(T0 + 1000 * 60)]
+    monkeypatch.setattr(candle_cache.time, "time", lambda: clock[0])
+    cache = CandleCache(open_ttl_sec=60)
+    calls = []
+
+    def load_latest(n):
+        calls.append(n)
+        return _bars("X", T0, int(clock[0]))[-n:]
+
+    assert len(cache.latest("X", 5, load_latest)) == 5
+    clock[0] += 30
+    assert cache.latest("X", 3, load_latest).ts.tolist() == _bars("X", T0, T0 + 1000 * 60)[-3:].ts.tolist()
+    assert calls == [5]
+    # Past the TTL the window no longer covers "now": other processes may have written since.
+    clock[0] += 60
+    cache.latest("X", 3, load_latest)
+    assert calls == [5, 3]
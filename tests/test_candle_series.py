@@ -0,0 +1,54 @@
+from __future__ import annotations
+from datetime import datetime, timezone
+
+import pytest
+
+from models.candle_series import CandleSeries
+
+T0 = 1_700_000_000
+
+
+def _series(ts, close, symbol: str = "X") -> CandleSeries:
+    return CandleSeries.from_columns(symbol, {"ts": ts, "open": close, "high": close, "low": close,
+                                             "close": close, "volume": [1] * len(ts)})
+
+
+def test_merge_sorts_and_later_parts_win():
+    old = _series([T0, T0 + 60, T0 + 120], [1.0, 2.0, 3.0])
+    new = _series([T0 + 120, T0 + 180, T0 + 60], [30.0, 40.0, 20.0])
+    merged = CandleSeries.merge([old, CandleSeries.empty("X"), new])
+    assert merged.ts.tolist() == [T0, T0 + 60, T0 + 120, T0 + 180]
+    assert merged.close.tolist() == [1.0, 20.0, 30.0, 40.0]
+
+    assert CandleSeries.merge([old, CandleSeries.empty("X")]) is old
+    with pytest.raises(ValueError):
+        CandleSeries.merge([CandleSeries.empty("X")])
+
+
+def test_sorted_collapses_duplicates_to_the_last_occurrence():
+    s = _series([T0 + 60, T0, T0 + 60, T0, T0 + 60], [1.0, 2.0, 3.0, 4.0, 5.0]).sorted()
+    assert s.ts.tolist() == [T0, T0 + 60]
+    assert s.close.tolist() == [4.0, 5.0]
+
+
+def test_from_records_sorts_and_dedups():
+    at = lambda sec: datetime.fromtimestamp(T0 + sec, timezone.utc)
+    rows = [{"symbol": "X", "ts": at(60), "open": 1, "high": 1, "low": 1, "close": 1.0, "volume": 1},
+            {"symbol": "X", "ts": at(0), "open": 1, "high": 1, "low": 1, "close": 2.0, "volume": 1},
+            {"symbol": "X", "ts": at(60), "open": 1, "high": 1, "low": 1, "close": 3.0, "volume": 1}]
+    s = CandleSeries.from_records(rows)
+    assert (s.symbol, s.ts.tolist(), s.close.tolist()) == ("X", [T0, T0 + 60], [2.0, 3.0])
+    assert s.to_docs()[1]["ts"] == at(60)
+
+
+def test_between_and_newer_than_bounds():
+    s = _series([T0 + i * 60 for i in range(10)], [float(i) for i in range(10)])
+    assert s.between(T0 + 120, T0 + 240).close.tolist() == [2.0, 3.0, 4.0]
+    # Bounds between bars, open ends, and naive datetimes (taken as UTC).
+    assert s.between(T0 + 121, T0 + 239).close.tolist() == [3.0]
+    assert s.between(end=T0 + 60).close.tolist() == [0.0, 1.0]
+    assert s.between(start=datetime.fromtimestamp(T0 + 480, timezone.utc).replace(tzinfo=None)).close.tolist() == [8.0, 9.0]
+    assert len(s.between(T0 + 1000, T0 + 2000)) == 0
+    assert s.newer_than(T0 + 420).close.tolist() == [8.0, 9.0]
+    # Views share memory with the series.
+    assert s.between(T0, T0 + 60).ts.base is s.ts
@@ -0,0 +1,73 @@
+from __future__ import annotations
+import os
+
+import numpy as np
+import pytest
+
+import columnar
+from columnar import ColumnarStore
+from models.candle_series import CandleSeries
+
+T0 = 1_700_000_000
+
+
+def _series(start: int, n: int, close: float = 1.0) -> CandleSeries:
+    ts = [T0 + (start + i) * 60 for i in range(n)]
+    return CandleSeries.from_columns("X", {"ts": ts, "open": [close] * n, "high": [close + 1] * n,
+                                           "low": [close - 1] * n, "close": [close] * n,
+                                           "volume": list(range(n))})
+
+
+def _assert_same(a: CandleSeries, b: CandleSeries) -> None:
+    assert a.symbol == b.symbol
+    for c in CandleSeries.COLUMNS:
+        np.testing.assert_array_equal(getattr(a, c), getattr(b, c))
+        assert getattr(a, c).dtype == getattr(b, c).dtype
+
+
+@pytest.mark.parametrize("suffix", [".cols", ".npz"])
+def test_round_trip(tmp_path, suffix):
+    path = str(tmp_path / f"x{suffix}")
+    s = _series(0, 50)
+    assert ColumnarStore.write(path, s) == 50
+    _assert_same(ColumnarStore.read(path), s)
+    _assert_same(ColumnarStore.read(path, mmap=False), s)
+
+
+@pytest.mark.parametrize("suffix", [".cols", ".npz"])
+def test_append_merges_and_new_bars_win(tmp_path, suffix):
+    path = str(tmp_path / f"x{suffix}")
+    ColumnarStore.write(path, _series(0, 10))
+    # Minutes 8..14: two overlap (and replace) stored bars, five are new.
+    assert ColumnarStore.write(path, _series(8, 7, close=5.0), append=True) == 5
+    got = ColumnarStore.read(path)
+    assert got.ts.tolist() == [T0 + i * 60 for i in range(15)]
+    assert got.close.tolist() == [1.0] * 8 + [5.0] * 7
+
+
+def test_cols_swap_keeps_only_the_previous_version(tmp_path):
+    path = tmp_path / "x.cols"
+    for i in range(4):
+        ColumnarStore.write(str(path), _series(0, 5 + i))
+    assert path.is_symlink()
+    versions = sorted(p.name for p in tmp_path.iterdir() if p.name.startswith(".x.cols."))
+    # The live version and the one it replaced (kept for readers that resolved the old link).
+    assert len(versions) == 2 and os.readlink(path) in versions
+    assert len(ColumnarStore.read(str(path))) == 8
+
+
+@pytest.mark.parametrize("suffix", [".cols", ".npz"])
+def test_failed_write_leaves_no_temp_files(tmp_path, monkeypatch, suffix):
+    path = str(tmp_path / f"x{suffix}")
+    ColumnarStore.write(path, _series(0, 5))
+    before = sorted(os.listdir(tmp_path))
+
+    def fail(*a, **kw):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(columnar.os, "replace", fail)
+    with pytest.raises(OSError):
+        ColumnarStore.write(path, _series(0, 9))
+    monkeypatch.undo()
+    assert sorted(os.listdir(tmp_path)) == before
+    assert len(ColumnarStore.read(path)) == 5
@@ -0,0 +1,120 @@
+from __future__ import annotations
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from coverage_index import CoverageIndex, complete_months_of, is_trading_day
+from models.candle_series import to_epoch
+
+NY = ZoneInfo("America/New_York")
+
+
+def _session_ts(first: date, last: date, interval: int = 5) -> np.ndarray:
+    """Epoch seconds of every regular-session `interval` bar on the trading days in [first, last]."""
+    out = []
+    d = first
+    while d <= last:
+        if is_trading_day(d):
+            t = datetime(d.year, d.month, d.day, 9, 30, tzinfo=NY)
+            close = t.replace(hour=16, minute=0)
+            while t < close:
+                out.append(int(t.timestamp()))
+                t += timedelta(minutes=interval)
+        d += timedelta(days=1)
+    return np.array(out, dtype=np.int64)
+
+
+def test_complete_months_of_requires_every_trading_day():
+    start, end = datetime(2024, 3, 1, tzinfo=NY), datetime(2024, 5, 31, 23, 59, tzinfo=NY)
+    ts = _session_ts(date(2024, 3, 1), date(2024, 5, 31))
+    assert complete_months_of(ts, 5, start, end) == {"2024-03", "2024-04", "2024-05"}
+
+    # One missing bar in April, and May only stored up to the 15th (a short earlier fetch).
+    hole = int(datetime(2024, 4, 10, 11, 0, tzinfo=NY).timestamp())
+    cut = int(datetime(2024, 5, 16, tzinfo=NY).timestamp())
+    partial = ts[(ts != hole) & (ts < cut)]
+    assert complete_months_of(partial, 5, start, end) == {"2024-03"}
+    assert complete_months_of(partial, 5, start, end, min_fill=0.95) == {"2024-03", "2024-04"}
+
+
+def test_complete_months_of_needs_bars_of_the_interval():
+    start, end = datetime(2024, 3, 1, tzinfo=NY), datetime(2024, 3, 31, 23, 59, tzinfo=NY)
+    fifteen = _session_ts(date(2024, 3, 1), date(2024, 3, 31), interval=15)
+    assert complete_months_of(fifteen, 15, start, end) == {"2024-03"}
+    assert complete_months_of(fifteen, 5, start, end) == set()
+
+
+class StubCoverage:
+    """The coverage collection: applies the $bit/$set/$setOnInsert upserts record() and rebuild() send."""
+
+    def __init__(self):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+
+    def bulk_write(self, ops, ordered: bool = True) -> None:
+        for op in ops:
+            _id, update = op._filter["_id"], op._doc
+            doc = self.docs.setdefault(_id, {"_id": _id, **update.get("$setOnInsert", {})})
+            doc.update(update.get("$set", {}))
+            for field, bit in update.get("$bit", {}).items():
+                doc[field] = int(doc.get(field, 0)) | int(bit["or"])
+
+    def find(self, flt: Dict[str, Any]) -> List[Dict[str, Any]]:
+        lo, hi = flt["_id"]["$gte"], flt["_id"]["$lte"]
+        return [d for _id, d in sorted(self.docs.items()) if lo <= _id <= hi]
+
+    def find_one(self, flt: Dict[str, Any], projection=None) -> Optional[Dict[str, Any]]:
+        lo, hi = flt["_id"]["$gte"], flt["_id"]["$lt"]
+        return next((d for _id, d in sorted(self.docs.items()) if lo <= _id < hi), None)
+
+
+MARCH = (datetime(2024, 3, 1, tzinfo=NY), datetime(2024, 3, 31, 23, 59, tzinfo=NY))
+
+
+def _at(month: int, day: int, hour: int, minute: int) -> int:
+    return int(datetime(2024, month, day, hour, minute, tzinfo=NY).timestamp())
+
+
+def test_missing_finds_exactly_the_holes_across_dst():
+    index = CoverageIndex(StubCoverage())
+    ts = _session_ts(date(2024, 3, 1), date(2024, 3, 31))
+    # 03-11 is the first trading day on EDT: its slots must map to the same local times.
+    holes = [_at(3, 8, 9, 30), _at(3, 11, 9, 30), _at(3, 11, 15, 55), _at(3, 28, 12, 0)]
+    index.record({"X": ts[~np.isin(ts, holes)]}, 5)
+
+    assert index.tracked("X", 5) and not index.tracked("X", 15) and not index.tracked("Y", 5)
+    assert index.missing("X", 5, *MARCH).tolist() == holes
+    fill = index.day_fill("X", 5, *MARCH)
+    assert fill["2024-03-11"] == (76, 78) and fill["2024-03-12"] == (78, 78)
+    assert "2024-03-09" not in fill  # a Saturday
+    assert index.months_with_holes("X", 5, *MARCH) == {"2024-03"}
+    assert index.months_with_holes("X", 5, *MARCH, min_fill=0.97) == set()
+
+    # A second writer's bars are OR-ed in, not written over the first's.
+    index.record({"X": np.array(holes)}, 5)
+    assert index.missing("X", 5, *MARCH).size == 0
+    assert index.complete_months("X", 5, *MARCH) == {"2024-03"}
+
+
+def test_holidays_and_early_closes_expect_no_bars_after_the_close():
+    index = CoverageIndex(StubCoverage())
+    july = (datetime(2024, 7, 1, tzinfo=NY), datetime(2024, 7, 5, 23, 59, tzinfo=NY))
+    ts = _session_ts(date(2024, 7, 1), date(2024, 7, 5))
+    # 07-03 closes at 13:00 and 07-04 is a holiday: bars stored up to 13:00 complete the week.
+    index.record({"X": ts[(ts < _at(7, 3, 13, 0)) | (ts >= _at(7, 5, 0, 0))]}, 5)
+    assert index.day_fill("X", 5, *july)["2024-07-03"] == (42, 42)
+    assert "2024-07-04" not in index.day_fill("X", 5, *july)
+    assert index.missing("X", 5, *july).size == 0
+
+
+def test_rebuild_drops_deleted_bars():
+    index = CoverageIndex(StubCoverage())
+    ts = _session_ts(date(2024, 3, 1), date(2024, 3, 31))
+    index.record({"X": ts}, 5)
+    gone = ts[(ts >= _at(3, 20, 10, 0)) & (ts < _at(3, 20, 11, 0))]
+    repo = SimpleNamespace(fetch_range_columns=lambda symbol, lo, hi, fields: {
+        "ts": ts[(ts >= to_epoch(lo)) & (ts <= to_epoch(hi)) & ~np.isin(ts, gone)]})
+    index.rebuild(repo, "X", 5, datetime(2024, 3, 18, tzinfo=NY), datetime(2024, 3, 22, tzinfo=NY))
+    assert index.missing("X", 5, *MARCH).tolist() == gone.tolist()
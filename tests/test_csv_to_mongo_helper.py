@@ -0,0 +1,36 @@
+from __future__ import annotations
+from datetime import datetime, timedelta, timezone
+
+from csv_to_mongo_helper import series_batches_from_csv
+
+T0 = datetime(2025, 9, 2, 8, 0, tzinfo=timezone.utc)
+
+
+def _write_csv(path, minutes, symbol="MSFT"):
+    lines = ["symbol,timestamp,open,high,low,close,volume"]
+    for m in minutes:
+        ts = (T0 + timedelta(minutes=m)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        lines.append(f"{symbol},{ts},1.0,2.0,0.5,{float(m)},{m}")
+    path.write_text("\n".join(lines) + "\n")
+
+
+def test_newest_first_file_yields_sorted_batches(tmp_path):
+    path = tmp_path / "MSFT_m1.csv"
+    _write_csv(path, range(99, -1, -1))
+    batches = list(series_batches_from_csv(str(path), "MSFT", chunk_rows=30))
+    assert sum(len(b) for b in batches) == 100
+    for b in batches:
+        assert (b.ts[1:] > b.ts[:-1]).all()
+        # The watermark is taken from end(): it must be the batch's newest bar.
+        assert b.end() == datetime.fromtimestamp(int(b.ts.max()), timezone.utc)
+    assert batches[0].end() == T0 + timedelta(minutes=99)
+
+
+def test_repeated_ts_keeps_the_last_row(tmp_path):
+    path = tmp_path / "MSFT_m1.csv"
+    path.write_text("symbol,timestamp,open,high,low,close,volume\n"
+                    "MSFT,2025-09-02T08:01:00Z,1,1,1,1.0,1\n"
+                    "MSFT,2025-09-02T08:00:00Z,1,1,1,2.0,1\n"
+                    "MSFT,2025-09-02T08:01:00Z,1,1,1,3.0,1\n")
+    (batch,) = series_batches_from_csv(str(path), "MSFT")
+    assert batch.close.tolist() == [2.0, 3.0]
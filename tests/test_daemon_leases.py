@@ -0,0 +1,158 @@
+from __future__ import annotations
+import multiprocessing
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from ctx.ctx_reader import CtxReader, MongoConfig
+from scheduler.daemon import JobDaemon
+
+MONGO_URI = os.getenv("TEST_MONGO_URI", "mongodb://localhost:27017")
+
+
+class StubCtx:
+    """In-memory CtxReader shared by several daemons: job and lane leases as CtxReader keeps them."""
+
+    def __init__(self, jobs: List[Dict[str, Any]]):
+        self.jobs = {j["_id"]: {"is_enabled": True, "next_run": None, "lease_owner": None,
+                                "lease_until": None, **j} for j in jobs}
+        self.lanes: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _free(doc: Dict[str, Any], owner: str, now: datetime) -> bool:
+        return doc.get("lease_until") is None or doc["lease_until"] <= now or doc.get("lease_owner") == owner
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        return [dict(j) for j in self.jobs.values() if j["is_enabled"]]
+
+    def get(self, ctx_id: Any) -> Optional[Dict[str, Any]]:
+        return dict(self.jobs[ctx_id]) if ctx_id in self.jobs else None
+
+    def claim(self, ctx_id, owner, lease_sec, now, not_run_since=None):
+        job = self.jobs[ctx_id]
+        if (job["next_run"] is None or job["next_run"] <= now) and self._free(job, owner, now):
+            job.update(lease_owner=owner, lease_until=now + timedelta(seconds=lease_sec))
+            return dict(job)
+        return None
+
+    def mark_run(self, ctx_id, last_run, next_run, owner=None) -> bool:
+        self.jobs[ctx_id].update(last_run=last_run, next_run=next_run, lease_owner=None, lease_until=None)
+        return True
+
+    def heartbeat(self, owner, ctx_ids, lease_sec, now) -> int:
+        return 0
+
+    def claim_lane(self, symbol, owner, lease_sec, now):
+        lane = self.lanes.setdefault(symbol, {"_id": symbol})
+        if not self._free(lane, owner, now):
+            return None
+        lane.update(lease_owner=owner, lease_until=now + timedelta(seconds=lease_sec))
+        return dict(lane)
+
+    def get_lane(self, symbol):
+        return self.lanes.get(symbol)
+
+    def heartbeat_lanes(self, owner, symbols, lease_sec, now) -> int:
+        return 0
+
+    def release_lanes(self, owner, symbols) -> None:
+        for s in symbols:
+            if self.lanes.get(s, {}).get("lease_owner") == owner:
+                self.lanes[s].update(lease_owner=None, lease_until=None)
+
+
+def _daemon(ctx: StubCtx, node: Optional[str], ran: List[Tuple[str, str]]) -> JobDaemon:
+    daemon = JobDaemon(None, ctx, lambda cfg, job: ran.append((daemon.node_id, job["_id"])), node_id=node)
+    return daemon
+
+
+def test_a_symbols_jobs_stay_on_the_node_that_ran_its_fetch():
+    ctx = StubCtx([{"_id": "fetch", "op": "fetch_and_save_intraday", "symbol": "IBM", "task_interval": 5},
+                   {"_id": "ingest", "op": "ingest_csv_to_mongo", "symbol": "IBM", "task_interval": 5}])
+    ran: List[Tuple[str, str]] = []
+    a, b = _daemon(ctx, "a", ran), _daemon(ctx, "b", ran)
+    now = time.time()
+    for d in (a, b):
+        d._refresh(now)
+    due_a = {job["_id"]: (job, due) for job, due in a._pop_due(now)}
+    due_b = {job["_id"]: (job, due) for job, due in b._pop_due(now)}
+
+    # a runs the fetch; b then reaches the ingest first, but the IBM lane is a's.
+    a._run_lane([due_a["fetch"]])
+    b._run_lane([due_b["ingest"]])
+    a._run_lane([due_a["ingest"]])
+    assert ran == [("a", "fetch"), ("a", "ingest")]
+    assert "ingest" in b._due and "ingest" not in b._running
+
+    # Once a stops, its lanes are released and b takes IBM over.
+    a._release_lanes()
+    assert ctx.lanes["IBM"]["lease_owner"] is None
+    ctx.jobs["fetch"]["next_run"] = None
+    b._run_lane([(ctx.get("fetch"), now)])
+    assert ran[-1] == ("b", "fetch")
+
+
+def test_single_daemon_runs_every_op_with_or_without_node_id():
+    for node in (None, "only"):
+        ctx = StubCtx([{"_id": "fetch", "op": "fetch_and_save_intraday", "symbol": "IBM", "task_interval": 5},
+                       {"_id": "ingest", "op": "ingest_csv_to_mongo", "symbol": "IBM", "task_interval": 5}])
+        ran: List[Tuple[str, str]] = []
+        d = _daemon(ctx, node, ran)
+        now = time.time()
+        d._refresh(now)
+        for lane in d._lanes(d._pop_due(now)):
+            d._run_lane(lane)
+        assert [job for _, job in ran] == ["fetch", "ingest"]
+
+
+def _mongo_or_skip() -> MongoClient:
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        pytest.skip(f"no mongod reachable at {MONGO_URI}")
+    return client
+
+
+def _claim_all(db: str, node: str, job_ids: List[str], start, out) -> None:
+    reader = CtxReader(MongoConfig(MONGO_URI, db, "ctx"), client=MongoClient(MONGO_URI))
+    start.wait()
+    now = datetime.now(timezone.utc)
+    jobs = [j for j in job_ids if reader.claim(j, node, 300, now) is not None]
+    # The job ids double as symbols: every lane must go to exactly one node too.
+    lanes = [j for j in job_ids if reader.claim_lane(j, node, 300, now) is not None]
+    out.put((node, (jobs, lanes)))
+
+
+def test_two_processes_claim_each_job_and_lane_once():
+    client = _mongo_or_skip()
+    db = f"stocker_test_{uuid.uuid4().hex[:8]}"
+    job_ids = [f"job-{i}" for i in range(200)]
+    client[db]["ctx"].insert_many([{"_id": j, "is_enabled": True, "next_run": None} for j in job_ids])
+    try:
+        ctx = multiprocessing.get_context("spawn")
+        start, out = ctx.Event(), ctx.Queue()
+        procs = [ctx.Process(target=_claim_all, args=(db, node, job_ids, start, out)) for node in ("a", "b")]
+        for p in procs:
+            p.start()
+        start.set()
+        claimed = dict(out.get(timeout=60) for _ in procs)
+        for p in procs:
+            p.join(timeout=60)
+
+        for i, coll in enumerate(("ctx", "ctx_lanes")):
+            won = {node: ids[i] for node, ids in claimed.items()}
+            assert not set(won["a"]) & set(won["b"])
+            assert sorted(won["a"] + won["b"]) == sorted(job_ids)
+            owners = {d["_id"]: d["lease_owner"] for d in client[db][coll].find()}
+            assert all(owners[j] == node for node, ids in won.items() for j in ids)
+    finally:
+        client.drop_database(db)
+        client.close()
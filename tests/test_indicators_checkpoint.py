@@ -0,0 +1,164 @@
+from __future__ import annotations
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pytest
+
+import tasks.indicators_to_mongo as job
+from indicators import IndicatorSet, specs_key
+from models.IndicatorSettings import IndicatorSettings
+from models.candle_series import CandleSeries, to_epoch
+
+SPECS = ("sma3", "ema5", "rsi3")
+T0 = 1_700_000_000
+HOUR = 3600
+
+
+def _dt(ts: int) -> datetime:
+    return datetime.fromtimestamp(ts, timezone.utc)
+
+
+class StubBars:
+    """Bars repo stand-in keyed by epoch ts; `write` marks dirty like upsert_many unless told not to."""
+
+    def __init__(self, consumers=(job.indicators_consumer(SPECS),)):
+        self.close: Dict[int, float] = {}
+        self.marks: Dict[str, datetime] = {}
+        self.dirty_consumers = consumers
+
+    def write(self, closes: Dict[int, float], mark: bool = True) -> None:
+        self.close.update(closes)
+        if mark:
+            self.mark_dirty({"X": _dt(min(closes))}, self.dirty_consumers)
+
+    def series(self) -> CandleSeries:
+        ts = sorted(self.close)
+        c = [self.close[t] for t in ts]
+        return CandleSeries.from_columns("X", {"ts": ts, "open": c, "high": c, "low": c, "close": c,
+                                              "volume": [100] * len(ts)})
+
+    def earliest_ts(self, symbol: str) -> Optional[datetime]:
+        return _dt(min(self.close)) if self.close else None
+
+    def latest_ts(self, symbol: str) -> Optional[datetime]:
+        return _dt(max(self.close)) if self.close else None
+
+    def fetch_range_series(self, symbol: str, start: datetime, end: datetime) -> CandleSeries:
+        return self.series().between(start, end)
+
+    def mark_dirty(self, since: Dict[str, datetime], consumers) -> None:
+        for sym, ts in since.items():
+            for c in consumers:
+                key = f"{sym}|{c}"
+                self.marks[key] = min(ts, self.marks.get(key, ts))
+
+    def take_dirty_since(self, symbol: str, consumer: str) -> Optional[datetime]:
+        return self.marks.pop(f"{symbol}|{consumer}", None)
+
+
+class StubRows:
+    def __init__(self):
+        self.rows: Dict[int, Dict[str, Any]] = {}
+        self.fail = False
+
+    def upsert_many(self, docs) -> None:
+        if self.fail:
+            raise RuntimeError("write failed")
+        for d in docs:
+            self.rows[to_epoch(d["ts"])] = d
+
+
+class StubStates:
+    def __init__(self):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+
+    def find_one(self, flt: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self.docs.get(flt["_id"])
+
+    def replace_one(self, flt: Dict[str, Any], doc: Dict[str, Any], upsert: bool = False) -> None:
+        self.docs[flt["_id"]] = doc
+
+
+@pytest.fixture
+def stubs(monkeypatch):
+    bars, rows, states = StubBars(), StubRows(), StubStates()
+    monkeypatch.setattr(job, "get_bars_repo", lambda cfg, interval: bars)
+    monkeypatch.setattr(job, "get_indicators_repo", lambda cfg, interval: rows)
+    monkeypatch.setattr(job, "get_repo", lambda **kw: SimpleNamespace(col=states))
+    return bars, rows, states
+
+
+def _run(specs=SPECS) -> Dict[str, int]:
+    cfg = SimpleNamespace(indicators=IndicatorSettings(specs=SPECS, chunk_days=1),
+                          resample=SimpleNamespace(tz="America/New_York"),
+                          mongo=SimpleNamespace(uri=None, db=None))
+    return job.indicators_to_mongo(cfg, ["X"], specs=specs)["X"]
+
+
+def _assert_matches_full_run(bars: StubBars, rows: StubRows) -> None:
+    series = bars.series()
+    expected = IndicatorSet(SPECS).update(series)
+    assert sorted(rows.rows) == series.ts.tolist()
+    for name, col in expected.items():
+        got = np.array([rows.rows[t][name] for t in series.ts.tolist()], dtype=float)
+        np.testing.assert_allclose(got, col, equal_nan=True)
+
+
+def test_resumes_after_checkpoint(stubs):
+    bars, rows, _ = stubs
+    bars.write({T0 + i * HOUR: 100.0 + i for i in range(60)})
+    assert _run() == {"base": 60}
+    bars.write({T0 + i * HOUR: 100.0 + i for i in range(60, 70)})
+    # Only the newest previous bar (recomputed) and the 10 new ones are read.
+    assert _run() == {"base": 11}
+    _assert_matches_full_run(bars, rows)
+
+
+def test_revised_bar_below_checkpoint_recomputes(stubs):
+    bars, rows, _ = stubs
+    bars.write({T0 + i * HOUR: 100.0 + i for i in range(60)})
+    _run()
+    bars.write({T0 + 10 * HOUR: 50.0})
+    assert _run() == {"base": 60}
+    _assert_matches_full_run(bars, rows)
+
+
+def test_unmarked_backfill_before_first_bar_recomputes(stubs):
+    bars, rows, states = stubs
+    bars.write({T0 + i * HOUR: 100.0 + i for i in range(60)})
+    _run()
+    bars.write({T0 - i * HOUR: 90.0 - i for i in range(1, 6)}, mark=False)
+    assert _run() == {"base": 65}
+    assert states.docs[f"X|base|{specs_key(SPECS)}"]["first_ts"] == _dt(T0 - 5 * HOUR)
+    _assert_matches_full_run(bars, rows)
+
+
+def test_failed_run_hands_the_mark_back(stubs):
+    bars, rows, _ = stubs
+    bars.write({T0 + i * HOUR: 100.0 + i for i in range(60)})
+    _run()
+    bars.write({T0 + 10 * HOUR: 50.0})
+    rows.fail = True
+    with pytest.raises(RuntimeError):
+        _run()
+    assert bars.marks == {f"X|{job.indicators_consumer(SPECS)}": _dt(T0 + 10 * HOUR)}
+    rows.fail = False
+    assert _run() == {"base": 60}
+    _assert_matches_full_run(bars, rows)
+
+
+def test_each_spec_set_keeps_its_own_checkpoint_and_marks(stubs):
+    bars, rows, states = stubs
+    other = ("sma5",)
+    bars.dirty_consumers = (job.indicators_consumer(SPECS), job.indicators_consumer(other))
+    bars.write({T0 + i * HOUR: 100.0 + i for i in range(60)})
+    _run()
+    _run(other)
+    assert len(states.docs) == 2
+    # A revision taken by one spec set is still pending for the other.
+    bars.write({T0 + 10 * HOUR: 50.0})
+    assert _run() == {"base": 60}
+    assert _run(other) == {"base": 60}
+    assert _run(other) == {"base": 1}
@@ -0,0 +1,84 @@
+from __future__ import annotations
+import threading
+from typing import Any, Dict, List
+
+import pytest
+
+from tasks.ingest_to_mongo import ingest_docs, record_written
+
+
+class StubRepo:
+    """upsert_many stand-in; batches holding a doc with `bad` set raise ValueError like a missing ts."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stored: List[int] = []
+
+    def upsert_many(self, docs: List[Dict[str, Any]], ordered: bool = False) -> Dict[str, int]:
+        if any(d.get("bad") for d in docs):
+            raise ValueError("doc missing 'ts' (datetime)")
+        with self.lock:
+            self.stored.extend(d["i"] for d in docs)
+        return {"upserted": len(docs), "matched": 0, "unchanged": 0}
+
+
+def _docs(n: int, bad=lambda i: False):
+    return ({"symbol": "X", "i": i, "bad": bad(i)} for i in range(n))
+
+
+def _run(timeout: float = 10, **kw) -> Any:
+    """ingest_docs on a thread, failing the test instead of hanging when it doesn't return."""
+    out: Dict[str, Any] = {}
+
+    def target():
+        try:
+            out["stats"] = ingest_docs(**kw)
+        except BaseException as exc:
+            out["error"] = exc
+
+    t = threading.Thread(target=target, daemon=True)
+    t.start()
+    t.join(timeout)
+    assert not t.is_alive(), "ingest_docs hung"
+    if "error" in out:
+        raise out["error"]
+    return out["stats"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_rejected_batches_are_counted_not_fatal(workers):
+    repo = StubRepo()
+    stats = _run(repo=repo, docs=_docs(100, bad=lambda i: i // 10 % 2 == 0), batch_size=10,
+                 workers=workers, max_in_flight=1)
+    assert stats.failed_batches == 5 and stats.failed_rows == 50
+    assert sorted(repo.stored) == [i for i in range(100) if i // 10 % 2]
+
+
+def test_every_batch_rejected_does_not_hang():
+    stats = _run(repo=StubRepo(), docs=_docs(200, bad=lambda i: True), batch_size=10,
+                 workers=2, max_in_flight=1)
+    assert stats.failed_rows == 200 and stats.processed == 0
+
+
+def test_writer_error_stops_the_ingest_and_is_raised():
+    def on_written(batch):
+        raise RuntimeError("hook failed")
+
+    with pytest.raises(RuntimeError, match="hook failed"):
+        _run(repo=StubRepo(), docs=_docs(10_000), batch_size=10, workers=2, max_in_flight=1,
+             on_written=on_written)
+
+
+def test_bookkeeping_errors_do_not_stop_the_ingest():
+    class BrokenCoverage:
+        def record(self, bars, minutes):
+            raise ValueError("ts outside the session grid")
+
+    class BrokenWatermarks(StubRepo):
+        def advance_watermarks(self, bars, minutes):
+            raise TypeError("can't compare offset-naive and offset-aware datetimes")
+
+    repo = BrokenWatermarks()
+    stats = _run(repo=repo, docs=_docs(100), batch_size=10, workers=2,
+                 on_written=lambda batch: record_written(repo, BrokenCoverage(), batch, 1))
+    assert stats.processed == 100 and sorted(repo.stored) == list(range(100))
@@ -0,0 +1,179 @@
+from __future__ import annotations
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict
+from unittest.mock import MagicMock
+
+import bson
+import pytest
+from pymongo.errors import AutoReconnect
+
+from db import mongo
+from db.mongo import MongoConfig, MongoPriceRepo
+from models.candle_series import CandleSeries
+
+T0 = 1_700_000_000
+
+
+def _collections(client: MagicMock) -> Dict[str, MagicMock]:
+    # One mock per collection name, so e.g. `prices` and `prices_dirty` can be told apart.
+    cols: Dict[str, MagicMock] = {}
+    client.__getitem__.return_value.__getitem__.side_effect = \
+        lambda name: cols[name] if name in cols else cols.setdefault(name, _collection(name))
+    return cols
+
+
+def _collection(name: str) -> MagicMock:
+    col = MagicMock()
+    col.name = name
+    return col
+
+
+def _repo(version, timeseries: bool = True) -> MongoPriceRepo:
+    client = MagicMock()
+    _collections(client)
+    client.server_info.return_value = {"version": ".".join(map(str, version)), "versionArray": list(version)}
+    return MongoPriceRepo(MongoConfig(uri="mongodb://stub", db="d", collection="prices",
+                                      timeseries=timeseries), client=client)
+
+
+def test_timeseries_is_refused_before_mongodb_7():
+    repo = _repo((6, 0, 14, 0))
+    with pytest.raises(RuntimeError, match="MongoDB 7.0"):
+        repo.ensure_schema()
+    repo.db.create_collection.assert_not_called()
+
+
+def test_timeseries_schema_on_mongodb_7():
+    repo = _repo((7, 0, 2, 0))
+    repo.ensure_schema()
+    repo.db.create_collection.assert_called_once()
+    assert repo.db.create_collection.call_args.kwargs["timeseries"]["timeField"] == "ts"
+
+
+def test_regular_collections_skip_the_version_check():
+    repo = _repo((5, 0, 0, 0), timeseries=False)
+    repo.ensure_schema()
+    repo.client.server_info.assert_not_called()
+
+
+def _bars(n: int) -> CandleSeries:
+    ts = [T0 + i * 60 for i in range(n)]
+    return CandleSeries.from_columns("X", {"ts": ts, "open": [1.5] * n, "high": [2.0] * n, "low": [1.0] * n,
+                                           "close": [float(i) for i in range(n)], "volume": list(range(n))})
+
+
+def _cached_repo(bars: CandleSeries) -> MongoPriceRepo:
+    repo = _repo((7, 0, 0, 0), timeseries=False)
+    repo.enable_read_cache()
+    repo._load_range = lambda symbol, lo, hi: bars.between(lo, hi)
+    repo._load_latest = lambda symbol, n: bars[max(0, len(bars) - n):]
+    return repo
+
+
+def test_cached_document_reads_match_the_stored_shape():
+    bars = _bars(30)
+    repo = _cached_repo(bars)
+    # What pymongo returns for the stored documents (projection without _id): naive UTC ts.
+    stored = [bson.decode(bson.encode(d)) for d in bars.to_docs()]
+    start, end = datetime.fromtimestamp(T0 + 600, timezone.utc), datetime.fromtimestamp(T0 + 1200, timezone.utc)
+
+    assert repo.fetch_range("X", start, end) == stored[10:21]
+    assert repo.fetch_range("X", start, end) == stored[10:21]  # now a cache hit
+    assert repo.latest_n("X", 5) == stored[-5:]
+    assert repo.fetch_range("X", start, end, fields=("ts", "close")) == \
+        [{"ts": d["ts"], "close": d["close"]} for d in stored[10:21]]
+    assert repo.read_cache.stats()["hits"] >= 1
+    repo.col.find.assert_not_called()
+
+
+def test_document_reads_bypass_the_cache_for_other_fields():
+    repo = _cached_repo(_bars(30))
+    repo.col.find.return_value = MagicMock(__iter__=lambda self: iter([]))
+    start, end = datetime.fromtimestamp(T0, timezone.utc), datetime.fromtimestamp(T0 + 600, timezone.utc)
+    repo.fetch_range("X", start, end, fields=("ts", "vwap"))
+    assert repo.col.find.call_count == 1
+
+    # Once the repo writes documents with extra fields, whole documents can't come from the cache.
+    repo._write = lambda rows, ordered, skip_unchanged: {}
+    repo.upsert_many([{"symbol": "X", "ts": start, "close": 1.0, "source": "manual"}])
+    repo.fetch_range("X", start, end)
+    assert repo.col.find.call_count == 2
+
+
+def _cfg(**mongo_kw) -> SimpleNamespace:
+    return SimpleNamespace(
+        intraday_minutes=1,
+        mongo=SimpleNamespace(**{"uri": "mongodb://stub", "db": "d", "candles_collection": "prices",
+                                 "timeseries": False, "granularity": None, "read_cache_bars": 0,
+                                 "read_cache_ttl_sec": 60, **mongo_kw}),
+        resample=SimpleNamespace(intervals=("5min", "1d")),
+        indicators=SimpleNamespace(specs=("sma20",), intervals=("base", "5min"), collection="indicators"))
+
+
+def test_resampled_repo_is_named_after_the_resolved_candles_collection(monkeypatch):
+    monkeypatch.delenv("MONGO_COLLECTION", raising=False)
+    client = MagicMock()
+    _collections(client)
+    monkeypatch.setattr(mongo, "mongo_client", lambda uri, app_name=None: client)
+    monkeypatch.setattr(MongoPriceRepo, "ping", lambda self: True)
+    mongo.reset_repo()
+    # The shipped config leaves candles_collection unset (None).
+    cfg = _cfg(candles_collection=None)
+    try:
+        assert mongo.get_resampled_repo(cfg, "15min").col.name == "prices_15min"
+        monkeypatch.setattr(cfg.mongo, "candles_collection", "bars")
+        assert mongo.get_resampled_repo(cfg, 60).col.name == "bars_60min"
+    finally:
+        mongo.reset_repo()
+
+
+def test_dirty_marks_are_kept_for_the_configured_consumers(monkeypatch):
+    client = MagicMock()
+    _collections(client)
+    monkeypatch.setattr(mongo, "mongo_client", lambda uri, app_name=None: client)
+    monkeypatch.setattr(MongoPriceRepo, "ping", lambda self: True)
+    mongo.reset_repo()
+    cfg = _cfg()
+    ind = mongo.indicators_consumer(("sma20",))
+    try:
+        assert mongo.get_candles_repo(cfg).dirty_consumers == ("resample:5min", "resample:1d", ind)
+        assert mongo.get_resampled_repo(cfg, "5min").dirty_consumers == (ind,)
+        assert mongo.get_resampled_repo(cfg, "1d").dirty_consumers == ()
+    finally:
+        mongo.reset_repo()
+
+
+def _writing_repo(consumers=()) -> MongoPriceRepo:
+    repo = _repo((7, 0, 0, 0), timeseries=False)
+    repo.col.find.return_value = MagicMock(__iter__=lambda self: iter([]))
+    repo.col.bulk_write.return_value = MagicMock(inserted_count=2, modified_count=0)
+    repo.track_dirty(consumers)
+    return repo
+
+
+def _two_bars():
+    return [{"symbol": "X", "ts": datetime.fromtimestamp(T0 + i * 60, timezone.utc), "close": 1.0}
+            for i in (1, 0)]
+
+
+def test_writes_without_consumers_keep_no_marks():
+    repo = _writing_repo()
+    repo.upsert_many(_two_bars())
+    repo.col.bulk_write.assert_called_once()
+    repo.dirty.bulk_write.assert_not_called()
+
+
+def test_each_consumer_gets_the_oldest_written_ts():
+    repo = _writing_repo(("resample:5min", "indicators:abc"))
+    repo.upsert_many(_two_bars())
+    (ops,), _ = repo.dirty.bulk_write.call_args
+    assert sorted(op._filter["_id"] for op in ops) == ["X|indicators:abc", "X|resample:5min"]
+    assert all(op._doc["$min"]["ts"] == datetime.fromtimestamp(T0, timezone.utc) for op in ops)
+
+
+def test_a_failed_mark_does_not_fail_the_write(capsys):
+    repo = _writing_repo(("resample:5min",))
+    repo.dirty.bulk_write.side_effect = AutoReconnect("connection reset")
+    assert repo.upsert_many(_two_bars())["upserted"] == 2
+    assert "Could not mark X dirty in prices_dirty" in capsys.readouterr().out
@@ -0,0 +1,94 @@
+from __future__ import annotations
+import asyncio
+from typing import List
+
+import pytest
+
+import rate_limiter
+from rate_limiter import RateLimiter, TokenBucket
+
+
+class Clock:
+    """Fake monotonic clock; sleeping advances it."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+        self.sleeps: List[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, sec: float) -> None:
+        self.sleeps.append(sec)
+        self.now += sec
+
+    async def async_sleep(self, sec: float) -> None:
+        self.sleep(sec)
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    c = Clock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", c.monotonic)
+    monkeypatch.setattr(rate_limiter.time, "sleep", c.sleep)
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", c.async_sleep)
+    return c
+
+
+def test_bucket_bursts_to_capacity_then_refills_continuously(clock):
+    bucket = TokenBucket(5, 60.0)
+    for _ in range(5):
+        assert bucket.wait_time(clock.now) == 0.0
+        bucket.take()
+    assert bucket.wait_time(clock.now) == pytest.approx(12.0)
+    clock.now += 3.0
+    assert bucket.wait_time(clock.now) == pytest.approx(9.0)
+    # Idle time refills up to the capacity, not past it.
+    clock.now += 3600.0
+    assert bucket.wait_time(clock.now) == 0.0 and bucket.tokens == 5.0
+
+
+def test_acquire_spaces_calls_at_the_minute_rate(clock):
+    limiter = RateLimiter(5, max_wait_sec=None)
+    start = clock.now
+    for _ in range(10):
+        limiter.acquire()
+    # Five at once, then one every 12 s.
+    assert clock.now - start == pytest.approx(60.0)
+    assert clock.sleeps == pytest.approx([12.0] * 5)
+
+
+def test_daily_budget_is_enforced_beyond_max_wait(clock):
+    limiter = RateLimiter(60, calls_per_day=3, max_wait_sec=120.0)
+    for _ in range(3):
+        limiter.acquire()
+    assert limiter.try_acquire() == pytest.approx(86400.0 / 3)
+    with pytest.raises(RuntimeError, match="budget exhausted"):
+        limiter.acquire()
+    assert clock.sleeps == []
+
+
+def test_penalize_blocks_every_caller_until_it_expires(clock):
+    limiter = RateLimiter(5)
+    limiter.penalize(30.0)
+    limiter.penalize(10.0)  # a shorter penalty doesn't cut the longer one
+    assert limiter.try_acquire() == pytest.approx(30.0)
+    clock.now += 20.0
+    assert limiter.try_acquire() == pytest.approx(10.0)
+    limiter.acquire()
+    assert clock.sleeps == pytest.approx([10.0])
+    # The blocked time refilled nothing past the capacity: four more go through at once.
+    for _ in range(4):
+        assert limiter.try_acquire() == 0.0
+    assert limiter.try_acquire() > 0
+
+
+def test_acquire_async_waits_like_acquire(clock):
+    limiter = RateLimiter(2, max_wait_sec=None)
+
+    async def burst():
+        for _ in range(4):
+            await limiter.acquire_async()
+
+    asyncio.run(burst())
+    assert clock.sleeps == pytest.approx([30.0, 30.0])
@@ -0,0 +1,59 @@
+from __future__ import annotations
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from models.candle_series import CandleSeries
+from resample import DAY, Resampler, resample
+
+TZ = "America/New_York"
+SPRING = int(datetime(2024, 3, 9, 5, tzinfo=timezone.utc).timestamp())   # 03-09 00:00 EST; 03-10 springs forward
+FALL = int(datetime(2024, 11, 2, 4, tzinfo=timezone.utc).timestamp())    # 11-02 00:00 EDT; 11-03 falls back
+
+
+def _minutes(start: int, days: int = 3) -> CandleSeries:
+    ts = np.arange(start, start + days * 86400, 60, dtype=np.int64)
+    c = np.arange(len(ts), dtype=np.float64)
+    return CandleSeries("X", ts=ts, open=c, high=c + 1, low=c - 1, close=c, volume=np.ones(len(ts), dtype=np.int64))
+
+
+def _incremental(series: CandleSeries, minutes: int, session: str, sizes) -> CandleSeries:
+    # Fed in uneven blocks, as runs and chunks split the stream; re-emitted buckets replace earlier ones.
+    r, out, i, k = Resampler("X", minutes, session, TZ), {}, 0, 0
+    while i < len(series):
+        n = sizes[k % len(sizes)]
+        got = r.update(series[i:i + n])
+        out.update({t: (o, h, l, c, v) for t, o, h, l, c, v in
+                    zip(got.ts.tolist(), got.open, got.high, got.low, got.close, got.volume)})
+        i, k = i + n, k + 1
+    ts = sorted(out)
+    cols = list(zip(*(out[t] for t in ts)))
+    return CandleSeries.from_columns("X", dict(zip(("ts", *CandleSeries.COLUMNS[1:]), [ts, *cols])))
+
+
+@pytest.mark.parametrize("start", [SPRING, FALL], ids=["spring", "fall"])
+@pytest.mark.parametrize("minutes", [15, 60, 120, DAY])
+@pytest.mark.parametrize("session", ["all", "extended", "regular"])
+def test_incremental_matches_batch_across_dst(start, minutes, session):
+    series = _minutes(start)
+    batch = resample(series, minutes, session, TZ)
+    assert (np.diff(batch.ts) > 0).all()
+    inc = _incremental(series, minutes, session, sizes=(1, 7, 390, 61, 1441))
+    for c in CandleSeries.COLUMNS:
+        np.testing.assert_array_equal(getattr(inc, c), getattr(batch, c))
+
+
+def test_day_with_a_dst_change_is_one_bar():
+    days = resample(_minutes(SPRING), DAY, "all", TZ)
+    # 72 hours from local midnight on 03-09: 03-10 has 23 hours, so an hour of 03-12 is in.
+    assert days.datetimes().astype(str).tolist() == [f"2024-03-{d:02d}T00:00:00" for d in (9, 10, 11, 12)]
+    assert days.volume.tolist() == [24 * 60, 23 * 60, 24 * 60, 60]
+
+
+def test_repeated_fall_back_hour_is_its_own_bucket():
+    hours = resample(_minutes(FALL), 60, "all", TZ)
+    on_the_day = hours.between(datetime(2024, 11, 3, 4, tzinfo=timezone.utc),
+                               datetime(2024, 11, 4, 4, 59, tzinfo=timezone.utc))
+    # 25 local hours; 01:00 EDT and 01:00 EST are an hour apart in UTC.
+    assert len(on_the_day) == 25 and (on_the_day.volume == 60).all()
@@ -0,0 +1,143 @@
+from __future__ import annotations
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import pytest
+
+import tasks.resample_to_mongo as job
+from db.mongo import resample_consumer
+from models.candle_series import CandleSeries
+from resample import resample
+
+T0 = 1_709_902_800  # 2024-03-08 13:00 UTC (08:00 in New York)
+SESSION, TZ = "all", "America/New_York"
+
+
+def _dt(ts: int) -> datetime:
+    return datetime.fromtimestamp(ts, timezone.utc)
+
+
+class StubCandles:
+    """Candles repo stand-in of 5-minute bars; `write` marks every resample target dirty."""
+
+    def __init__(self, targets=("15min", "1d")):
+        self.close: Dict[int, float] = {}
+        self.marks: Dict[str, datetime] = {}
+        self.consumers = [resample_consumer(t) for t in targets]
+        self.col = SimpleNamespace(name="prices")
+
+    def write(self, closes: Dict[int, float], mark: bool = True) -> None:
+        self.close.update(closes)
+        if mark:
+            self.mark_dirty({"X": _dt(min(closes))}, self.consumers)
+
+    def series(self) -> CandleSeries:
+        ts = sorted(self.close)
+        c = [self.close[t] for t in ts]
+        return CandleSeries.from_columns("X", {"ts": ts, "open": c, "high": c, "low": c, "close": c,
+                                              "volume": [1] * len(ts)})
+
+    def earliest_ts(self, symbol: str) -> Optional[datetime]:
+        return _dt(min(self.close)) if self.close else None
+
+    def latest_ts(self, symbol: str) -> Optional[datetime]:
+        return _dt(max(self.close)) if self.close else None
+
+    def stored_intervals(self, symbol: str) -> List[int]:
+        return [5]
+
+    def fetch_range_series(self, symbol: str, start: datetime, end: datetime) -> CandleSeries:
+        return self.series().between(start, end)
+
+    def mark_dirty(self, since: Dict[str, datetime], consumers) -> None:
+        for sym, ts in since.items():
+            for c in consumers:
+                key = f"{sym}|{c}"
+                self.marks[key] = min(ts, self.marks.get(key, ts))
+
+    def take_dirty_since(self, symbol: str, consumer: str) -> Optional[datetime]:
+        return self.marks.pop(f"{symbol}|{consumer}", None)
+
+
+class StubTarget:
+    """Resampled repo stand-in: {ts: (open, high, low, close, volume)}."""
+
+    def __init__(self):
+        self.bars: Dict[int, tuple] = {}
+        self.fail = False
+
+    def upsert_many(self, series: CandleSeries) -> None:
+        if self.fail:
+            raise RuntimeError("write failed")
+        cols = [getattr(series, c).tolist() for c in CandleSeries.COLUMNS]
+        self.bars.update((row[0], row[1:]) for row in zip(*cols))
+
+    def latest_ts(self, symbol: str) -> Optional[datetime]:
+        return _dt(max(self.bars)) if self.bars else None
+
+
+@pytest.fixture
+def stubs(monkeypatch):
+    src, targets = StubCandles(), {}
+    monkeypatch.setattr(job, "get_candles_repo", lambda cfg: src)
+    monkeypatch.setattr(job, "get_resampled_repo",
+                        lambda cfg, interval: targets.setdefault(interval, StubTarget()))
+    return src, targets
+
+
+def _run(intervals=("15min", "1d")) -> Dict[str, int]:
+    cfg = SimpleNamespace(intraday_minutes=5, resample=SimpleNamespace(
+        intervals=intervals, session=SESSION, daily_session=SESSION, tz=TZ, chunk_days=1))
+    return job.resample_to_mongo(cfg, ["X"]).get("X", {})
+
+
+def _assert_matches_batch(src: StubCandles, targets: Dict[int, StubTarget]) -> None:
+    for m, target in targets.items():
+        expected = resample(src.series(), m, SESSION, TZ)
+        assert sorted(target.bars) == expected.ts.tolist()
+        cols = [getattr(expected, c).tolist() for c in CandleSeries.COLUMNS[1:]]
+        assert [target.bars[t] for t in expected.ts.tolist()] == list(zip(*cols))
+
+
+def test_revised_bar_below_the_newest_output_is_aggregated_again(stubs):
+    src, targets = stubs
+    src.write({T0 + i * 300: float(i) for i in range(3 * 288)})  # across the 2024-03-10 DST change
+    full = _run()
+    src.write({T0 + (288 + 7) * 300: -1.0})
+    counts = _run()
+    # Only from the revised bar's local day on is aggregated again, not the whole history.
+    assert 0 < counts["15min"] < full["15min"] and counts["1d"] < full["1d"]
+    _assert_matches_batch(src, targets)
+
+
+def test_unmarked_revision_is_not_seen(stubs):
+    src, targets = stubs
+    src.write({T0 + i * 300: float(i) for i in range(288)})
+    _run()
+    src.write({T0 + 7 * 300: -1.0}, mark=False)
+    _run()
+    assert all(low != -1.0 for _, _, low, _, _ in targets[15].bars.values())
+
+
+def test_failed_run_hands_the_marks_back(stubs):
+    src, targets = stubs
+    src.write({T0 + i * 300: float(i) for i in range(288)})
+    _run()
+    src.write({T0 + 7 * 300: -1.0})
+    targets[15].fail = True
+    with pytest.raises(RuntimeError):
+        _run()
+    assert set(src.marks) == {f"X|{c}" for c in src.consumers}
+    targets[15].fail = False
+    _run()
+    _assert_matches_batch(src, targets)
+
+
+def test_intervals_not_a_multiple_of_the_stored_bars_are_skipped(stubs, capsys):
+    src, targets = stubs
+    src.write({T0 + i * 300: float(i) for i in range(288)})
+    assert set(_run(("15min", "7min", "1d"))) == {"15min", "1d"}
+    assert set(targets) == {15, 1440}
+    assert "to 7min: not a multiple of 5min" in capsys.readouterr().out
+    assert _run(("3min",)) == {}
@@ -0,0 +1,59 @@
+from __future__ import annotations
+import csv
+
+import pytest
+
+from models.candle_series import CandleSeries
+from writer import HEADER, CsvWriter
+
+T0 = 1_700_000_000
+
+
+def _series(start: int, n: int, close: float = 1.0) -> CandleSeries:
+    ts = [T0 + (start + i) * 60 for i in range(n)]
+    return CandleSeries.from_columns("X", {"ts": ts, "open": [close] * n, "high": [close] * n,
+                                           "low": [close] * n, "close": [close] * n, "volume": [1] * n})
+
+
+def _rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_append_writes_only_bars_past_the_last_row(tmp_path):
+    path = str(tmp_path / "x.csv")
+    assert CsvWriter.write_intraday(path, _series(0, 5)) == 5
+    before = (tmp_path / "x.csv").read_bytes()
+
+    # Minutes 3..7 overlap the file's last two rows; their new values are not rewritten.
+    assert CsvWriter.write_intraday(path, _series(3, 5, close=2.0), append=True) == 3
+    rows = _rows(path)
+    assert rows[0] == HEADER
+    assert [r[5] for r in rows[1:]] == ["1.0"] * 5 + ["2.0"] * 3
+    assert (tmp_path / "x.csv").read_bytes().startswith(before)
+
+    # Nothing newer: the file is left as it is.
+    after = (tmp_path / "x.csv").read_bytes()
+    assert CsvWriter.write_intraday(path, _series(0, 8), append=True) == 0
+    assert (tmp_path / "x.csv").read_bytes() == after
+
+
+def test_append_to_missing_file_writes_it(tmp_path):
+    path = str(tmp_path / "new.csv")
+    assert CsvWriter.write_intraday(path, _series(0, 3), append=True) == 3
+    assert len(_rows(path)) == 4
+    assert CsvWriter.last_timestamp(path) == _series(2, 1).end()
+
+
+def test_failed_append_is_truncated_back_off(tmp_path):
+    path = str(tmp_path / "x.csv")
+    CsvWriter.write_intraday(path, _series(0, 5))
+    before = (tmp_path / "x.csv").read_bytes()
+
+    def batches():
+        yield _series(5, 2)
+        raise RuntimeError("fetch failed")
+
+    with pytest.raises(RuntimeError):
+        CsvWriter.write_intraday(path, batches(), append=True)
+    assert (tmp_path / "x.csv").read_bytes() == before